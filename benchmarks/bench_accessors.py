@@ -0,0 +1,114 @@
+"""Benchmarks the header-resolved accessors of the pysam tools.
+
+Times the per-record sample and filter accesses of each pysam tool loop,
+looked up by name as the tools did before and through the accessors of
+``gdc_filtration_tools.accessors``. Records are read from a generated
+tumor/normal VCF into memory first, so only the accesses are timed.
+
+Usage:
+    python benchmarks/bench_accessors.py [-n RECORDS] [-r REPEATS]
+"""
+
+import argparse
+import os
+import tempfile
+import timeit
+from typing import Any, Callable, List, Tuple
+
+import pysam
+
+from gdc_filtration_tools.accessors import FilterTag, SampleField
+
+HEADER = """##fileformat=VCFv4.2
+##contig=<ID=chr1,length=248956422>
+##FILTER=<ID=PASS,Description="All filters passed">
+##FILTER=<ID=ssc40,Description="Somatic Score < 40">
+##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">
+##FORMAT=<ID=SSC,Number=1,Type=Integer,Description="Somatic Score">
+#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tNORMAL\tTUMOR
+"""
+
+
+def write_vcf(path: str, records: int) -> None:
+    with open(path, "w") as fh:
+        fh.write(HEADER)
+        for i in range(records):
+            fh.write(
+                "chr1\t{0}\t.\tA\tC\t.\tPASS\t.\tGT:SSC\t0/0:.\t0/1:{1}\n".format(
+                    i + 1, i % 60
+                )
+            )
+
+
+def cases(header: Any) -> List[Tuple[str, Callable, Callable]]:
+    ssc = SampleField(header, "TUMOR", "SSC")
+    tumor_gt = SampleField(header, "TUMOR", "GT")
+    normal_gt = SampleField(header, "NORMAL", "GT")
+    tag = FilterTag(header, "ssc40")
+
+    def set_by_name(record: Any) -> None:
+        record.samples["TUMOR"]["GT"] = (0, 1)
+        record.samples["NORMAL"]["GT"] = (0, 0)
+
+    def set_by_field(record: Any) -> None:
+        tumor_gt.set(record, (0, 1))
+        normal_gt.set(record, (0, 0))
+
+    return [
+        (
+            "filter-somatic-score SSC",
+            lambda r: r.samples["TUMOR"]["SSC"],
+            ssc.get,
+        ),
+        ("filter-somatic-score filter", lambda r: r.filter.add("ssc40"), tag.add),
+        (
+            "format-pindel-vcf GT",
+            lambda r: r.samples["TUMOR"]["GT"],
+            tumor_gt.get,
+        ),
+        ("format-sanger-pindel-vcf GTs", set_by_name, set_by_field),
+        (
+            "create-dtoxog-maf tumor GT",
+            lambda r: r.samples["TUMOR"]["GT"],
+            lambda r: tumor_gt.sample(r)["GT"],
+        ),
+    ]
+
+
+def per_record(func: Callable, records: List[Any], repeats: int) -> float:
+    best = min(
+        timeit.repeat(lambda: [func(i) for i in records], number=1, repeat=repeats)
+    )
+    return best / len(records)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--records", type=int, default=50000)
+    parser.add_argument("-r", "--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "bench.vcf")
+        write_vcf(path, args.records)
+        with pysam.VariantFile(path) as reader:
+            records = list(reader)
+            header = reader.header
+
+    print(
+        "{0:<30} {1:>10} {2:>10} {3:>8}".format(
+            "access", "by name", "accessor", "speedup"
+        )
+    )
+    for name, by_name, accessor in cases(header):
+        before = per_record(by_name, records, args.repeats)
+        after = per_record(accessor, records, args.repeats)
+        print(
+            "{0:<30} {1:>8.0f}ns {2:>8.0f}ns {3:>7.2f}x".format(
+                name, before * 1e9, after * 1e9, before / after
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Benchmarks the startup time of the gdc_filtration_tools CLI.
+
+Compares the registry-based entrypoint, which imports only the selected
+subcommand, against importing every tool module and building the full
+defopt parser as the CLI did before. Each sample is a fresh interpreter
+running ``<subcommand> --help``, so the result is dominated by imports and
+parser construction, like CLI runs on small inputs.
+
+Usage:
+    python benchmarks/bench_startup.py [-n RUNS] [SUBCOMMAND ...]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from typing import List
+
+LAZY = """
+import sys
+from gdc_filtration_tools import commands
+try:
+    commands.run(sys.argv[1:])
+except SystemExit:
+    pass
+"""
+
+EAGER = """
+import sys
+import defopt
+from gdc_filtration_tools import commands
+funcs = [commands.load_command(i) for i in commands.COMMANDS]
+try:
+    defopt.run(funcs, argv=sys.argv[1:], version=True,
+               argparse_kwargs={"prog": "gdc_filtration_tools"})
+except SystemExit:
+    pass
+"""
+
+
+def time_runs(script: str, argv: List[str], runs: int) -> List[float]:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", script] + argv,
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--runs", type=int, default=20)
+    parser.add_argument(
+        "subcommands",
+        nargs="*",
+        default=["extract-oxoq-from-sqlite", "filter-contigs", "format-gdc-vcf"],
+    )
+    args = parser.parse_args()
+
+    print(
+        "{0:<28} {1:>12} {2:>12} {3:>8}".format(
+            "subcommand", "eager", "lazy", "speedup"
+        )
+    )
+    for name in args.subcommands:
+        argv = [name, "--help"]
+        eager = statistics.median(time_runs(EAGER, argv, args.runs))
+        lazy = statistics.median(time_runs(LAZY, argv, args.runs))
+        print(
+            "{0:<28} {1:>10.1f}ms {2:>10.1f}ms {3:>7.2f}x".format(
+                name, eager * 1000, lazy * 1000, eager / lazy
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
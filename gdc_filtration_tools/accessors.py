@@ -0,0 +1,71 @@
+"""Header-resolved accessors for the record loops of the pysam tools.
+
+``record.samples["TUMOR"]["GT"]`` makes pysam look the sample up by name
+and encode the key for every record, and ``record.filter.add("oxog")``
+encodes the filter name each time. The accessors here resolve the sample
+index and encode the FORMAT key or FILTER name once per header, so a hot
+loop only pays for the htslib lookup itself.
+"""
+
+from typing import Any, TypeAlias
+
+import pysam
+
+VariantHeaderT: TypeAlias = pysam.VariantHeader
+VariantRecordT: TypeAlias = pysam.VariantRecord
+VariantRecordSampleT: TypeAlias = pysam.VariantRecordSample
+
+
+def sample_index(header: VariantHeaderT, sample: str) -> int:
+    """
+    Returns the index of ``sample`` in the samples of ``header``.
+
+    :param header: the header of the records
+    :param sample: the sample name
+    :return: the sample index
+    """
+    samples = list(header.samples)
+    if sample not in samples:
+        raise ValueError("Sample {0} not found in the header".format(sample))
+    return samples.index(sample)
+
+
+class SampleField(object):
+    """
+    Reads and sets one FORMAT key of one sample, e.g. the GT of TUMOR. The
+    records must use a header with the same samples in the same order.
+    """
+
+    __slots__ = ("index", "key")
+
+    def __init__(self, header: VariantHeaderT, sample: str, key: str) -> None:
+        self.index = sample_index(header, sample)
+        # pysam takes bytes keys as they are; the stubs only declare str
+        self.key: Any = key.encode()
+
+    def sample(self, record: VariantRecordT) -> VariantRecordSampleT:
+        """Returns the sample of ``record``."""
+        return record.samples[self.index]
+
+    def get(self, record: VariantRecordT) -> Any:
+        """Returns the value of the key in the sample of ``record``."""
+        return record.samples[self.index][self.key]
+
+    def set(self, record: VariantRecordT, value: Any) -> None:
+        """Sets the value of the key in the sample of ``record``."""
+        record.samples[self.index][self.key] = value
+
+
+class FilterTag(object):
+    """Adds one FILTER, which must be declared in the header, to records."""
+
+    __slots__ = ("name",)
+
+    def __init__(self, header: VariantHeaderT, name: str) -> None:
+        if name not in header.filters:
+            raise ValueError("Filter {0} not found in the header".format(name))
+        self.name: Any = name.encode()
+
+    def add(self, record: VariantRecordT) -> None:
+        """Adds the filter to ``record``."""
+        record.filter.add(self.name)
@@ -0,0 +1,228 @@
+"""Minimal reader and writer for raw BGZF blocks.
+
+pysam and htslib only expose BGZF files as a decompressed stream, so
+copying records without touching them still pays for inflating and
+deflating every block. This module reads and writes the compressed blocks
+themselves, so untouched parts of a file can be copied verbatim and only
+the blocks that change are recompressed.
+"""
+
+import struct
+import time
+import zlib
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+from gdc_filtration_tools.logger import Logger
+
+# Largest payload htslib puts in one block
+BLOCK_SIZE = 0xFF00
+
+EOF_BLOCK = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+_HEADER = struct.Struct("<4sIBBHBBHH")
+_FOOTER = struct.Struct("<II")
+
+
+def make_virtual_offset(coffset: int, uoffset: int) -> int:
+    """Combines a block offset and an offset within the block."""
+    return (coffset << 16) | uoffset
+
+
+def split_virtual_offset(voffset: int) -> Tuple[int, int]:
+    """Splits a virtual offset into its block offset and in-block offset."""
+    return voffset >> 16, voffset & 0xFFFF
+
+
+def read_block(fh: BinaryIO) -> Optional[bytes]:
+    """
+    Reads the next raw (compressed) block from ``fh``.
+
+    :param fh: the binary file handle
+    :return: the raw block or None at the end of the file
+    """
+    header = fh.read(_HEADER.size)
+    if not header:
+        return None
+    if len(header) < _HEADER.size or header[:4] != b"\x1f\x8b\x08\x04":
+        raise ValueError("Not a BGZF block")
+    (_, _, _, _, xlen, si1, si2, slen, bsize) = _HEADER.unpack(header)
+    if xlen != 6 or (si1, si2, slen) != (66, 67, 2):
+        raise ValueError("Unsupported BGZF extra field")
+    rest = fh.read(bsize + 1 - _HEADER.size)
+    if len(rest) != bsize + 1 - _HEADER.size:
+        raise ValueError("Truncated BGZF block")
+    return header + rest
+
+
+def iter_blocks(fh: BinaryIO) -> Iterator[Tuple[int, bytes]]:
+    """
+    Yields the offset and raw bytes of every block from the current
+    position of ``fh``.
+    """
+    offset = fh.tell()
+    while True:
+        block = read_block(fh)
+        if block is None:
+            return
+        yield offset, block
+        offset += len(block)
+
+
+def iter_block_offsets(fh: BinaryIO) -> Iterator[int]:
+    """
+    Yields the offset of every block from the current position of ``fh``,
+    reading only the block headers.
+    """
+    offset = fh.tell()
+    while True:
+        header = fh.read(_HEADER.size)
+        if not header:
+            return
+        if len(header) < _HEADER.size or header[:4] != b"\x1f\x8b\x08\x04":
+            raise ValueError("Not a BGZF block")
+        bsize = _HEADER.unpack(header)[-1]
+        yield offset
+        offset += bsize + 1
+        fh.seek(offset)
+
+
+def iter_range(fh: BinaryIO, beg: int, end: int) -> Iterator[bytes]:
+    """
+    Yields the uncompressed data between two virtual offsets, one block at
+    a time.
+    """
+    cbeg, ubeg = split_virtual_offset(beg)
+    cend, uend = split_virtual_offset(end)
+    fh.seek(cbeg)
+    for coffset, block in iter_blocks(fh):
+        if coffset > cend or (coffset == cend and uend == 0):
+            return
+        data = decompress_block(block)
+        start = ubeg if coffset == cbeg else 0
+        stop = uend if coffset == cend else len(data)
+        yield data[start:stop]
+        if coffset == cend:
+            return
+
+
+def find_line_start(fh: BinaryIO, voffset: int) -> int:
+    """
+    Returns the virtual offset after the first newline at or after
+    ``voffset``, or the end of the file if there is none. An offset at the
+    end of a block is returned as the start of the next block.
+    """
+    coffset, uoffset = split_virtual_offset(voffset)
+    fh.seek(coffset)
+    for coffset, block in iter_blocks(fh):
+        data = decompress_block(block)
+        eol = data.find(b"\n", uoffset)
+        if eol >= 0:
+            if eol + 1 < len(data):
+                return make_virtual_offset(coffset, eol + 1)
+            return make_virtual_offset(coffset + len(block), 0)
+        uoffset = 0
+    return make_virtual_offset(fh.tell(), 0)
+
+
+def decompress_block(block: bytes) -> bytes:
+    """Inflates a raw block."""
+    data = zlib.decompress(block[_HEADER.size : -_FOOTER.size], -15)
+    crc, size = _FOOTER.unpack(block[-_FOOTER.size :])
+    if size != len(data) or crc != zlib.crc32(data):
+        raise ValueError("Corrupt BGZF block")
+    return data
+
+
+def compress_block(data: bytes, level: int = 6) -> bytes:
+    """
+    Deflates up to ``BLOCK_SIZE`` bytes into a single raw block.
+
+    :param data: the payload
+    :param level: the zlib compression level
+    :return: the raw block
+    """
+    if len(data) > BLOCK_SIZE:
+        raise ValueError("BGZF payload too large: {0}".format(len(data)))
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    cdata = compressor.compress(data) + compressor.flush()
+    bsize = _HEADER.size + len(cdata) + _FOOTER.size - 1
+    header = _HEADER.pack(b"\x1f\x8b\x08\x04", 0, 0, 0xFF, 6, 66, 67, 2, bsize)
+    return header + cdata + _FOOTER.pack(zlib.crc32(data), len(data))
+
+
+class BgzfWriter(object):
+    """
+    Writes a BGZF file from a mix of uncompressed data, which is buffered
+    and compressed into blocks, and raw blocks copied from another file.
+    An EOF block is added on close unless the last block written was empty.
+
+    The time spent compressing is summed over the blocks and recorded as a
+    single ``compress`` trace span on close.
+    """
+
+    def __init__(self, fh: BinaryIO, level: int = 6) -> None:
+        self.fh = fh
+        self.level = level
+        self.offset = 0
+        self._buffer = bytearray()
+        self._last_empty = False
+        self._start_us = 0
+        self._seconds = 0.0
+        self._blocks = 0
+        self._bytes = 0
+
+    def tell(self) -> int:
+        """Returns the virtual offset of the next byte written."""
+        return make_virtual_offset(self.offset, len(self._buffer))
+
+    def write(self, data: bytes) -> None:
+        """Buffers uncompressed data, writing every full block."""
+        self._buffer.extend(data)
+        while len(self._buffer) >= BLOCK_SIZE:
+            self._compress(bytes(self._buffer[:BLOCK_SIZE]))
+            del self._buffer[:BLOCK_SIZE]
+
+    def flush(self) -> None:
+        """Ends the current block so the next write starts a new one."""
+        if self._buffer:
+            self._compress(bytes(self._buffer))
+            self._buffer.clear()
+
+    def write_block(self, block: bytes) -> None:
+        """Ends the current block and copies a raw block verbatim."""
+        self.flush()
+        self._emit(block)
+
+    def _compress(self, data: bytes) -> None:
+        if not self._blocks:
+            self._start_us = time.time_ns() // 1000
+        start = time.perf_counter()
+        block = compress_block(data, self.level)
+        self._seconds += time.perf_counter() - start
+        self._blocks += 1
+        self._bytes += len(data)
+        self._emit(block)
+
+    def _emit(self, block: bytes) -> None:
+        self.fh.write(block)
+        self.offset += len(block)
+        self._last_empty = block[-4:] == b"\x00\x00\x00\x00"
+
+    def close(self, eof: bool = True) -> None:
+        """
+        Writes the remaining data and, unless ``eof`` is False, the EOF block.
+        """
+        self.flush()
+        if eof and not self._last_empty:
+            self._emit(EOF_BLOCK)
+        if self._blocks:
+            Logger.add_span(
+                "compress",
+                self._start_us,
+                int(self._seconds * 1e6),
+                blocks=self._blocks,
+                bytes=self._bytes,
+            )
+            self._blocks = 0
+            self._seconds = 0.0
+            self._bytes = 0
@@ -0,0 +1,108 @@
+"""Per-process cache of resources loaded from files.
+
+Long-running workers (e.g. the ``serve`` daemon) run many jobs that share
+the same reference FASTA and metrics files. Resources such as open
+``pysam.FastaFile`` handles, reference contig lists and parsed OxoG metrics
+are cached here by path and reloaded when the file changes, so only the
+first job in each worker pays for loading them.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, List, Tuple, TypeVar, cast
+
+T = TypeVar("T")
+
+
+class ResourceCache(object):
+    """
+    LRU cache of resources keyed by kind and file path. An entry is
+    invalidated when the modification time or size of its file changes and
+    evicted resources with a ``close`` method are closed.
+    """
+
+    def __init__(self, maxsize: int = 16) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Tuple[str, str], Tuple[Tuple[int, int], Any]] = (
+            OrderedDict()
+        )
+        self._lock = threading.RLock()
+
+    def get(self, kind: str, path: str, loader: Callable[[str], T]) -> T:
+        """
+        Returns the ``kind`` resource for ``path``, calling ``loader(path)``
+        if it is not cached or the file has changed.
+
+        :param kind: the kind of resource, e.g. ``fasta``
+        :param path: the file the resource is loaded from
+        :param loader: loads the resource from ``path``
+        :return: the resource
+        """
+        key = (kind, os.path.abspath(path))
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return cast(T, entry[1])
+            self.misses += 1
+            if entry is not None:
+                self._discard(key)
+            value: T = loader(path)
+            self._entries[key] = (stamp, value)
+            while len(self._entries) > self.maxsize:
+                self._discard(next(iter(self._entries)))
+            return value
+
+    def _discard(self, key: Tuple[str, str]) -> None:
+        _, value = self._entries.pop(key)
+        close = getattr(value, "close", None)
+        if callable(close):
+            close()
+
+    def clear(self) -> None:
+        """Closes and removes every cached resource."""
+        with self._lock:
+            for key in list(self._entries):
+                self._discard(key)
+
+
+Cache = ResourceCache()
+
+
+def _open_fasta(path: str) -> Any:
+    # Imported here so the serve client does not pay for importing pysam.
+    import pysam
+
+    return pysam.FastaFile(path)
+
+
+def get_fasta(path: str) -> Any:
+    """
+    Returns a cached ``pysam.FastaFile`` for the faidx indexed ``path``. The
+    handle is shared, so callers must not close it.
+
+    :param path: the reference fasta file
+    :return: the open FastaFile
+    """
+    return Cache.get("fasta", path, _open_fasta)
+
+
+def _load_contigs(path: str) -> List[Tuple[str, int]]:
+    fasta = get_fasta(path)
+    return [(i, fasta.get_reference_length(i)) for i in fasta.references]
+
+
+def get_fasta_contigs(path: str) -> List[Tuple[str, int]]:
+    """
+    Returns the names and lengths of the contigs of the reference ``path``.
+
+    :param path: the reference fasta file
+    :return: list of (contig, length) tuples in reference order
+    """
+    return Cache.get("contigs", path, _load_contigs)
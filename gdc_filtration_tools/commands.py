@@ -0,0 +1,143 @@
+"""Registry of the CLI subcommands.
+
+Importing every tool module (and with them pysam, sqlite3, csv...) and
+building the full defopt parser dominates the runtime of the CLI on small
+inputs. The registry maps each subcommand to the module that implements
+it, so only the selected subcommand is imported, and caches the generated
+argument parsers for the lifetime of the process, e.g. of a serve worker.
+
+defopt.bind builds a new parser on every call and has no public way to
+reuse one, so the parser comes from its parser factory, which is why
+defopt is pinned to 6.4 in pyproject.toml. Parsing and the call wrapper
+that exits on the exceptions a tool documents follow defopt.bind.
+"""
+
+import functools
+import importlib
+import sys
+from argparse import ArgumentParser
+from inspect import Signature
+from typing import Any, Callable, Dict, List, Sequence, Tuple, Type, cast
+
+import defopt
+
+COMMANDS: Dict[str, str] = {
+    "add-oxog-filters": "add_oxog_filters:add_oxog_filters",
+    "batch": "batch:batch",
+    "create-dtoxog-maf": "create_dtoxog_maf:create_dtoxog_maf",
+    "create-oxog-intervals": "create_oxog_intervals:create_oxog_intervals",
+    "dtoxog-maf-to-vcf": "dtoxog_maf_to_vcf:dtoxog_maf_to_vcf",
+    "extract-oxoq-from-sqlite": "extract_oxoq:extract_oxoq_from_sqlite",
+    "filter-contigs": "filter_contigs:filter_contigs",
+    "filter-nonstandard-variants": (
+        "filter_nonstandard_variants:filter_nonstandard_variants"
+    ),
+    "filter-somatic-score": "filter_somatic_score:filter_somatic_score",
+    "format-gdc-vcf": "format_gdc_vcf:format_gdc_vcf",
+    "format-gdc-vcf-batch": "format_gdc_vcf:format_gdc_vcf_batch",
+    "format-pindel-vcf": "format_pindel_vcf:format_pindel_vcf",
+    "format-sanger-pindel-vcf": "format_sanger_pindel_vcf:format_sanger_pindel_vcf",
+    "format-svaba-vcf": "format_svaba_vcf:format_svaba_vcf",
+    "format-strelka-vcf": "format_strelka_vcf:format_strelka_vcf",
+    "position-filter-dkfz": "filter_pos_dkfz:position_filter_dkfz",
+    "serve": "serve:serve",
+    "submit": "serve:submit",
+}
+
+ToolsPackage = "gdc_filtration_tools.tools"
+
+
+def load_command(name: str) -> Callable[..., Any]:
+    """
+    Imports the module of the subcommand ``name`` and returns its function.
+
+    :param name: the subcommand name, e.g. ``filter-contigs``
+    :return: the tool function
+    """
+    module_name, func_name = COMMANDS[name].split(":")
+    module = importlib.import_module("{0}.{1}".format(ToolsPackage, module_name))
+    return cast(Callable[..., Any], getattr(module, func_name))
+
+
+def select_commands(argv: Sequence[str]) -> Tuple[str, ...]:
+    """
+    Returns the subcommands needed to parse ``argv``. This is only the
+    selected subcommand, unless it is missing or unknown (e.g. ``-h`` or
+    ``--version``), in which case every subcommand is needed.
+
+    :param argv: the command line arguments
+    :return: the subcommand names
+    """
+    if argv and argv[0] in COMMANDS:
+        return (argv[0],)
+    return tuple(COMMANDS)
+
+
+@functools.lru_cache(maxsize=None)
+def build_parser(names: Tuple[str, ...]) -> ArgumentParser:
+    """
+    Builds, once per process, the defopt argument parser for the
+    subcommands ``names``.
+
+    :param names: the subcommand names
+    :return: the argument parser
+    """
+    funcs = {name: load_command(name) for name in names}
+    parser: ArgumentParser = defopt._create_parser(
+        funcs,
+        version=True,
+        argparse_kwargs={"prog": "gdc_filtration_tools"},
+    )
+    return parser
+
+
+@functools.lru_cache(maxsize=None)
+def _signature(
+    func: Callable[..., Any],
+) -> Tuple[Signature, Tuple[Type[Exception], ...]]:
+    # defopt's signature leaves out private parameters and carries the
+    # documented exceptions in the metadata of the return annotation
+    sig = defopt.signature(func)
+    metadata = getattr(sig.return_annotation, "__metadata__", ())
+    raises = tuple(exc for arg in metadata if isinstance(arg, tuple) for exc in arg)
+    return sig, raises
+
+
+def bind(argv: List[str]) -> Callable[[], Any]:
+    """
+    Parses ``argv`` with the cached parser and returns the selected tool
+    function with its arguments bound, like ``defopt.bind``. The documented
+    exceptions of the tool exit with their message.
+
+    :param argv: the command line arguments
+    :return: a callable that runs the subcommand
+    """
+    parser = build_parser(select_commands(argv))
+    with defopt._colorama_text():
+        parsed_args = vars(parser.parse_args(argv))
+    func = parsed_args.pop("_func", None)
+    if func is None:
+        parser.error("too few arguments")
+    sig, raises = _signature(func)
+    bound = sig.bind_partial()
+    bound.arguments.update(parsed_args)
+    call = functools.partial(func, *bound.args, **bound.kwargs)
+
+    @functools.wraps(call)
+    def wrapper() -> Any:
+        try:
+            return call()
+        except raises as e:
+            sys.exit(str(e))
+
+    return wrapper
+
+
+def run(argv: List[str]) -> Any:
+    """
+    Runs the subcommand selected by ``argv``.
+
+    :param argv: the command line arguments
+    :return: the return value of the tool function
+    """
+    return bind(argv)()
@@ -0,0 +1,83 @@
+"""Aggregated diagnostics for per-record warnings.
+
+Tools that skip or remove records would otherwise log one warning per
+record, which on noisy inputs produces millions of lines. The
+DiagnosticsCollector counts warnings by category, logs only the first few
+examples of each, optionally writes every warning to a side file in bulk
+and logs a summary table at the end.
+"""
+
+import logging
+from typing import Callable, Dict, List, Optional, TextIO, Union
+
+MessageT = Union[str, Callable[[], str]]
+
+
+class DiagnosticsCollector(object):
+    """
+    Collects per-record warnings by category.
+
+    ``message`` may be a string or a callable returning one, so callers can
+    defer expensive formatting; it is only evaluated when the warning is
+    logged as an example or written to the details file.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        *,
+        max_examples: int = 10,
+        details_file: Optional[str] = None,
+        buffer_size: int = 10000,
+    ) -> None:
+        self.logger = logger
+        self.max_examples = max_examples
+        self.buffer_size = buffer_size
+        self.counts: Dict[str, int] = {}
+        self._buffer: List[str] = []
+        self._details: Optional[TextIO] = None
+        if details_file is not None:
+            self._details = open(details_file, "wt")
+            self._details.write("category\tmessage\n")
+
+    def warn(self, category: str, message: MessageT) -> None:
+        """Records a warning in ``category``."""
+        count = self.counts.get(category, 0) + 1
+        self.counts[category] = count
+        if count > self.max_examples and self._details is None:
+            return
+
+        text = message() if callable(message) else message
+        if count <= self.max_examples:
+            self.logger.warning(text)
+            if count == self.max_examples:
+                self.logger.warning(
+                    "Further '{0}' warnings will only be counted".format(category)
+                )
+        if self._details is not None:
+            self._buffer.append("{0}\t{1}\n".format(category, text))
+            if len(self._buffer) >= self.buffer_size:
+                self.flush()
+
+    def flush(self) -> None:
+        """Writes buffered warnings to the details file."""
+        if self._details is not None and self._buffer:
+            self._details.writelines(self._buffer)
+        self._buffer = []
+
+    def close(self) -> None:
+        """Flushes and closes the details file."""
+        self.flush()
+        if self._details is not None:
+            self._details.close()
+            self._details = None
+
+    def summary(self) -> None:
+        """Logs a table of warning counts by category, if there were any."""
+        if not self.counts:
+            return
+        width = max(len(i) for i in self.counts)
+        self.logger.warning("Diagnostics summary:")
+        self.logger.warning("  {0:<{1}}  {2:>10}".format("category", width, "count"))
+        for category, count in sorted(self.counts.items()):
+            self.logger.warning("  {0:<{1}}  {2:>10}".format(category, width, count))
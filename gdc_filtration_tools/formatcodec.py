@@ -0,0 +1,90 @@
+"""Compiled layouts of the colon separated FORMAT column.
+
+Tools that edit sample fields as text need the position of a key within the
+FORMAT of every record. A file only uses a handful of distinct FORMAT
+strings, so each one is split once into a FormatCodec, cached by
+``get_codec``, and per-record sample edits become index operations.
+"""
+
+from typing import Any, AnyStr, Dict, Generic, List, Optional, Union, cast
+
+# Distinct FORMAT strings kept by get_codec
+MAX_CODECS = 256
+
+
+class FormatCodec(Generic[AnyStr]):
+    """
+    The key positions of one FORMAT string, as str or bytes. Sample values
+    passed to the codec must be of the same type.
+    """
+
+    def __init__(self, format_string: AnyStr) -> None:
+        self.format: AnyStr = format_string
+        self.sep: AnyStr
+        self.missing: AnyStr
+        if isinstance(format_string, bytes):
+            self.sep, self.missing = cast(AnyStr, b":"), cast(AnyStr, b".")
+        else:
+            self.sep, self.missing = cast(AnyStr, ":"), cast(AnyStr, ".")
+        self.keys: List[AnyStr] = format_string.split(self.sep)
+        self.index: Dict[AnyStr, int] = {key: i for i, key in enumerate(self.keys)}
+        self._prepended: Dict[AnyStr, "FormatCodec[AnyStr]"] = {}
+
+    def get(self, value: AnyStr, key: AnyStr) -> Optional[AnyStr]:
+        """
+        Returns the value of ``key`` in a sample column, or None if the key is
+        not in the FORMAT or the column ends before it.
+        """
+        i = self.index.get(key)
+        if i is None:
+            return None
+        if i == 0:
+            end = value.find(self.sep)
+            return value if end < 0 else value[:end]
+        parts = value.split(self.sep)
+        return parts[i] if i < len(parts) else None
+
+    def set(self, value: AnyStr, key: AnyStr, new: AnyStr) -> AnyStr:
+        """
+        Returns a sample column with the value of ``key``, which must be in
+        the FORMAT, replaced by ``new``. Trailing values the column omits are
+        filled with '.'.
+        """
+        i = self.index[key]
+        if i == 0:
+            end = value.find(self.sep)
+            return new if end < 0 else new + value[end:]
+        parts = value.split(self.sep)
+        if len(parts) <= i:
+            parts.extend([self.missing] * (i + 1 - len(parts)))
+        parts[i] = new
+        return self.sep.join(parts)
+
+    def prepend(self, key: AnyStr) -> "FormatCodec[AnyStr]":
+        """
+        Returns the codec of this FORMAT with ``key`` added as the first key,
+        e.g. GT, whose ``format`` is the output FORMAT string.
+        """
+        codec = self._prepended.get(key)
+        if codec is None:
+            codec = self._prepended[key] = get_codec(key + self.sep + self.format)
+        return codec
+
+
+_CODECS: Dict[Union[str, bytes], Any] = {}
+
+
+def get_codec(format_string: AnyStr) -> FormatCodec[AnyStr]:
+    """
+    Returns the cached codec of a FORMAT string.
+
+    :param format_string: the FORMAT column of a record, as str or bytes
+    :return: the codec
+    """
+    codec = _CODECS.get(format_string)
+    if codec is None:
+        if len(_CODECS) >= MAX_CODECS:
+            # files with many layouts are rare, so start over
+            _CODECS.clear()
+        codec = _CODECS[format_string] = FormatCodec(format_string)
+    return codec
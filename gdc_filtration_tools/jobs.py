@@ -0,0 +1,110 @@
+"""Runs subcommands as jobs inside long-running worker processes.
+
+Workers import the tool modules and build their parsers once, and keep
+reference handles and parsed metrics warm in the per-process resource cache
+between jobs. Each job returns its exit status and metrics as a
+JSON-serializable dictionary.
+"""
+
+import io
+import os
+import resource
+import time
+from contextlib import redirect_stdout
+from typing import Any, Dict, List, Optional, Sequence
+
+from gdc_filtration_tools import commands
+from gdc_filtration_tools.cache import Cache
+from gdc_filtration_tools.logger import Logger
+from gdc_filtration_tools.utils import STDIO_PATH
+
+# Subcommands that manage workers themselves and cannot run as jobs
+NESTED_COMMANDS = {"serve", "submit", "batch"}
+
+
+def init_worker(preload: Sequence[str]) -> None:
+    """
+    Process pool initializer that imports the ``preload`` subcommands and
+    builds their parsers, so the first job does not pay for it.
+
+    :param preload: the subcommand names
+    """
+    for name in preload:
+        commands.build_parser((name,))
+
+
+def warm_up(pool: Any, workers: int) -> None:
+    """
+    Starts every process of ``pool`` (a ProcessPoolExecutor), which are
+    otherwise only started as jobs are submitted.
+
+    :param pool: the process pool
+    :param workers: the number of processes in the pool
+    """
+    for future in [pool.submit(os.getpid) for _ in range(workers)]:
+        future.result()
+
+
+def _exit_status(code: Any) -> int:
+    if code is None:
+        return 0
+    return code if isinstance(code, int) else 1
+
+
+def run_job(argv: List[str], cwd: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Runs the subcommand selected by ``argv`` in this process. Jobs can't
+    read stdin or write stdout with ``-``: the worker's standard streams
+    belong to the daemon, and only text printed to ``sys.stdout`` is
+    captured.
+
+    :param argv: the command line arguments, starting with the subcommand
+    :param cwd: the directory relative paths in ``argv`` are resolved from
+    :return: the exit status, error message, captured stdout and metrics
+    """
+    logger = Logger.get_logger("jobs")
+    result: Dict[str, Any] = {"argv": argv, "status": 0, "error": None}
+    start = time.monotonic()
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    hits, misses = Cache.hits, Cache.misses
+    stdout = io.StringIO()
+    old_cwd = os.getcwd()
+    try:
+        if argv and argv[0] in NESTED_COMMANDS:
+            raise ValueError("'{0}' cannot be run as a job".format(argv[0]))
+        if STDIO_PATH in argv[1:]:
+            raise ValueError("Jobs cannot read stdin or write stdout ('-')")
+        if cwd is not None:
+            os.chdir(cwd)
+        with redirect_stdout(stdout):
+            commands.run(argv)
+    except SystemExit as e:
+        result["status"] = _exit_status(e.code)
+        if result["status"] != 0:
+            result["error"] = "Exited with status {0}".format(result["status"])
+    except Exception as e:
+        logger.exception("Job {0} failed".format(argv))
+        result["status"] = 1
+        result["error"] = "{0}: {1}".format(type(e).__name__, e)
+    finally:
+        os.chdir(old_cwd)
+
+    end_usage = resource.getrusage(resource.RUSAGE_SELF)
+    result.update(
+        {
+            "stdout": stdout.getvalue(),
+            "pid": os.getpid(),
+            "elapsed_sec": round(time.monotonic() - start, 6),
+            "cpu_sec": round(
+                end_usage.ru_utime
+                - usage.ru_utime
+                + end_usage.ru_stime
+                - usage.ru_stime,
+                6,
+            ),
+            "max_rss_kb": end_usage.ru_maxrss,
+            "cache_hits": Cache.hits - hits,
+            "cache_misses": Cache.misses - misses,
+        }
+    )
+    return result
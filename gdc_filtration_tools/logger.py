@@ -2,9 +2,166 @@
 Module for custom logging in gdc-filtration-tools
 """
 
+import atexit
+import datetime
+import fcntl
+import json
 import logging
+import logging.handlers
+import os
+import queue
 import sys
-from typing import IO, Optional
+import threading
+import time
+from contextlib import contextmanager
+from typing import IO, Any, Callable, Dict, Generator, Optional, Set, Tuple
+
+
+class TraceWriter(object):
+    """
+    Appends Chrome trace-event spans to a JSON file that can be loaded
+    in chrome://tracing or Perfetto.
+
+    The file uses the JSON Array Format, where the closing bracket is
+    optional, so every process (main, worker threads and worker
+    processes) can append complete events to the same file as they finish.
+    The opening bracket is written by ``start`` or, for a new or empty
+    file, with the first event; appends hold an exclusive ``flock`` so
+    only one process can find the file empty and write it.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._named: Set[Tuple[int, int]] = set()
+
+    def start(self) -> None:
+        """Truncates the trace file and writes the opening bracket."""
+        with self._lock:
+            with open(self.path, "wt") as fh:
+                fh.write("[\n")
+            self._named = set()
+
+    def add_span(
+        self, name: str, start_us: int, duration_us: int, args: Dict[str, Any]
+    ) -> None:
+        """Writes a complete ('X') event for the current process and thread."""
+        pid = os.getpid()
+        tid = threading.get_ident()
+        events = []
+        if (pid, tid) not in self._named:
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {"name": threading.current_thread().name},
+                }
+            )
+        events.append(
+            {
+                "name": name,
+                "cat": "gdc_filtration_tools",
+                "ph": "X",
+                "ts": start_us,
+                "dur": duration_us,
+                "pid": pid,
+                "tid": tid,
+                "args": args,
+            }
+        )
+        data = "".join(json.dumps(event, default=str) + ",\n" for event in events)
+        with self._lock:
+            self._named.add((pid, tid))
+            with open(self.path, "at") as fh:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+                if fh.tell() == 0:
+                    fh.write("[\n")
+                fh.write(data)
+
+
+class ProgressReporter(object):
+    """
+    Rate-limited progress logging for record loops. ``update`` is cheap
+    enough to call for every record: the clock is only read every
+    ``check_every`` records and a line is logged at most once per
+    ``interval`` seconds with the records/sec rate and, when the total
+    work is known, an ETA.
+
+    The ETA is computed from ``total_records`` (e.g. from index metadata)
+    when available, otherwise from ``position()`` relative to ``total_bytes``.
+    """
+
+    DefaultInterval = 30.0
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        *,
+        interval: Optional[float] = None,
+        total_records: Optional[int] = None,
+        total_bytes: Optional[int] = None,
+        position: Optional[Callable[[], int]] = None,
+        check_every: int = 1000,
+    ) -> None:
+        self.logger = logger
+        self.interval = (
+            ProgressReporter.DefaultInterval if interval is None else interval
+        )
+        self.total_records = total_records
+        self.total_bytes = total_bytes
+        self.position = position
+        self.check_every = check_every
+        self.next_check = check_every
+        self.start = time.monotonic()
+        self.last_log = self.start
+
+    def update(self, count: int) -> None:
+        """Reports that ``count`` records have been processed so far."""
+        if count < self.next_check:
+            return
+        self.next_check = count + self.check_every
+        now = time.monotonic()
+        if now - self.last_log < self.interval:
+            return
+        self.last_log = now
+        elapsed = now - self.start
+        rate = count / elapsed if elapsed > 0 else 0.0
+        msg = "Processed {0} records ({1:.0f} records/sec".format(count, rate)
+        eta = self._eta(count, elapsed, rate)
+        if eta is not None:
+            msg += "; ETA {0}".format(datetime.timedelta(seconds=int(eta)))
+        self.logger.info(msg + ")")
+
+    def _eta(self, count: int, elapsed: float, rate: float) -> Optional[float]:
+        if self.total_records and rate > 0:
+            return max(self.total_records - count, 0) / rate
+        if self.total_bytes and self.position is not None:
+            try:
+                done = self.position() / self.total_bytes
+            except (OSError, ValueError):
+                return None
+            if 0 < done <= 1:
+                return elapsed * (1 - done) / done
+        return None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats log records as single-line JSON objects."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data)
 
 
 class Logger(object):
@@ -12,18 +169,71 @@ class Logger(object):
 
     RootLogger = logging.getLogger("gdc_filtration_tools")
     LoggerFormat = "[%(levelname)s] [%(asctime)s] [%(name)s] - %(message)s"
+    AsyncEnv = "GDC_FILTRATION_TOOLS_LOG_ASYNC"
+    FormatEnv = "GDC_FILTRATION_TOOLS_LOG_FORMAT"
+    TraceEnv = "GDC_FILTRATION_TOOLS_TRACE"
+    Asynchronous = False
+    JsonFormat = False
+    Listener: Optional[logging.handlers.QueueListener] = None
+    Tracer: Optional[TraceWriter] = None
 
     @classmethod
-    def setup_root_logger(cls) -> None:
-        """Sets up the root logger and should only be called once."""
-        for handle in Logger.RootLogger.handlers:
+    def setup_root_logger(
+        cls, *, asynchronous: Optional[bool] = None, json_format: Optional[bool] = None
+    ) -> None:
+        """Sets up the root logger and should only be called once.
+
+        With ``asynchronous`` the root logger only enqueues records and a
+        background listener thread formats and writes them to stderr. With
+        ``json_format`` each record is written as a JSON object. Both default
+        to the ``GDC_FILTRATION_TOOLS_LOG_ASYNC=1`` and
+        ``GDC_FILTRATION_TOOLS_LOG_FORMAT=json`` environment variables."""
+        if asynchronous is None:
+            asynchronous = os.environ.get(Logger.AsyncEnv, "") in ("1", "true")
+        if json_format is None:
+            json_format = os.environ.get(Logger.FormatEnv, "") == "json"
+
+        Logger.Asynchronous = asynchronous
+        Logger.JsonFormat = json_format
+        Logger.stop_listener()
+        for handle in list(Logger.RootLogger.handlers):
             Logger.RootLogger.removeHandler(handle)
-            Logger.RootLogger.setLevel(level=Logger.LoggerLevel)
+        Logger.RootLogger.setLevel(level=Logger.LoggerLevel)
 
         handler = logging.StreamHandler(sys.stderr)
-        formatter = logging.Formatter(Logger.LoggerFormat, datefmt="%Y%m%d %H:%M:%S")
+        formatter: logging.Formatter
+        if json_format:
+            formatter = JsonFormatter()
+        else:
+            formatter = logging.Formatter(
+                Logger.LoggerFormat, datefmt="%Y%m%d %H:%M:%S"
+            )
         handler.setFormatter(formatter)
-        Logger.RootLogger.addHandler(handler)
+
+        if asynchronous:
+            log_queue: queue.SimpleQueue = queue.SimpleQueue()
+            Logger.Listener = logging.handlers.QueueListener(log_queue, handler)
+            Logger.Listener.start()
+            Logger.RootLogger.addHandler(logging.handlers.QueueHandler(log_queue))
+        else:
+            Logger.RootLogger.addHandler(handler)
+
+    @classmethod
+    def stop_listener(cls) -> None:
+        """Flushes and stops the asynchronous logging listener, if any."""
+        if Logger.Listener is not None:
+            Logger.Listener.stop()
+            Logger.Listener = None
+
+    @classmethod
+    def _after_fork(cls) -> None:
+        # The listener thread does not survive a fork, so a forked worker
+        # sets up its own handlers.
+        if Logger.Listener is not None:
+            Logger.Listener = None
+            Logger.setup_root_logger(
+                asynchronous=Logger.Asynchronous, json_format=Logger.JsonFormat
+            )
 
     LoggerLevel = logging.INFO
 
@@ -42,5 +252,46 @@ class Logger(object):
             logger.addHandler(handler)
         return logger
 
+    @classmethod
+    def setup_tracer(cls, path: Optional[str] = None) -> None:
+        """Enables span tracing to ``path``, falling back to the
+        ``GDC_FILTRATION_TOOLS_TRACE`` environment variable. Tracing is
+        disabled when neither is set. The path is exported to the
+        environment so worker processes append to the same file."""
+        path = path or os.environ.get(Logger.TraceEnv)
+        if not path:
+            Logger.Tracer = None
+            return
+        os.environ[Logger.TraceEnv] = path
+        if Logger.Tracer is None or Logger.Tracer.path != path:
+            Logger.Tracer = TraceWriter(path)
+
+    @classmethod
+    @contextmanager
+    def span(cls, name: str, **args: Any) -> Generator[None, None, None]:
+        """Records the wrapped block as a trace span. This is a no-op when
+        tracing is disabled."""
+        tracer = Logger.Tracer
+        if tracer is None:
+            yield
+            return
+        start_us = time.time_ns() // 1000
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration_us = int((time.perf_counter() - start) * 1e6)
+            tracer.add_span(name, start_us, duration_us, args)
+
+    @classmethod
+    def add_span(cls, name: str, start_us: int, duration_us: int, **args: Any) -> None:
+        """Records an already timed span, such as the summed time of many
+        short steps. This is a no-op when tracing is disabled."""
+        if Logger.Tracer is not None:
+            Logger.Tracer.add_span(name, start_us, duration_us, args)
+
 
 Logger.setup_root_logger()
+Logger.setup_tracer()
+atexit.register(Logger.stop_listener)
+os.register_at_fork(after_in_child=Logger._after_fork)
@@ -0,0 +1,197 @@
+"""Copies whole contigs between bgzipped VCFs as raw BGZF blocks.
+
+Filters that leave most records unchanged still decode and re-encode every
+record through pysam. Given a tabix/CSI indexed bgzipped VCF and a decision
+per contig, the records of untouched contigs are copied as compressed
+blocks, dropped contigs are skipped without reading them and only the
+contigs that need work are decoded. The only blocks recompressed are the
+ones a copied contig shares with its neighbours.
+"""
+
+import os
+import re
+from typing import Any, BinaryIO, Callable, Dict, Iterable, List, Optional, Tuple
+
+from gdc_filtration_tools.bgzf import (
+    BgzfWriter,
+    decompress_block,
+    iter_blocks,
+    make_virtual_offset,
+    read_block,
+    split_virtual_offset,
+)
+from gdc_filtration_tools.reheader import find_header_end
+from gdc_filtration_tools.utils import STDIO_PATH
+from gdc_filtration_tools.vcfindex import find_index, read_index
+
+COPY = "copy"
+DROP = "drop"
+PROCESS = "process"
+
+_CONTIG_ID = re.compile(r"^##contig=<ID=([^,>]+)", re.M)
+
+
+def can_passthrough(reader: Any, input_vcf: str, output_vcf: str, mode: str) -> bool:
+    """
+    Checks whether contigs of ``input_vcf`` can be copied as raw blocks to
+    ``output_vcf``, i.e. the input is a bgzipped VCF file with an index that
+    has the per-contig pseudo-bin metadata and the output is a bgzipped VCF
+    (mode ``wz``) file.
+
+    :param reader: the open pysam.VariantFile of ``input_vcf``
+    :param input_vcf: the input file
+    :param output_vcf: the output file
+    :param mode: the pysam mode of the output
+    :return: True if contigs can be copied
+    """
+    if STDIO_PATH in (input_vcf, output_vcf) or not os.path.isfile(input_vcf):
+        return False
+    if reader.is_bcf or reader.compression != "BGZF" or mode != "wz":
+        return False
+    index_path = find_index(input_vcf)
+    return index_path is not None and read_index(index_path).has_metadata
+
+
+def read_header_text(input_vcf: str) -> str:
+    """
+    Returns the header of a bgzipped VCF as written in the file, up to and
+    including the ``#CHROM`` line. Unlike ``str(reader.header)`` it does not
+    include the contigs htslib adds from the index.
+    """
+    data = bytearray()
+    with open(input_vcf, "rb") as fh:
+        for _, block in iter_blocks(fh):
+            data.extend(decompress_block(block))
+            end = find_header_end(bytes(data))
+            if end is not None:
+                return data[:end].decode()
+    raise ValueError("No #CHROM line in {0}".format(input_vcf))
+
+
+def declared_contigs(header: str) -> List[str]:
+    """Returns the IDs of the contig lines of a header text."""
+    return _CONTIG_ID.findall(header)
+
+
+def _copy_range(fh: BinaryIO, writer: BgzfWriter, beg: int, end: int) -> None:
+    cbeg, ubeg = split_virtual_offset(beg)
+    cend, uend = split_virtual_offset(end)
+    fh.seek(cbeg)
+    block = read_block(fh)
+    if block is None:
+        raise ValueError("Index points past the end of the file")
+    if cbeg == cend:
+        writer.write(decompress_block(block)[ubeg:uend])
+        return
+
+    # Only the partial blocks at either end are recompressed
+    if ubeg == 0:
+        writer.write_block(block)
+    else:
+        writer.write(decompress_block(block)[ubeg:])
+    offset = cbeg + len(block)
+    while offset < cend:
+        block = read_block(fh)
+        if block is None:
+            raise ValueError("Index points past the end of the file")
+        writer.write_block(block)
+        offset += len(block)
+    if uend:
+        block = read_block(fh)
+        if block is None:
+            raise ValueError("Index points past the end of the file")
+        writer.write(decompress_block(block)[:uend])
+
+
+def _read_line(fh: BinaryIO, voffset: int) -> Tuple[bytes, int]:
+    # Returns the line at voffset and the offset of the next line
+    coffset, uoffset = split_virtual_offset(voffset)
+    line = bytearray()
+    fh.seek(coffset)
+    while True:
+        block = read_block(fh)
+        if block is None:
+            raise ValueError("Index points past the end of the file")
+        data = decompress_block(block)
+        end = data.find(b"\n", uoffset)
+        if end < 0:
+            line.extend(data[uoffset:])
+            coffset += len(block)
+            uoffset = 0
+            continue
+        line.extend(data[uoffset : end + 1])
+        if end + 1 == len(data):
+            return bytes(line), make_virtual_offset(coffset + len(block), 0)
+        return bytes(line), make_virtual_offset(coffset, end + 1)
+
+
+def _skip_head(
+    fh: BinaryIO, beg: int, end: int, skip: Callable[[bytes], bool]
+) -> Tuple[int, int]:
+    skipped = 0
+    while beg < end:
+        line, after = _read_line(fh, beg)
+        if not skip(line):
+            break
+        skipped += 1
+        beg = after
+    return beg, skipped
+
+
+def passthrough_vcf(
+    input_vcf: str,
+    output_vcf: str,
+    header: str,
+    decide: Callable[[str], str],
+    process: Optional[Callable[[str], Iterable[str]]] = None,
+    skip_head: Optional[Callable[[bytes], bool]] = None,
+) -> Dict[str, int]:
+    """
+    Writes ``output_vcf`` as ``header`` followed by the contigs of
+    ``input_vcf`` in file order, each copied, dropped or processed as
+    chosen by ``decide(contig)``. ``process(contig)`` returns the VCF lines
+    to write in place of a processed contig. The leading records of a
+    copied contig for which ``skip_head(line)`` is true are dropped; only
+    their raw lines are read.
+
+    :param input_vcf: the indexed bgzipped input VCF
+    :param output_vcf: the bgzipped output VCF
+    :param header: the complete header text, ending with the ``#CHROM`` line
+    :param decide: returns COPY, DROP or PROCESS for a contig
+    :param process: returns the output lines of a processed contig
+    :param skip_head: checks the raw lines at the head of each copied contig
+    :return: the number of input records of each action, from the index metadata
+    """
+    index_path = find_index(input_vcf)
+    if index_path is None:
+        raise ValueError("{0} is not indexed".format(input_vcf))
+    # CSI indexes of VCFs store the contig names like tabix indexes
+    index = read_index(index_path)
+    if not index.has_metadata:
+        raise ValueError("{0} has no per-contig metadata".format(index_path))
+
+    counts = {COPY: 0, DROP: 0, PROCESS: 0}
+    references = [i for i in index.references if i.n_mapped > 0]
+    with open(input_vcf, "rb") as fh, open(output_vcf, "wb") as out:
+        writer = BgzfWriter(out)
+        writer.write(header.encode())
+        for ref in sorted(references, key=lambda i: i.off_beg):
+            action = decide(ref.name)
+            if action not in counts:
+                raise ValueError("Unknown contig action: {0}".format(action))
+            counts[action] += ref.n_mapped
+            if action == COPY:
+                beg = ref.off_beg
+                if skip_head is not None:
+                    beg, skipped = _skip_head(fh, beg, ref.off_end, skip_head)
+                    counts[COPY] -= skipped
+                    counts[DROP] += skipped
+                if beg < ref.off_end:
+                    _copy_range(fh, writer, beg, ref.off_end)
+            elif action == PROCESS:
+                if process is None:
+                    raise ValueError("No process function for {0}".format(ref.name))
+                for line in process(ref.name):
+                    writer.write(line.encode())
+        writer.close()
+    return counts
@@ -0,0 +1,206 @@
+"""Runs the read, transform and write stages of a record loop in threads.
+
+The pysam tools read, change and write each record in turn on one thread,
+so decoding and decompressing the input and encoding and compressing the
+output stall the Python transform. ``run_pipeline`` moves reading and
+writing to their own threads, connected to the transform on the calling
+thread by bounded queues of record batches. htslib releases the GIL while
+it reads and writes, so the stages overlap, and a full queue holds back the
+stage that fills it. An exception in any stage stops the other two and is
+raised by ``run_pipeline``. With a single CPU the threads only add
+switching, so the stages run in turn on the calling thread instead.
+
+Only the reader stage touches the input, so the input position used for
+progress ETAs is read there and passed along with each batch.
+"""
+
+import os
+import queue
+import threading
+from typing import Any, Callable, Iterable, List, Optional, TypeVar
+
+from gdc_filtration_tools.logger import Logger, ProgressReporter
+
+T = TypeVar("T")
+U = TypeVar("U")
+
+# Records handed between stages at once, so queue locking is paid per batch
+BATCH_SIZE = 256
+
+# Batches waiting between two stages before the one in front blocks
+MAX_BATCHES = 16
+
+# Seconds a blocked stage waits before checking whether another stage failed
+_POLL = 0.1
+
+_DONE: Any = object()
+
+
+class _Stopped(Exception):
+    """Raised in a stage when another stage has failed."""
+
+
+def _put(q: "queue.Queue[Any]", item: Any, stop: threading.Event) -> None:
+    while True:
+        if stop.is_set():
+            raise _Stopped
+        try:
+            q.put(item, timeout=_POLL)
+            return
+        except queue.Full:
+            pass
+
+
+def _get(q: "queue.Queue[Any]", stop: threading.Event) -> Any:
+    while True:
+        if stop.is_set():
+            raise _Stopped
+        try:
+            return q.get(timeout=_POLL)
+        except queue.Empty:
+            pass
+
+
+class _Stage(threading.Thread):
+    """A pipeline thread that keeps its exception and stops the others."""
+
+    def __init__(
+        self, name: str, target: Callable[[], None], stop: threading.Event
+    ) -> None:
+        super().__init__(name=name, daemon=True)
+        self._run = target
+        self._stop_event = stop
+        self.error: Optional[BaseException] = None
+
+    def run(self) -> None:
+        try:
+            with Logger.span(self.name):
+                self._run()
+        except _Stopped:
+            pass
+        except BaseException as e:
+            self.error = e
+            self._stop_event.set()
+
+
+def run_pipeline(
+    records: Iterable[T],
+    transform: Callable[[T], Optional[U]],
+    write: Callable[[U], Any],
+    batch_size: int = BATCH_SIZE,
+    max_batches: int = MAX_BATCHES,
+    threaded: Optional[bool] = None,
+    progress: Optional[ProgressReporter] = None,
+) -> int:
+    """
+    Reads ``records`` on a reader thread, applies ``transform`` to each on
+    the calling thread and passes the results to ``write`` on a writer
+    thread, in input order. Records for which ``transform`` returns None are
+    dropped.
+
+    :param records: the input records, e.g. a pysam.VariantFile
+    :param transform: returns the record to write, or None to drop it
+    :param write: writes a record, e.g. ``writer.write``
+    :param batch_size: records passed between stages at once
+    :param max_batches: batches queued between stages before blocking
+    :param threaded: run the stages in threads. Defaults to whether there is
+        more than one CPU.
+    :param progress: updated with the number of records transformed
+    :return: the number of records written
+    """
+    if threaded is None:
+        threaded = (os.cpu_count() or 1) > 1
+    if not threaded:
+        total = 0
+        written = 0
+        for record in records:
+            result = transform(record)
+            total += 1
+            if progress is not None:
+                progress.update(total)
+            if result is not None:
+                write(result)
+                written += 1
+        return written
+
+    # the reader stage reads the input position after each batch and the
+    # reporter is given the position of the batch being transformed
+    position = progress.position if progress is not None else None
+    offset: Optional[int] = None
+
+    def read_position() -> Optional[int]:
+        if position is None:
+            return None
+        try:
+            return position()
+        except (OSError, ValueError):
+            return None
+
+    def batch_position() -> int:
+        if offset is None:
+            raise ValueError("The input position is unknown")
+        return offset
+
+    inbox: "queue.Queue[Any]" = queue.Queue(maxsize=max_batches)
+    outbox: "queue.Queue[Any]" = queue.Queue(maxsize=max_batches)
+    stop = threading.Event()
+
+    def read() -> None:
+        batch: List[T] = []
+        for record in records:
+            batch.append(record)
+            if len(batch) == batch_size:
+                _put(inbox, (batch, read_position()), stop)
+                batch = []
+        if batch:
+            _put(inbox, (batch, read_position()), stop)
+        _put(inbox, _DONE, stop)
+
+    def write_all() -> None:
+        while True:
+            batch = _get(outbox, stop)
+            if batch is _DONE:
+                return
+            for record in batch:
+                write(record)
+
+    reader = _Stage("read_records", read, stop)
+    writer = _Stage("write_records", write_all, stop)
+    reader.start()
+    writer.start()
+    total = 0
+    written = 0
+    if progress is not None:
+        progress.position = batch_position if position is not None else None
+    try:
+        while True:
+            item = _get(inbox, stop)
+            if item is _DONE:
+                break
+            batch, offset = item
+            out = []
+            for record in batch:
+                result = transform(record)
+                total += 1
+                if progress is not None:
+                    progress.update(total)
+                if result is not None:
+                    out.append(result)
+            if out:
+                _put(outbox, out, stop)
+                written += len(out)
+        _put(outbox, _DONE, stop)
+    except _Stopped:
+        pass
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        reader.join()
+        writer.join()
+        if progress is not None:
+            progress.position = position
+    for stage in (reader, writer):
+        if stage.error is not None:
+            raise stage.error
+    return written
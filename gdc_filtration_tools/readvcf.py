@@ -5,7 +5,10 @@ This aims to be a simple vcf reader class to allow the processing
 of vcf files with formats that cannot be appropriately interpreted by pysam
 
 
-VcfReader() will read a vcf file either uncompressed or compressed with gzip.
+VcfReader() will read a vcf file either uncompressed or compressed with gzip,
+or stdin when the filename is '-'. Records in a region can be read from an
+indexed BGZF file. Records are instances of a class compiled from the #CHROM
+line, with a property for each column, so any sample layout can be read.
 The header is read as a nested dictionary and available as a `header` proprerty.
 Each section of the header is available as top-level keys in the header. Lines
 from the sections below are aggregated:
@@ -22,19 +25,51 @@ unique to each section is used.
 
 import gzip
 import io
+import keyword
+import mmap
+import os
 import re
-from dataclasses import dataclass
-from typing import Callable, Generator, List, NamedTuple, Self, Tuple
+import sys
+from contextlib import nullcontext
+from functools import lru_cache
+from typing import (
+    IO,
+    BinaryIO,
+    Callable,
+    ContextManager,
+    Generator,
+    Iterable,
+    List,
+    Self,
+    Tuple,
+    cast,
+)
+
+from gdc_filtration_tools.bgzf import (
+    EOF_BLOCK,
+    decompress_block,
+    find_line_start,
+    iter_block_offsets,
+    iter_blocks,
+    iter_range,
+    make_virtual_offset,
+)
+from gdc_filtration_tools.utils import is_bgzf
+from gdc_filtration_tools.vcfindex import find_index
 
 TextIOWrapperT = io.TextIOWrapper
 
 
-@dataclass
-class GdcVcfRecord:
+class VcfRecord:
     """
-    Class for representing a vcf data row with the samples 'TUMOR' and 'NORMAL'
+    Base class of the record classes compiled by make_record_class for one column
+    layout. A record keeps its columns in a list and every column, including any
+    sample, is read and set by an index resolved when the class is compiled
     """
 
+    __slots__ = ("fields",)
+
+    # the fixed columns, compiled like any other column
     CHROM: str
     POS: str
     ID: str
@@ -44,75 +79,103 @@ class GdcVcfRecord:
     FILTER: str
     INFO: str
     FORMAT: str
-    NORMAL: str
-    TUMOR: str
-    COLUMN_NAMES: list[str]
+
+    COLUMN_NAMES: list[str] = []
+    COLUMN_INDEXES: dict[str, int] = {}
+    SAMPLE_NAMES: tuple[str, ...] = ()
+    SAMPLE_INDEXES: tuple[int, ...] = ()
+
+    def __init__(self, fields: list[str]) -> None:
+        self.fields = fields
 
     @classmethod
-    def from_line(cls, line: str, column_names: list[str]) -> Self:
-        """
-        create record from a vcf line and the ordered column_names
-        """
-        line_dict: dict[str, str] = {
-            k: v for k, v in zip(column_names, line.rstrip().split("\t"))
-        }
-        return cls(
-            CHROM=line_dict["CHROM"],
-            POS=line_dict["POS"],
-            ID=line_dict["ID"],
-            REF=line_dict["REF"],
-            ALT=line_dict["ALT"],
-            QUAL=line_dict["QUAL"],
-            FILTER=line_dict["FILTER"],
-            INFO=line_dict["INFO"],
-            FORMAT=line_dict["FORMAT"],
-            NORMAL=line_dict["NORMAL"],
-            TUMOR=line_dict["TUMOR"],
-            COLUMN_NAMES=column_names,
-        )
+    def from_line(cls, line: str) -> Self:
+        """
+        create record from a vcf line
+        """
+        return cls(line.rstrip().split("\t"))
 
-    def replace(
-        self,
-        CHROM: str | None = None,
-        POS: str | None = None,
-        ID: str | None = None,
-        REF: str | None = None,
-        ALT: str | None = None,
-        QUAL: str | None = None,
-        FILTER: str | None = None,
-        INFO: str | None = None,
-        FORMAT: str | None = None,
-        NORMAL: str | None = None,
-        TUMOR: str | None = None,
-        COLUMN_NAMES: list[str] | None = None,
-    ) -> Self:
-        """
-        Create a new instance of GdcVcfRecord with the given substitutions
-        """
-        return self.__class__(
-            CHROM=CHROM if CHROM is not None else self.CHROM,
-            POS=POS if POS is not None else self.POS,
-            ID=ID if ID is not None else self.ID,
-            REF=REF if REF is not None else self.REF,
-            ALT=ALT if ALT is not None else self.ALT,
-            QUAL=QUAL if QUAL is not None else self.QUAL,
-            FILTER=FILTER if FILTER is not None else self.FILTER,
-            INFO=INFO if INFO is not None else self.INFO,
-            FORMAT=FORMAT if FORMAT is not None else self.FORMAT,
-            NORMAL=NORMAL if NORMAL is not None else self.NORMAL,
-            TUMOR=TUMOR if TUMOR is not None else self.TUMOR,
-            COLUMN_NAMES=COLUMN_NAMES
-            if COLUMN_NAMES is not None
-            else self.COLUMN_NAMES,
-        )
+    @property
+    def samples(self) -> list[str]:
+        """
+        the sample columns, in the order of SAMPLE_NAMES
+        """
+        return self.fields[9:]
+
+    def __getattr__(self, name: str) -> str:
+        # only reached for columns without a compiled property
+        if name != "fields" and name in self.COLUMN_INDEXES:
+            return self.fields[self.COLUMN_INDEXES[name]]
+        raise AttributeError(name)
+
+    def get(self, name: str) -> str:
+        """
+        returns the column called name, e.g. a sample name that is not an identifier
+        """
+        return self.fields[self.COLUMN_INDEXES[name]]
+
+    def replace(self, **columns: str | None) -> Self:
+        """
+        Create a new record with the given column substitutions
+        """
+        fields = list(self.fields)
+        for name, value in columns.items():
+            if value is not None:
+                fields[self.COLUMN_INDEXES[name]] = value
+        return self.__class__(fields)
 
     def __str__(self) -> str:
         """
-        String representation as a tab-separated row of columns ordered
-        by self.COLUMN_NAMES
+        String representation as a tab-separated row of columns
         """
-        fields_in_order = [getattr(self, field) for field in self.COLUMN_NAMES]
-        return "\t".join(fields_in_order)
+        return "\t".join(self.fields)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.fields!r})"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, VcfRecord):
+            return NotImplemented
+        return self.COLUMN_NAMES == other.COLUMN_NAMES and self.fields == other.fields
+
+
+def _column_property(index: int) -> property:
+    def fget(self: VcfRecord) -> str:
+        return self.fields[index]
+
+    def fset(self: VcfRecord, value: str) -> None:
+        self.fields[index] = value
+
+    return property(fget, fset)
+
+
+@lru_cache(maxsize=None)
+def _compile_record_class(column_names: tuple[str, ...]) -> type[VcfRecord]:
+    namespace: dict[str, object] = {
+        "__slots__": (),
+        "COLUMN_NAMES": list(column_names),
+        "COLUMN_INDEXES": {name: i for i, name in enumerate(column_names)},
+        "SAMPLE_NAMES": column_names[9:],
+        "SAMPLE_INDEXES": tuple(range(9, len(column_names))),
+    }
+    for i, name in enumerate(column_names):
+        # sample names that are not identifiers are read with get()
+        if (
+            name.isidentifier()
+            and not keyword.iskeyword(name)
+            and not hasattr(VcfRecord, name)
+        ):
+            namespace[name] = _column_property(i)
+    return type("VcfRecord", (VcfRecord,), namespace)
+
+
+def make_record_class(column_names: list[str]) -> type[VcfRecord]:
+    """
+    Returns the record class for a column layout, e.g. VcfReader.column_names. Each
+    column is a property reading its index, so parsing a line is one split with no
+    dict or name lookups. Classes are compiled once per layout
+    """
+    return _compile_record_class(tuple(column_names))
 
 
 class VcfSectionTracker:
@@ -224,6 +287,9 @@ class VcfReader:
         self.header: dict[str, dict[str, str]] = {}
         self.filename: str = vcf_filename
         self.records_offset: int | None = None
+        self._handle: IO | None = None
+        self._stdin: IO | None = None
+        self._mapped_position: int | None = None
         self.open_fn: Callable = self._get_open_function()
         self._get_header()
 
@@ -258,17 +324,258 @@ class VcfReader:
             header[sid] = section
         return header
 
-    def iter_rows(self) -> Generator[GdcVcfRecord, None, None]:
+    def iter_rows(self, region: str | None = None) -> Generator[VcfRecord, None, None]:
         """
-        returns an iterator over the variant records
+        returns an iterator over the variant records, or over the records that start in
+        region, e.g. 'chr1:1-1000000', using the index of a BGZF file. The records are
+        instances of the record class compiled for the column layout of the file
         """
+        if region is not None:
+            record_class = self.record_class
+            for line in self.iter_region_lines(region):
+                yield record_class.from_line(line)
+            return
         with self.open_fn(self.filename, "rt") as vcf:
-            vcf.seek(self.records_offset)
-            for column_header_line in vcf:
-                column_headers: list[str] = column_header_line[1:].rstrip().split("\t")
-                break
+            self._handle = vcf
+            column_headers: list[str] = []
+            if self._stdin is None:
+                vcf.seek(self.records_offset)
+                for column_header_line in vcf:
+                    column_headers = column_header_line[1:].rstrip().split("\t")
+                    break
+            else:
+                # a stream is read once, so it is already past the header
+                for column_header_line in self.header.get("COLUMN_NAMES", {}).values():
+                    column_headers = column_header_line[1:].rstrip().split("\t")
+            from_line = make_record_class(column_headers).from_line
             for line in vcf:
-                yield GdcVcfRecord.from_line(line, column_headers)
+                yield from_line(line)
+
+    def iter_region_lines(self, region: str) -> Generator[str, None, None]:
+        """
+        returns an iterator over the raw lines of the records that start in region, without
+        line endings. Records that only overlap the region are skipped, so adjacent regions
+        never share a record. Needs a BGZF file with a .tbi or .csi index
+        """
+        index = None if self._stdin is not None else find_index(self.filename)
+        if index is None or not self.is_bgzf:
+            raise ValueError(
+                f"Region queries need an indexed BGZF file: {self.filename}"
+            )
+        # Imported here so reading a whole file does not pay for importing pysam.
+        import pysam
+
+        with pysam.TabixFile(self.filename, index=index, encoding="utf-8") as tbx:
+            # contig names may contain ':'
+            contig, start, end = (
+                (region, 1, None) if region in tbx.contigs else parse_region(region)
+            )
+            if contig not in tbx.contigs:
+                return
+            for line in tbx.fetch(contig, start - 1, end):
+                pos = int(line.split("\t", 2)[1])
+                if pos >= start:
+                    yield line
+
+    def iter_lines(self) -> Generator[str, None, None]:
+        """
+        returns an iterator over the raw variant record lines, line endings included
+        """
+        with self.open_fn(self.filename, "rt") as vcf:
+            self._handle = vcf
+            if self._stdin is None:
+                vcf.seek(self.records_offset)
+                # skip the column header line
+                vcf.readline()
+            yield from vcf
+
+    def iter_raw_lines(
+        self,
+        chunk_size: int = 1 << 20,
+        start: int | None = None,
+        end: int | None = None,
+        region: str | None = None,
+    ) -> Generator[bytes, None, None]:
+        """
+        returns an iterator over the variant record lines as bytes, without line endings.
+        The file is read in binary chunks and split on newlines, so nothing is decoded.
+        Uncompressed files are memory-mapped and, like BGZF files, can be read from a
+        range made of whole lines, e.g. from split_records. With region only the records
+        that start in it are read, as with iter_region_lines
+        """
+        if region is not None:
+            for text in self.iter_region_lines(region):
+                yield text.encode()
+            return
+        if self._stdin is not None:
+            # the header was read through the text stream, which holds the buffered records
+            for line in self._stdin:
+                yield line.rstrip("\r\n").encode()
+            return
+        if self.is_mapped:
+            yield from self._iter_mapped_lines(chunk_size, start, end)
+            return
+        if start is not None or end is not None:
+            if not self.is_bgzf:
+                raise ValueError("Byte ranges need an uncompressed or BGZF file")
+            with open(self.filename, "rb") as fh:
+                self._handle = fh
+                # ranges are virtual offsets
+                start = self._bgzf_records_start(fh) if start is None else start
+                end = self._bgzf_end(fh) if end is None else end
+                yield from _split_lines(iter_range(fh, start, end))
+            return
+        with self.open_fn(self.filename, "rb") as vcf:
+            self._handle = vcf
+            vcf.seek(self.records_offset)
+            # skip the column header line
+            vcf.readline()
+            yield from _split_lines(iter(lambda: vcf.read(chunk_size), b""))
+
+    @property
+    def is_mapped(self) -> bool:
+        """
+        True if the records are read through a memory map, i.e. the input is an
+        uncompressed file
+        """
+        return self._stdin is None and self.open_fn is open
+
+    @property
+    def is_bgzf(self) -> bool:
+        """
+        True if the input is a BGZF compressed file, whose records can be split at
+        BGZF virtual offsets
+        """
+        return (
+            self._stdin is None and self.open_fn is gzip.open and is_bgzf(self.filename)
+        )
+
+    def split_records(self, n: int) -> List[Tuple[int, int]]:
+        """
+        splits the records of an uncompressed or BGZF file into at most n ranges that
+        start and end at line boundaries, for iter_raw_lines. The ranges of a BGZF file
+        are virtual offsets and are cut at block boundaries.
+        """
+        if not self.is_mapped:
+            if not self.is_bgzf:
+                raise ValueError("Byte ranges need an uncompressed or BGZF file")
+            return self._split_bgzf_records(n)
+        with self._map() as data:
+            start = self._records_start(data)
+            end = len(data)
+            bounds = [start]
+            for i in range(1, n):
+                cut = data.find(b"\n", start + (end - start) * i // n) + 1
+                if cut <= 0:
+                    break
+                if cut > bounds[-1]:
+                    bounds.append(cut)
+            if end > bounds[-1]:
+                bounds.append(end)
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def _split_bgzf_records(self, n: int) -> List[Tuple[int, int]]:
+        with open(self.filename, "rb") as fh:
+            start = self._bgzf_records_start(fh)
+            end = self._bgzf_end(fh)
+            fh.seek(start >> 16)
+            blocks = list(iter_block_offsets(fh))
+            bounds = [start]
+            for i in range(1, n):
+                # only the block a range starts in is searched for a newline
+                cut = find_line_start(
+                    fh, make_virtual_offset(blocks[len(blocks) * i // n], 0)
+                )
+                if cut >= end:
+                    break
+                if cut > bounds[-1]:
+                    bounds.append(cut)
+            if end > bounds[-1]:
+                bounds.append(end)
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def _bgzf_records_start(self, fh: BinaryIO) -> int:
+        # records_offset is the uncompressed offset of the column header line
+        fh.seek(0)
+        offset = 0
+        for coffset, block in iter_blocks(fh):
+            size = len(decompress_block(block))
+            if offset + size > (self.records_offset or 0):
+                voffset = make_virtual_offset(
+                    coffset, (self.records_offset or 0) - offset
+                )
+                return find_line_start(fh, voffset)
+            offset += size
+        return self._bgzf_end(fh)
+
+    def _bgzf_end(self, fh: BinaryIO) -> int:
+        # a line ending a block is followed by the EOF block, not the end of the file
+        size = fh.seek(0, os.SEEK_END)
+        if size >= len(EOF_BLOCK):
+            fh.seek(size - len(EOF_BLOCK))
+            if fh.read() == EOF_BLOCK:
+                size -= len(EOF_BLOCK)
+        return make_virtual_offset(size, 0)
+
+    def _map(self) -> ContextManager[mmap.mmap | bytes]:
+        with open(self.filename, "rb") as fh:
+            if os.fstat(fh.fileno()).st_size == 0:
+                return nullcontext(b"")
+            # the map stays valid after the file is closed
+            return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _records_start(self, data: mmap.mmap | bytes) -> int:
+        # records_offset is at the column header line
+        eol = data.find(b"\n", self.records_offset or 0)
+        return len(data) if eol < 0 else eol + 1
+
+    def _iter_mapped_lines(
+        self, chunk_size: int, start: int | None, end: int | None
+    ) -> Generator[bytes, None, None]:
+        with self._map() as data:
+            pos = self._records_start(data) if start is None else start
+            end = len(data) if end is None else end
+            while pos < end:
+                # slice whole lines so a chunk is split in one call
+                cut = min(pos + chunk_size, end)
+                if cut < end:
+                    eol = data.rfind(b"\n", pos, cut)
+                    cut = data.find(b"\n", cut, end) if eol < 0 else eol
+                    cut = end if cut < 0 else cut + 1
+                self._mapped_position = cut
+                lines = data[pos:cut].split(b"\n")
+                if lines[-1] == b"":
+                    lines.pop()
+                for line in lines:
+                    yield line.rstrip(b"\r")
+                pos = cut
+
+    @property
+    def record_class(self) -> type[VcfRecord]:
+        """
+        the record class compiled for the column layout of the header
+        """
+        return make_record_class(self.column_names)
+
+    @property
+    def column_names(self) -> list[str]:
+        """
+        the names of the columns from the column header line, without the '#'
+        """
+        for column_header_line in self.header.get("COLUMN_NAMES", {}).values():
+            return column_header_line[1:].rstrip().split("\t")
+        return []
+
+    def tell_raw(self) -> int:
+        """
+        Returns the byte offset reached in the file on disk by the current
+        iter_rows call. For compressed inputs this is the compressed offset.
+        """
+        if self._mapped_position is not None:
+            return self._mapped_position
+        if self._handle is None or self._handle.closed:
+            return 0
+        return os.lseek(self._handle.fileno(), 0, os.SEEK_CUR)
 
     def iter_header_lines(self) -> Generator[str, None, None]:
         for sid, section in self.header.items():
@@ -276,11 +583,26 @@ class VcfReader:
                 yield section[key]
 
     def _get_open_function(self) -> Callable:
+        if self.filename == "-":
+            return self._open_stdin
         if self.filename.endswith(".gz"):
             return gzip.open
         else:
             return open
 
+    def _open_stdin(self, filename: str, mode: str) -> ContextManager[IO]:
+        """
+        Returns stdin, decompressing it if it is gzip or BGZF compressed.
+        Both passes over the file share the stream, which is never closed.
+        """
+        if self._stdin is None:
+            buffer = cast(io.BufferedReader, sys.stdin.buffer)
+            if buffer.peek(2)[:2] == b"\x1f\x8b":
+                self._stdin = io.TextIOWrapper(gzip.GzipFile(fileobj=buffer))
+            else:
+                self._stdin = sys.stdin
+        return nullcontext(self._stdin)
+
     def _read_header_sections(
         self,
     ) -> Generator[Tuple[str | None, List[str]], None, None]:
@@ -308,24 +630,39 @@ class VcfReader:
             line = vcf.readline().rstrip()
             while line:
                 if line.startswith("##"):
-                    self.records_offset = vcf.tell()
+                    if self._stdin is None:
+                        self.records_offset = vcf.tell()
                     yield line
                 elif line.startswith("#"):
+                    # stop at the column header so streams are left at the records
                     yield line
+                    break
                 else:
                     break
                 line = vcf.readline().rstrip()
 
 
-class VcfRecordNoSample(NamedTuple):
-    CHROM: str
-    POS: int
-    ID: str
-    REF: str
-    ALT: str
-    QUAL: int | str
-    FILTER: str
-    INFO: str
-    FORMAT: str
-    NORMAL: str
-    TUMOR: str
+def parse_region(region: str) -> Tuple[str, int, int | None]:
+    """
+    Splits a region such as 'chr1', 'chr1:100' or 'chr1:100-200' into its contig and
+    1-based inclusive start and end, with None for an open end
+    """
+    contig, sep, span = region.rpartition(":")
+    if not sep or not re.fullmatch(r"[0-9,]+(-[0-9,]*)?", span):
+        return region, 1, None
+    beg, _, end = span.replace(",", "").partition("-")
+    if end and int(end) < int(beg):
+        raise ValueError(f"Invalid region: {region}")
+    return contig, max(int(beg), 1), int(end) if end else None
+
+
+def _split_lines(chunks: Iterable[bytes]) -> Generator[bytes, None, None]:
+    # splits binary chunks into lines, carrying partial lines to the next chunk
+    rest = b""
+    for chunk in chunks:
+        lines = (rest + chunk).split(b"\n")
+        rest = lines.pop()
+        for line in lines:
+            yield line.rstrip(b"\r")
+    if rest:
+        yield rest.rstrip(b"\r")
@@ -0,0 +1,137 @@
+"""Replaces the header of a VCF without decoding its records.
+
+Plain VCFs are rewritten as the new header followed by a byte copy of the
+record section. For bgzipped VCFs only the header and the block holding
+the first record are recompressed; every following block is copied
+verbatim and the tabix/CSI index of the input is reused with its offsets
+shifted to the new block positions.
+"""
+
+import os
+import shutil
+from typing import Any, BinaryIO, List, Optional
+
+from gdc_filtration_tools.bgzf import (
+    BLOCK_SIZE,
+    BgzfWriter,
+    compress_block,
+    decompress_block,
+    iter_blocks,
+    make_virtual_offset,
+    split_virtual_offset,
+)
+from gdc_filtration_tools.utils import STDIO_PATH
+from gdc_filtration_tools.vcfindex import find_index, remap_index
+
+
+def can_reheader(reader: Any, input_vcf: str, output_vcf: str, mode: str) -> bool:
+    """
+    Checks whether the records of ``input_vcf`` can be copied verbatim to
+    ``output_vcf``, i.e. both are files and are plain VCF (mode ``w``) or
+    bgzipped VCF (mode ``wz``).
+
+    :param reader: the open pysam.VariantFile of ``input_vcf``
+    :param input_vcf: the input file
+    :param output_vcf: the output file
+    :param mode: the pysam mode of the output
+    :return: True if the records can be copied
+    """
+    if STDIO_PATH in (input_vcf, output_vcf) or not os.path.isfile(input_vcf):
+        return False
+    if reader.is_bcf:
+        return False
+    return (reader.compression, mode) in (("NONE", "w"), ("BGZF", "wz"))
+
+
+def find_header_end(data: bytes) -> Optional[int]:
+    """
+    Returns the offset of the first byte after the ``#CHROM`` line of
+    ``data``, or None if the line is not complete yet.
+    """
+    if data.startswith(b"#CHROM"):
+        start = 0
+    else:
+        start = data.find(b"\n#CHROM") + 1
+        if start == 0:
+            return None
+    end = data.find(b"\n", start)
+    return None if end < 0 else end + 1
+
+
+def reheader_vcf(input_vcf: str, output_vcf: str, header: str) -> Optional[str]:
+    """
+    Writes ``output_vcf`` as ``header`` followed by the records of
+    ``input_vcf``, copied without decoding them.
+
+    :param input_vcf: the plain or bgzipped input VCF
+    :param output_vcf: the output VCF, in the same format as the input
+    :param header: the complete header text, ending with the ``#CHROM`` line
+    :return: the path of the reused index, or None if the output still needs indexing
+    """
+    with open(input_vcf, "rb") as fh, open(output_vcf, "wb") as out:
+        if fh.peek(4)[:4] != b"\x1f\x8b\x08\x04":
+            _reheader_text(fh, out, header.encode())
+            return None
+        return _reheader_bgzf(input_vcf, fh, out, header.encode(), output_vcf)
+
+
+def _reheader_text(fh: BinaryIO, out: BinaryIO, header: bytes) -> None:
+    for line in fh:
+        if line.startswith(b"#CHROM"):
+            break
+    out.write(header)
+    shutil.copyfileobj(fh, out, 1 << 20)
+
+
+def _reheader_bgzf(
+    input_vcf: str, fh: BinaryIO, out: BinaryIO, header: bytes, output_vcf: str
+) -> Optional[str]:
+    writer = BgzfWriter(out)
+
+    # Find the block holding the first record
+    buffer = bytearray()
+    header_end = None
+    consumed = 0
+    for coffset, block in iter_blocks(fh):
+        data = decompress_block(block)
+        if header_end is None:
+            buffer.extend(data)
+            header_end = find_header_end(bytes(buffer))
+        if header_end is not None and header_end < consumed + len(data):
+            break
+        consumed += len(data)
+    else:
+        # No records
+        writer.write(header)
+        writer.close()
+        return None
+
+    # Recompress the header and the rest of the first record block
+    uoffset = header_end - consumed
+    payload = header + data[uoffset:]
+    offsets: List[int] = []
+    for i in range(0, len(payload), BLOCK_SIZE):
+        offsets.append(writer.offset)
+        writer.write_block(compress_block(payload[i : i + BLOCK_SIZE]))
+    delta = writer.offset - (coffset + len(block))
+
+    # The remaining blocks, including the EOF block, are copied verbatim
+    shutil.copyfileobj(fh, out, 1 << 20)
+
+    def remap(voffset: int) -> int:
+        block_offset, within = split_virtual_offset(voffset)
+        if block_offset > coffset:
+            return make_virtual_offset(block_offset + delta, within)
+        # Offsets before the first record map to the start of the records
+        if block_offset < coffset:
+            within = uoffset
+        pos = len(header) + max(within - uoffset, 0)
+        idx = min(pos // BLOCK_SIZE, len(offsets) - 1)
+        return make_virtual_offset(offsets[idx], pos - idx * BLOCK_SIZE)
+
+    index_path = find_index(input_vcf)
+    if index_path is None or os.path.getmtime(index_path) < os.path.getmtime(input_vcf):
+        return None
+    output_index = output_vcf + os.path.splitext(index_path)[1]
+    remap_index(index_path, output_index, remap)
+    return output_index
@@ -0,0 +1,319 @@
+"""Applies simple per-record edits to the raw text of VCF records.
+
+Formatters that only set a genotype, rename an INFO key or add a filter do
+not need htslib to decode and re-encode every record. Each edit here works
+on the tab separated columns of a record line read by ``VcfReader`` and
+only splits the column it changes, so no record objects are built.
+"""
+
+from contextlib import contextmanager
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+)
+
+from gdc_filtration_tools.bgzf import BgzfWriter
+from gdc_filtration_tools.formatcodec import get_codec
+from gdc_filtration_tools.logger import ProgressReporter
+from gdc_filtration_tools.readvcf import VcfReader
+from gdc_filtration_tools.utils import STDIO_PATH, open_text
+
+# Records joined into each write
+CHUNK_LINES = 1024
+
+
+class Edit(object):
+    """Base class of the edits applied by a RecordRewriter."""
+
+    def bind(self, columns: Dict[str, int]) -> None:
+        """Looks up the indexes of the columns the edit works on."""
+
+    def apply(self, fields: List[str], changed: Set["Edit"]) -> bool:
+        """
+        Edits the columns of a record in place.
+
+        :param fields: the tab separated columns of the record
+        :param changed: the edits that already changed this record
+        :return: True if the record was changed
+        """
+        raise NotImplementedError
+
+
+def _column(columns: Dict[str, int], name: str) -> int:
+    if name not in columns:
+        raise ValueError("No {0} column in the VCF".format(name))
+    return columns[name]
+
+
+class SetSampleGT(Edit):
+    """
+    Sets the GT of a sample, adding the GT key to every sample if it is
+    missing. With ``replace`` only those genotypes are changed.
+    """
+
+    def __init__(
+        self, sample: str, gt: str, replace: Optional[Iterable[str]] = None
+    ) -> None:
+        self.sample = sample
+        self.gt = gt
+        self.replace = None if replace is None else set(replace)
+
+    def bind(self, columns: Dict[str, int]) -> None:
+        self.format_index = _column(columns, "FORMAT")
+        self.sample_index = _column(columns, self.sample)
+        self.sample_indexes = [i for i in columns.values() if i > self.format_index]
+
+    def apply(self, fields: List[str], changed: Set[Edit]) -> bool:
+        codec = get_codec(fields[self.format_index])
+        value = fields[self.sample_index]
+        current = codec.get(value, "GT") or "."
+        if current == self.gt or (
+            self.replace is not None and current not in self.replace
+        ):
+            return False
+
+        if "GT" not in codec.index:
+            # GT must be the first key
+            codec = codec.prepend("GT")
+            fields[self.format_index] = codec.format
+            for i in self.sample_indexes:
+                fields[i] = ".:" + fields[i]
+            value = fields[self.sample_index]
+        fields[self.sample_index] = codec.set(value, "GT", self.gt)
+        return True
+
+
+class RenameInfoKey(Edit):
+    """Renames an INFO key, keeping its value and position."""
+
+    def __init__(self, old: str, new: str) -> None:
+        self.old = old
+        self.new = new
+
+    def bind(self, columns: Dict[str, int]) -> None:
+        self.info_index = _column(columns, "INFO")
+
+    def apply(self, fields: List[str], changed: Set[Edit]) -> bool:
+        info = fields[self.info_index]
+        if self.old not in info:
+            return False
+        items = info.split(";")
+        for i, item in enumerate(items):
+            key, sep, value = item.partition("=")
+            if key == self.old:
+                items[i] = self.new + sep + value
+                fields[self.info_index] = ";".join(items)
+                return True
+        return False
+
+
+class DropRedundantEnd(Edit):
+    """
+    Removes the INFO END key unless it ends the record after the last base of
+    REF, as pysam does when it writes a record. An END before POS or without
+    a number is ignored by htslib and removed too. A kept END is moved to
+    the front, where the record formatters write it.
+    """
+
+    def bind(self, columns: Dict[str, int]) -> None:
+        self.pos_index = _column(columns, "POS")
+        self.ref_index = _column(columns, "REF")
+        self.info_index = _column(columns, "INFO")
+
+    def apply(self, fields: List[str], changed: Set[Edit]) -> bool:
+        info = fields[self.info_index]
+        if info.startswith("END="):
+            start = 0
+        else:
+            start = info.find(";END=") + 1
+            if start == 0:
+                return False
+        stop = info.find(";", start)
+        value = info[start + 4 :] if stop < 0 else info[start + 4 : stop]
+        pos = int(fields[self.pos_index])
+        end = int(value) if value.isdigit() else 0
+        if end >= pos and end != pos + len(fields[self.ref_index]) - 1:
+            if start == 0:
+                return False
+            if stop < 0:
+                fields[self.info_index] = info[start:] + ";" + info[: start - 1]
+            else:
+                fields[self.info_index] = (
+                    info[start:stop] + ";" + info[: start - 1] + info[stop:]
+                )
+            return True
+        if stop < 0:
+            info = info[: max(start - 1, 0)]
+        else:
+            info = info[:start] + info[stop + 1 :]
+        fields[self.info_index] = info or "."
+        return True
+
+
+class AddInfoFlag(Edit):
+    """
+    Appends an INFO flag, or with ``after`` only to the records changed by
+    that edit. With ``first`` the flag is inserted before the other keys.
+    """
+
+    def __init__(
+        self, key: str, after: Optional[Edit] = None, first: bool = False
+    ) -> None:
+        self.key = key
+        self.after = after
+        self.first = first
+
+    def bind(self, columns: Dict[str, int]) -> None:
+        self.info_index = _column(columns, "INFO")
+
+    def apply(self, fields: List[str], changed: Set[Edit]) -> bool:
+        if self.after is not None and self.after not in changed:
+            return False
+        info = fields[self.info_index]
+        if info == ".":
+            fields[self.info_index] = self.key
+            return True
+        if self.key in info.split(";"):
+            return False
+        if self.first:
+            fields[self.info_index] = self.key + ";" + info
+        else:
+            fields[self.info_index] = info + ";" + self.key
+        return True
+
+
+class AppendFilter(Edit):
+    """
+    Appends a filter, replacing PASS, or with ``when`` only to the records
+    for which ``when(fields)`` is true.
+    """
+
+    def __init__(
+        self, name: str, when: Optional[Callable[[List[str]], bool]] = None
+    ) -> None:
+        self.name = name
+        self.when = when
+
+    def bind(self, columns: Dict[str, int]) -> None:
+        self.filter_index = _column(columns, "FILTER")
+
+    def apply(self, fields: List[str], changed: Set[Edit]) -> bool:
+        if self.when is not None and not self.when(fields):
+            return False
+        current = fields[self.filter_index]
+        if current in ("PASS", "."):
+            fields[self.filter_index] = self.name
+            return True
+        if self.name in current.split(";"):
+            return False
+        fields[self.filter_index] = current + ";" + self.name
+        return True
+
+
+class RecordRewriter(object):
+    """Applies a sequence of edits, in order, to raw record lines."""
+
+    def __init__(self, column_names: Sequence[str], edits: Sequence[Edit]) -> None:
+        columns = {name: i for i, name in enumerate(column_names)}
+        self.ncolumns = len(columns)
+        self.edits = list(edits)
+        for edit in self.edits:
+            edit.bind(columns)
+
+    def rewrite(self, line: str) -> str:
+        """
+        Returns the edited record line.
+
+        :param line: the record line, with or without its line ending
+        :return: the edited line, ending with a newline
+        """
+        fields = line.rstrip("\r\n").split("\t")
+        if len(fields) < self.ncolumns:
+            raise ValueError("Expected {0} columns: {1}".format(self.ncolumns, line))
+        changed: Set[Edit] = set()
+        for edit in self.edits:
+            if edit.apply(fields, changed):
+                changed.add(edit)
+        return "\t".join(fields) + "\n"
+
+
+def can_rewrite(reader: Any, input_vcf: str, output_vcf: str, mode: str) -> bool:
+    """
+    Checks whether the records of ``input_vcf`` can be edited as text, i.e.
+    the input is a plain VCF file or a gzipped one ending with '.gz' and the
+    output is a VCF (mode ``w``) or a bgzipped VCF (mode ``wz``) file.
+
+    :param reader: the open pysam.VariantFile of ``input_vcf``
+    :param input_vcf: the input file
+    :param output_vcf: the output file
+    :param mode: the pysam mode of the output
+    :return: True if the records can be edited as text
+    """
+    if input_vcf == STDIO_PATH or reader.is_bcf:
+        return False
+    # VcfReader picks gzip by the extension
+    if reader.compression != "NONE" and not input_vcf.endswith(".gz"):
+        return False
+    return mode == "w" or (mode == "wz" and output_vcf != STDIO_PATH)
+
+
+@contextmanager
+def _open_output(
+    output_vcf: str, mode: str
+) -> Generator[Callable[[str], Any], None, None]:
+    if mode != "wz":
+        with open_text(output_vcf, "wt") as fh:
+            yield fh.write
+        return
+    with open(output_vcf, "wb") as out:
+        writer = BgzfWriter(out)
+        yield lambda text: writer.write(text.encode())
+        writer.close()
+
+
+def rewrite_vcf(
+    reader: VcfReader,
+    output_vcf: str,
+    header: str,
+    edits: Sequence[Edit],
+    mode: str,
+    progress: Optional[ProgressReporter] = None,
+) -> int:
+    """
+    Writes ``output_vcf`` as ``header`` followed by the records of
+    ``reader`` with ``edits`` applied.
+
+    :param reader: the input VCF
+    :param output_vcf: the output VCF
+    :param header: the complete header text, ending with the ``#CHROM`` line
+    :param edits: the edits to apply to every record
+    :param mode: the pysam mode of the output, ``w`` or ``wz``
+    :param progress: reports the number of records written
+    :return: the number of records written
+    """
+    rewriter = RecordRewriter(reader.column_names, edits)
+    total = 0
+    chunk: List[str] = []
+    with _open_output(output_vcf, mode) as write:
+        write(header)
+        for line in reader.iter_lines():
+            if not line.strip():
+                continue
+            chunk.append(rewriter.rewrite(line))
+            total += 1
+            if len(chunk) == CHUNK_LINES:
+                write("".join(chunk))
+                chunk.clear()
+                if progress is not None:
+                    progress.update(total)
+        write("".join(chunk))
+    if progress is not None:
+        progress.update(total)
+    return total
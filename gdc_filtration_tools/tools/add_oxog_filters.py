@@ -5,73 +5,150 @@ it mutates the header to add the 'oxog' filter metadata.
 @author: Kyle Hernandez <kmhernan@uchicago.edu>
 """
 
+import logging
+from typing import Iterator, Optional, Tuple
+
 import pysam
 
 from gdc_filtration_tools.logger import Logger
-from gdc_filtration_tools.utils import get_pysam_outmode
-
-
-def add_oxog_filters(input_vcf: str, input_dtoxog: str, output_vcf: str) -> None:
+from gdc_filtration_tools.passthrough import (
+    COPY,
+    PROCESS,
+    can_passthrough,
+    passthrough_vcf,
+)
+from gdc_filtration_tools.pipeline import run_pipeline
+from gdc_filtration_tools.utils import (
+    OutputTypeT,
+    PysamModeT,
+    get_pysam_outmode,
+    index_vcf,
+)
+
+
+def add_oxog_filters(
+    input_vcf: str,
+    input_dtoxog: str,
+    output_vcf: str,
+    *,
+    output_type: Optional[OutputTypeT] = None,
+) -> None:
     """
     Adds 'oxog' filter tag to VCFs.
 
     :param input_vcf: The full input VCF file to filter.
     :param input_dtoxog: The dtoxog VCF from dtoxog-maf-to-vcf used to annotate the full input VCF.
-    :param output_vcf: The output filtered VCF file to create. BGzip and tabix-index created if ends with '.gz'.
+    :param output_vcf: The output filtered VCF file to create. BGzip and tabix-index created if ends with '.gz', BCF and CSI-index if ends with '.bcf'.
+    :param output_type: Output format: v (VCF), z (bgzipped VCF), b (BCF) or u (uncompressed BCF). Defaults to the output file extension.
     """
     logger = Logger.get_logger("add_oxog_filters")
     logger.info("Adds dtoxog filters to VCF.")
 
-    # setup
-    total = 0
-    tagged = 0
-    written = 0
-
     # Full vcf reader
-    reader = pysam.VariantFile(input_vcf)
+    with Logger.span("open_input"):
+        reader = pysam.VariantFile(input_vcf)
     filter_tag = "oxog"
     reader.header.filters.add(filter_tag, None, None, "Failed dToxoG")
 
     # Writer
-    mode = get_pysam_outmode(output_vcf)
-    writer = pysam.VariantFile(output_vcf, mode=mode, header=reader.header)
+    mode = get_pysam_outmode(output_vcf, output_type)
 
     # dtoxog reader
     dtoxog_reader = pysam.VariantFile(input_dtoxog)
 
     # Process
     try:
-        for record in reader.fetch():
-            total += 1
-            region = "{0}:{1}-{2}".format(record.contig, record.pos, record.pos)
-            try:
-                for row in dtoxog_reader.fetch(region=region):
-                    assert isinstance(record.ref, str) and isinstance(row.ref, str)
-                    if record.pos == row.pos and record.ref.upper() == row.ref.upper():
-                        # Add filter if failed oxog
-                        record.filter.add("oxog")
-                        tagged += 1
-                        break
-            except ValueError:
-                pass
-
-            # handle case where the INFO column is '.'
-            for i in record.info:
-                if i == ".":
-                    del record.info[i]
-
-            written += 1
-            writer.write(record)
-
+        if can_passthrough(reader, input_vcf, output_vcf, mode):
+            total, tagged = _passthrough_records(
+                logger, reader, dtoxog_reader, input_vcf, output_vcf
+            )
+        else:
+            total, tagged = _tag_records(reader, dtoxog_reader, output_vcf, mode)
     finally:
         reader.close()
-        writer.close()
         dtoxog_reader.close()
 
-    if output_vcf.endswith(".gz"):
-        logger.info("Creating tabix index...")
-        pysam.tabix_index(output_vcf, preset="vcf", force=True)
+    index_vcf(logger, output_vcf, mode)
 
     logger.info(
-        "Processed {} records - Tagged {}; Wrote {} ".format(total, tagged, written)
+        "Processed {} records - Tagged {}; Wrote {} ".format(total, tagged, total)
     )
+
+
+def tag_record(record: pysam.VariantRecord, dtoxog_reader: pysam.VariantFile) -> bool:
+    """
+    Adds the 'oxog' filter to ``record`` if it is in the dtoxog VCF.
+
+    :param record: the record to tag
+    :param dtoxog_reader: the indexed dtoxog VCF
+    :return: True if the record was tagged
+    """
+    tagged = False
+    region = "{0}:{1}-{2}".format(record.contig, record.pos, record.pos)
+    try:
+        for row in dtoxog_reader.fetch(region=region):
+            assert isinstance(record.ref, str) and isinstance(row.ref, str)
+            if record.pos == row.pos and record.ref.upper() == row.ref.upper():
+                # Add filter if failed oxog
+                record.filter.add("oxog")
+                tagged = True
+                break
+    except ValueError:
+        pass
+
+    # handle case where the INFO column is '.'
+    for i in record.info:
+        if i == ".":
+            del record.info[i]
+    return tagged
+
+
+def _tag_records(
+    reader: pysam.VariantFile,
+    dtoxog_reader: pysam.VariantFile,
+    output_vcf: str,
+    mode: PysamModeT,
+) -> Tuple[int, int]:
+    tagged = 0
+    writer = pysam.VariantFile(output_vcf, mode=mode, header=reader.header)
+
+    def process(record: pysam.VariantRecord) -> pysam.VariantRecord:
+        nonlocal tagged
+        tagged += tag_record(record, dtoxog_reader)
+        return record
+
+    try:
+        with Logger.span("process_records"):
+            total = run_pipeline(reader, process, writer.write)
+    finally:
+        writer.close()
+    return total, tagged
+
+
+def _passthrough_records(
+    logger: logging.Logger,
+    reader: pysam.VariantFile,
+    dtoxog_reader: pysam.VariantFile,
+    input_vcf: str,
+    output_vcf: str,
+) -> Tuple[int, int]:
+    # Only contigs with dtoxog sites are decoded, the rest are copied
+    dtoxog_contigs = set(dtoxog_reader.index or [])
+    tagged = 0
+
+    def process(contig: str) -> Iterator[str]:
+        nonlocal tagged
+        for record in reader.fetch(contig):
+            tagged += tag_record(record, dtoxog_reader)
+            yield str(record)
+
+    logger.info("Copying contigs without dtoxog sites as raw BGZF blocks...")
+    with Logger.span("process_records"):
+        counts = passthrough_vcf(
+            input_vcf,
+            output_vcf,
+            str(reader.header),
+            lambda contig: PROCESS if contig in dtoxog_contigs else COPY,
+            process,
+        )
+    return counts[COPY] + counts[PROCESS], tagged
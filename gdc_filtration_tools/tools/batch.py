@@ -0,0 +1,212 @@
+"""Runs the jobs of a manifest across a process pool in one invocation.
+
+Each manifest row names a subcommand and its parameters by the parameter
+names of the tool function, e.g. ``input_vcf``, ``output_vcf`` or
+``reference_name``. The manifest is either a JSON list of objects or a TSV
+file with a header row, where empty cells are treated as unset so rows for
+different subcommands can share a file:
+
+    id      subcommand            input_vcf  output_vcf  reference_name
+    s1      format-gdc-vcf        s1.vcf.gz  s1.out.vcf  GRCh38.d1.vd1.fa
+    s2      filter-somatic-score  s2.vcf     s2.out.vcf
+
+Rows are independent and run in any order. Workers import the tools once
+and keep reference handles and OxoG metrics cached between jobs.
+"""
+
+import concurrent.futures
+import csv
+import inspect
+import json
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from gdc_filtration_tools import commands
+from gdc_filtration_tools.jobs import NESTED_COMMANDS, init_worker, run_job
+from gdc_filtration_tools.logger import Logger
+
+RESULT_COLUMNS = [
+    "id",
+    "subcommand",
+    "status",
+    "elapsed_sec",
+    "cpu_sec",
+    "max_rss_kb",
+    "pid",
+    "cache_hits",
+    "error",
+    "stdout",
+]
+
+
+def read_manifest(manifest: str) -> List[Dict[str, Any]]:
+    """
+    Loads the rows of a JSON (``.json``) or TSV manifest. Empty TSV cells
+    are dropped.
+
+    :param manifest: Path to the manifest file.
+    :return: the manifest rows
+    """
+    with open(manifest, "rt") as fh:
+        if manifest.endswith(".json"):
+            rows = json.load(fh)
+            if not isinstance(rows, list):
+                raise ValueError("The JSON manifest must be a list of objects")
+            return [dict(i) for i in rows]
+        reader = csv.DictReader(fh, delimiter="\t")
+        return [{k: v for k, v in row.items() if v} for row in reader]
+
+
+def _to_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes")
+    return bool(value)
+
+
+def build_argv(row: Dict[str, Any]) -> List[str]:
+    """
+    Converts a manifest row to the command line of its subcommand, using the
+    signature of the tool function to order the positional arguments and
+    name the options.
+
+    :param row: the manifest row
+    :return: the command line arguments, starting with the subcommand
+    """
+    name = row.get("subcommand")
+    if name not in commands.COMMANDS or name in NESTED_COMMANDS:
+        raise ValueError("Unknown subcommand: {0}".format(name))
+    params = {k: v for k, v in row.items() if k not in ("id", "subcommand")}
+    signature = inspect.signature(commands.load_command(name))
+
+    unknown = set(params) - set(signature.parameters)
+    if unknown:
+        raise ValueError(
+            "Unknown parameters for {0}: {1}".format(name, ", ".join(sorted(unknown)))
+        )
+
+    argv = [name]
+    for param in signature.parameters.values():
+        if param.name not in params:
+            if param.kind != param.KEYWORD_ONLY and param.default is param.empty:
+                raise ValueError(
+                    "Missing parameter for {0}: {1}".format(name, param.name)
+                )
+            continue
+        value = params[param.name]
+        values = value if isinstance(value, list) else [value]
+        if param.kind != param.KEYWORD_ONLY:
+            argv.extend(str(i) for i in values)
+            continue
+        flag = param.name.replace("_", "-")
+        if param.annotation is bool:
+            argv.append("--{0}{1}".format("" if _to_bool(value) else "no-", flag))
+        else:
+            argv.append("--" + flag)
+            argv.extend(str(i) for i in values)
+    return argv
+
+
+def _result_row(job_id: str, argv: List[str], result: Dict[str, Any]) -> str:
+    row = dict(result, id=job_id, subcommand=argv[0])
+    # Collapse whitespace so errors and stdout fit in one cell
+    values = [
+        "" if row.get(i) is None else " ".join(str(row[i]).split())
+        for i in RESULT_COLUMNS
+    ]
+    return "\t".join(values) + "\n"
+
+
+def batch(
+    manifest: str,
+    *,
+    workers: Optional[int] = None,
+    max_pending: Optional[int] = None,
+    results_file: Optional[str] = None,
+    fail_fast: bool = False,
+) -> None:
+    """
+    Runs every job of a TSV or JSON manifest of subcommands and their
+    parameters across a process pool.
+
+    :param manifest: The TSV or JSON (.json) manifest of jobs.
+    :param workers: Number of worker processes. Defaults to the number of CPUs.
+    :param max_pending: Maximum number of jobs queued at once. Defaults to twice the workers.
+    :param results_file: Optional TSV file to write the status and metrics of every job to.
+    :param fail_fast: Stop submitting jobs after the first failure.
+    """
+    logger = Logger.get_logger("batch")
+    logger.info("Runs the jobs of a manifest.")
+
+    # Validate every row before running anything
+    jobs = []
+    for idx, row in enumerate(read_manifest(manifest), 1):
+        jobs.append((str(row.get("id", idx)), build_argv(row)))
+    names = sorted(set(argv[0] for _, argv in jobs))
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    logger.info(
+        "Running {0} jobs with {1} workers: {2}".format(
+            len(jobs), workers, ", ".join(names)
+        )
+    )
+
+    total = 0
+    failed = 0
+    results = open(results_file, "wt") if results_file else None
+    try:
+        if results is not None:
+            results.write("\t".join(RESULT_COLUMNS) + "\n")
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=init_worker, initargs=(names,)
+        ) as pool:
+            queued = iter(jobs)
+            pending: Dict["Future[Dict[str, Any]]", Tuple[str, List[str]]] = {}
+            stop = False
+            while True:
+                while not stop and len(pending) < max_pending:
+                    job = next(queued, None)
+                    if job is None:
+                        stop = True
+                        break
+                    pending[pool.submit(run_job, job[1])] = job
+                if not pending:
+                    break
+
+                done, _ = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    job_id, argv = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {
+                            "status": 1,
+                            "error": "{0}: {1}".format(type(e).__name__, e),
+                        }
+                    total += 1
+                    if result["status"] != 0:
+                        failed += 1
+                        logger.error(
+                            "Job {0} failed: {1}".format(job_id, result["error"])
+                        )
+                        stop = stop or fail_fast
+                    else:
+                        logger.info(
+                            "Job {0} finished in {1}s".format(
+                                job_id, result.get("elapsed_sec")
+                            )
+                        )
+                    if results is not None:
+                        results.write(_result_row(job_id, argv, result))
+    finally:
+        if results is not None:
+            results.close()
+
+    logger.info("Processed {0} jobs - {1} failed".format(total, failed))
+    if total < len(jobs):
+        logger.warning("Skipped {0} jobs after a failure".format(len(jobs) - total))
+    if failed:
+        raise SystemExit(1)
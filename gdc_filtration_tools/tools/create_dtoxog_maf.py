@@ -5,17 +5,20 @@ This code was adapted from the PCAWG efforts.
 """
 
 import csv
-import logging
 from typing import Dict, Optional, Tuple
 
 import pysam
 
+from gdc_filtration_tools.accessors import SampleField
+from gdc_filtration_tools.cache import Cache, get_fasta
+from gdc_filtration_tools.diagnostics import DiagnosticsCollector
 from gdc_filtration_tools.logger import Logger
+from gdc_filtration_tools.pipeline import run_pipeline
+from gdc_filtration_tools.utils import open_text
 
 VariantRecordT = pysam.VariantRecord
 VariantRecordSampleT = pysam.libcbcf.VariantRecordSample
 FastaFileT = pysam.FastaFile
-LoggerT = logging.Logger
 
 POSSIBLE_ALLELES = {"A", "C", "T", "G", "N"}
 
@@ -44,11 +47,14 @@ def generate_maf_record(
     fasta: FastaFileT,
     oxog: Dict[str, Tuple[int, ...]],
     oxoq_score: float,
-    logger: LoggerT,
+    diagnostics: DiagnosticsCollector,
+    tumor_gt: Optional[SampleField] = None,
 ) -> Optional[Dict[str, str]]:
     """
     Main function for converting the VCF record to dToxoG MAF record
-    represented as a dictionary.
+    represented as a dictionary. Skipped records are reported to
+    ``diagnostics``. ``tumor_gt`` is resolved from the header by the record
+    loop, or from the record header when not given.
     """
     # Setup
     maf_dat = {k: " " for k in MAF_COLUMNS}
@@ -59,25 +65,19 @@ def generate_maf_record(
         return None
 
     if record.alleles:
-        alt_allele = extract_alt(record.alleles, record.samples["TUMOR"])
+        if tumor_gt is None:
+            tumor_gt = SampleField(record.header, "TUMOR", "GT")
+        alt_allele = extract_alt(record.alleles, tumor_gt.sample(record))
     if not alt_allele:
-        logger.warning(
-            "Unable to extract alt allele! {}:{}:{}:{}".format(
-                record.chrom,
-                record.pos,
-                record.ref,
-                ",".join(list(record.alts)) if record.alts is not None else "",
-            )
+        diagnostics.warn(
+            "missing_alt_allele",
+            lambda: "Unable to extract alt allele! {}".format(describe_record(record)),
         )
         return None
     if has_nonstandard_alleles(ref_allele, alt_allele):
-        logger.warning(
-            "Invalid allele present! {}:{}:{}:{}".format(
-                record.chrom,
-                record.pos,
-                record.ref,
-                ",".join(list(record.alts)) if record.alts is not None else "",
-            )
+        diagnostics.warn(
+            "nonstandard_allele",
+            lambda: "Invalid allele present! {}".format(describe_record(record)),
         )
         return None
 
@@ -95,8 +95,11 @@ def generate_maf_record(
 
     context = get_context(record, fasta)
     if context is None:
-        logger.warning(
-            "Unable to fetch region for {0}:{1}".format(record.chrom, record.pos)
+        diagnostics.warn(
+            "missing_context",
+            lambda: "Unable to fetch region for {0}:{1}".format(
+                record.chrom, record.pos
+            ),
         )
         return
     maf_dat["ref_context"] = context
@@ -115,14 +118,27 @@ def generate_maf_record(
         maf_dat["i_t_REF_F1R2"] = str(i_t_REF_F1R2)
         maf_dat["i_t_REF_F2R1"] = str(i_t_REF_F2R1)
         maf_dat["i_t_Foxog"] = str(i_t_Foxog)
-    except KeyError as e:
-        logger.warning("Unable to find key {}".format(pos_key))
-        logger.warning(e)
+    except KeyError:
+        diagnostics.warn(
+            "missing_oxog_metrics", lambda: "Unable to find key {0}".format(pos_key)
+        )
         return None
 
     return maf_dat
 
 
+def describe_record(record: VariantRecordT) -> str:
+    """
+    Formats the record locus and alleles for diagnostic messages.
+    """
+    return "{}:{}:{}:{}".format(
+        record.chrom,
+        record.pos,
+        record.ref,
+        ",".join(list(record.alts)) if record.alts is not None else "",
+    )
+
+
 def extract_maf_oxog_values(
     pos_key: str, alt_allele: str, ref_allele: str, oxog: Dict[str, Tuple[int, ...]]
 ) -> Tuple[int, int, int, int, float]:
@@ -266,6 +282,8 @@ def create_dtoxog_maf(
     reference: str,
     oxog_file: str,
     oxoq_score: float,
+    *,
+    diagnostics_file: Optional[str] = None,
 ) -> None:
     """
     Takes a SNP-only VCF file and converts it to the dToxoG MAF format
@@ -276,6 +294,7 @@ def create_dtoxog_maf(
     :param reference: Faidx indexed reference fasta file.
     :param oxog_file: Metrics file output from GATK OxoGMetrics tool.
     :param oxoq_score: The oxoQ score.
+    :param diagnostics_file: Optional TSV file to write every skipped record to.
     """
     logger = Logger.get_logger("create_dtoxog_maf")
     logger.info("Converts a SNP VCF to dToxoG MAF format.")
@@ -284,29 +303,38 @@ def create_dtoxog_maf(
     # setup
     total = 0
 
-    # Load oxog
-    oxog = load_oxog(oxog_file)
+    # Load oxog, cached for workers that run many jobs
+    oxog = Cache.get("oxog", oxog_file, load_oxog)
 
-    # Pysam readers
-    vcf_reader = pysam.VariantFile(input_vcf)
-    fasta_reader = pysam.FastaFile(reference)
+    # Pysam readers; the fasta handle is cached and must not be closed
+    with Logger.span("open_input"):
+        vcf_reader = pysam.VariantFile(input_vcf)
+    tumor_gt = SampleField(vcf_reader.header, "TUMOR", "GT")
+    fasta_reader = get_fasta(reference)
+
+    diagnostics = DiagnosticsCollector(logger, details_file=diagnostics_file)
+
+    def process(record: VariantRecordT) -> Optional[str]:
+        nonlocal total
+        total += 1
+        maf_record = generate_maf_record(
+            record, fasta_reader, oxog, oxoq_score, diagnostics, tumor_gt
+        )
+        if maf_record is None:
+            return None
+        return "\t".join([maf_record[i] for i in MAF_COLUMNS]) + "\n"
 
     # Process
     try:
-        with open(output_file, "wt") as o:
-            o.write("#version 2.4.1\n")
-            o.write("\t".join(MAF_COLUMNS) + "\n")
-            for record in vcf_reader.fetch():
-                total += 1
-                maf_record = generate_maf_record(
-                    record, fasta_reader, oxog, oxoq_score, logger
-                )
-                if maf_record is not None:
-                    row = list([maf_record[i] for i in MAF_COLUMNS])
-                    o.write("\t".join(row) + "\n")
+        with Logger.span("process_records"):
+            with open_text(output_file, "wt") as o:
+                o.write("#version 2.4.1\n")
+                o.write("\t".join(MAF_COLUMNS) + "\n")
+                run_pipeline(vcf_reader, process, o.write)
 
     finally:
         vcf_reader.close()
-        fasta_reader.close()
+        diagnostics.close()
 
     logger.info("Processed {} records".format(total))
+    diagnostics.summary()
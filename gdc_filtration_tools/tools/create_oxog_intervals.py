@@ -8,6 +8,7 @@ input VCF only contains SNPs.
 import pysam
 
 from gdc_filtration_tools.logger import Logger
+from gdc_filtration_tools.utils import open_text
 
 
 def create_oxog_intervals(input_vcf: str, output_file: str) -> None:
@@ -26,15 +27,17 @@ def create_oxog_intervals(input_vcf: str, output_file: str) -> None:
     total = 0
 
     # Vcf reader
-    reader = pysam.VariantFile(input_vcf)
+    with Logger.span("open_input"):
+        reader = pysam.VariantFile(input_vcf)
 
     # Process
     try:
-        with open(output_file, "wt") as o:
-            for record in reader.fetch():
-                total += 1
-                row = "{0}:{1}".format(record.contig, record.pos)
-                o.write(row + "\n")
+        with Logger.span("process_records"):
+            with open_text(output_file, "wt") as o:
+                for record in reader:
+                    total += 1
+                    row = "{0}:{1}".format(record.contig, record.pos)
+                    o.write(row + "\n")
 
     finally:
         reader.close()
@@ -4,12 +4,19 @@ that failed, and writes them out to a minimal VCF file.
 @author: Kyle Hernandez <kmhernan@uchicago.edu>
 """
 
-from typing import Dict, Generator, List, TextIO, cast
+from typing import Dict, Generator, List, Optional, TextIO, cast
 
-from pysam import FastaFile, VariantFile, VariantHeader, VariantRecord, tabix_index
+from pysam import VariantFile, VariantHeader, VariantRecord
 
+from gdc_filtration_tools.cache import get_fasta_contigs
 from gdc_filtration_tools.logger import Logger
-from gdc_filtration_tools.utils import get_pysam_outmode
+from gdc_filtration_tools.pipeline import run_pipeline
+from gdc_filtration_tools.utils import (
+    OutputTypeT,
+    get_pysam_outmode,
+    index_vcf,
+    open_text,
+)
 
 
 def generate_header(reference_fa: str, tag: str) -> VariantHeader:
@@ -22,12 +29,8 @@ def generate_header(reference_fa: str, tag: str) -> VariantHeader:
     header = VariantHeader()
     header.filters.add(tag, None, None, "Failed dToxoG")
 
-    fasta = FastaFile(reference_fa)
-    try:
-        for contig in fasta.references:
-            header.contigs.add(contig, length=fasta.get_reference_length(contig))
-    finally:
-        fasta.close()
+    for contig, length in get_fasta_contigs(reference_fa):
+        header.contigs.add(contig, length=length)
 
     return header
 
@@ -72,44 +75,52 @@ def build_new_record(maf: Dict[str, str], vcf: VariantFile, tag: str) -> Variant
     return record
 
 
-def dtoxog_maf_to_vcf(input_maf: str, reference_fa: str, output_vcf: str) -> None:
+def dtoxog_maf_to_vcf(
+    input_maf: str,
+    reference_fa: str,
+    output_vcf: str,
+    *,
+    output_type: Optional[OutputTypeT] = None,
+) -> None:
     """
     Transforms dToxoG MAF to minimal VCF of only dtoxo failures.
 
     :param input_maf: The annotated dtoxog MAF output file.
     :param reference_fa: Reference fasta used to make seqdict header.
-    :param output_vcf: The output minimal VCF with only failed dtoxog records BGzip and tabix-index created if ends with '.gz'.
+    :param output_vcf: The output minimal VCF with only failed dtoxog records BGzip and tabix-index created if ends with '.gz', BCF and CSI-index if ends with '.bcf'.
+    :param output_type: Output format: v (VCF), z (bgzipped VCF), b (BCF) or u (uncompressed BCF). Defaults to the output file extension.
     """
     logger = Logger.get_logger("dtoxog_maf_to_vcf")
     logger.info("Transforms dToxoG MAF to minimal VCF of dtoxo failures")
 
     # setup
     total = 0
-    written = 0
     tag = "oxog"
 
     # header
-    header = generate_header(reference_fa, tag)
+    with Logger.span("build_header"):
+        header = generate_header(reference_fa, tag)
 
     # Writer
-    mode = get_pysam_outmode(output_vcf)
+    mode = get_pysam_outmode(output_vcf, output_type)
     writer = VariantFile(output_vcf, mode=mode, header=header)
 
+    def process(record: Dict[str, str]) -> Optional[VariantRecord]:
+        nonlocal total
+        total += 1
+        if record["oxoGCut"] != "1":
+            return None
+        return build_new_record(record, writer, tag)
+
     # Process
     try:
-        with open(input_maf, "rt") as fh:
-            for record in maf_generator(fh):
-                total += 1
-                if record["oxoGCut"] == "1":
-                    new_vcf_record = build_new_record(record, writer, tag)
-                    writer.write(new_vcf_record)
-                    written += 1
+        with Logger.span("process_records"):
+            with open_text(input_maf, "rt") as fh:
+                written = run_pipeline(maf_generator(fh), process, writer.write)
 
     finally:
         writer.close()
 
-    if output_vcf.endswith(".gz"):
-        logger.info("Creating tabix index...")
-        tabix_index(output_vcf, preset="vcf", force=True)
+    index_vcf(logger, output_vcf, mode)
 
     logger.info("Processed {} records - Wrote {}".format(total, written))
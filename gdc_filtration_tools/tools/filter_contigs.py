@@ -4,52 +4,180 @@ in the contig lines of the VCF header.
 @author: Kyle Hernandez <kmhernan@uchicago.edu>
 """
 
+import logging
+from typing import List, Optional, Set, Tuple
+
 import pysam
 
 from gdc_filtration_tools.logger import Logger
-from gdc_filtration_tools.utils import get_pysam_outmode
+from gdc_filtration_tools.passthrough import (
+    COPY,
+    DROP,
+    can_passthrough,
+    declared_contigs,
+    passthrough_vcf,
+    read_header_text,
+)
+from gdc_filtration_tools.pipeline import run_pipeline
+from gdc_filtration_tools.utils import (
+    STDIO_PATH,
+    OutputTypeT,
+    PysamModeT,
+    get_pysam_outmode,
+    index_vcf,
+)
+from gdc_filtration_tools.vcfindex import VcfIndex, find_index, read_index
 
 
-def filter_contigs(input_vcf: str, output_vcf: str) -> None:
+def filter_contigs(
+    input_vcf: str, output_vcf: str, *, output_type: Optional[OutputTypeT] = None
+) -> None:
     """
     Filter out VCF records on chromosomes that are not present
     in the contig lines of the VCF header.
 
     :param input_vcf: The input VCF file to filter.
-    :param output_vcf: The output filtered VCF file to create. BGzip and tabix-index created if ends with '.gz'.
+    :param output_vcf: The output filtered VCF file to create. BGzip and tabix-index created if ends with '.gz', BCF and CSI-index if ends with '.bcf'.
+    :param output_type: Output format: v (VCF), z (bgzipped VCF), b (BCF) or u (uncompressed BCF). Defaults to the output file extension.
     """
     logger = Logger.get_logger("filter_contigs")
     logger.info("Filter VCF for contigs not in header.")
 
     # setup
-    total = 0
-    removed = 0
-    written = 0
-    reader = pysam.VariantFile(input_vcf)
-    mode = get_pysam_outmode(output_vcf)
-    writer = pysam.VariantFile(output_vcf, mode=mode, header=reader.header)
+    with Logger.span("open_input"):
+        reader = pysam.VariantFile(input_vcf)
+    mode = get_pysam_outmode(output_vcf, output_type)
 
-    # Process
-    try:
-        contigs = set(list(reader.header.contigs))
-        for record in reader.fetch():
-            total += 1
-            if record.chrom in contigs:
-                written += 1
-                writer.write(record)
-            else:
-                removed += 1
+    # The index lists the contigs with records and how many each has, unless
+    # the indexer didn't write the per-contig metadata. htslib adds the
+    # contigs of the index to the header, so the declared ones are read from
+    # the header text.
+    index = None
+    declared = [str(i) for i in reader.header.contigs]
+    if input_vcf != STDIO_PATH and reader.index is not None:
+        if not reader.is_bcf:
+            declared = declared_contigs(read_header_text(input_vcf))
+        index_path = find_index(input_vcf)
+        if index_path is not None:
+            index = read_index(index_path, [str(i) for i in reader.header.contigs])
+            if not index.has_metadata:
+                index = None
 
-    finally:
-        reader.close()
-        writer.close()
+    if index is None:
+        total, written, removed = _filter_records(reader, declared, output_vcf, mode)
+    else:
+        _log_dropped(logger, index, set(declared))
+
+        if can_passthrough(reader, input_vcf, output_vcf, mode):
+            # Whole contigs are copied or dropped without decoding any record
+            reader.close()
+            logger.info("Copying contigs as raw BGZF blocks...")
+            contigs = set(declared)
+            with Logger.span("process_records"):
+                counts = passthrough_vcf(
+                    input_vcf,
+                    output_vcf,
+                    read_header_text(input_vcf),
+                    lambda contig: COPY if contig in contigs else DROP,
+                )
+            total = counts[COPY] + counts[DROP]
+            written = counts[COPY]
+            removed = counts[DROP]
+        else:
+            total, written, removed = _fetch_records(
+                reader, index, declared, output_vcf, mode
+            )
 
-    if output_vcf.endswith(".gz"):
-        logger.info("Creating tabix index...")
-        pysam.tabix_index(output_vcf, preset="vcf", force=True)
+    index_vcf(logger, output_vcf, mode)
 
     logger.info(
         "Processed {} records, wrote {} records, and removed {} records".format(
             total, written, removed
         )
     )
+
+
+def _log_dropped(logger: logging.Logger, index: VcfIndex, declared: Set[str]) -> None:
+    dropped = [i for i in index.references if i.n_mapped and i.name not in declared]
+    if dropped:
+        logger.info(
+            "Dropping {0} records on {1} contigs not in the header: {2}".format(
+                sum(i.n_mapped for i in dropped),
+                len(dropped),
+                ", ".join(i.name for i in dropped[:10]),
+            )
+        )
+
+
+def _fetch_records(
+    reader: pysam.VariantFile,
+    index: VcfIndex,
+    declared: List[str],
+    output_vcf: str,
+    mode: PysamModeT,
+) -> Tuple[int, int, int]:
+    contigs = set(declared)
+    references = sorted(
+        (i for i in index.references if i.n_mapped), key=lambda i: i.off_beg
+    )
+    removed = sum(i.n_mapped for i in references if i.name not in contigs)
+    written = 0
+
+    # Only contigs in the header are fetched and decoded
+    try:
+        _drop_index_contigs(reader, contigs)
+        writer = pysam.VariantFile(output_vcf, mode=mode, header=reader.header)
+        try:
+            with Logger.span("process_records"):
+                for ref in references:
+                    if ref.name not in contigs:
+                        continue
+                    for record in reader.fetch(ref.name):
+                        written += 1
+                        writer.write(record)
+        finally:
+            writer.close()
+    finally:
+        reader.close()
+
+    return written + removed, written, removed
+
+
+def _drop_index_contigs(reader: pysam.VariantFile, contigs: Set[str]) -> None:
+    # htslib adds the contigs of the index to the header, drop them again
+    for contig in list(reader.header.contigs):
+        if contig not in contigs:
+            reader.header.contigs.remove_header(contig)
+
+
+def _filter_records(
+    reader: pysam.VariantFile,
+    declared: List[str],
+    output_vcf: str,
+    mode: PysamModeT,
+) -> Tuple[int, int, int]:
+    total = 0
+    removed = 0
+    contigs = set(declared)
+
+    def process(record: pysam.VariantRecord) -> Optional[pysam.VariantRecord]:
+        nonlocal total, removed
+        total += 1
+        if record.chrom in contigs:
+            return record
+        removed += 1
+        return None
+
+    # Process
+    try:
+        _drop_index_contigs(reader, contigs)
+        writer = pysam.VariantFile(output_vcf, mode=mode, header=reader.header)
+        try:
+            with Logger.span("process_records"):
+                written = run_pipeline(reader, process, writer.write)
+        finally:
+            writer.close()
+    finally:
+        reader.close()
+
+    return total, written, removed
@@ -4,20 +4,32 @@ problems with downstream tools.
 @author: Kyle Hernandez <kmhernan@uchicago.edu>
 """
 
+from typing import Optional
+
 import pysam
 
+from gdc_filtration_tools.diagnostics import DiagnosticsCollector
 from gdc_filtration_tools.logger import Logger
-from gdc_filtration_tools.utils import get_pysam_outmode
+from gdc_filtration_tools.pipeline import run_pipeline
+from gdc_filtration_tools.utils import OutputTypeT, get_pysam_outmode, index_vcf
 
 ALLOWED_BASES = {"A", "C", "T", "G"}
 
 
-def filter_nonstandard_variants(input_vcf: str, output_vcf: str) -> None:
+def filter_nonstandard_variants(
+    input_vcf: str,
+    output_vcf: str,
+    *,
+    diagnostics_file: Optional[str] = None,
+    output_type: Optional[OutputTypeT] = None,
+) -> None:
     """
     Remove non-ACTG loci from a VCF.
 
     :param input_vcf: The input VCF file to filter.
-    :param output_vcf: The output filtered VCF file to create. BGzip and tabix-index created if ends with '.gz'.
+    :param output_vcf: The output filtered VCF file to create. BGzip and tabix-index created if ends with '.gz', BCF and CSI-index if ends with '.bcf'.
+    :param diagnostics_file: Optional TSV file to write every removed locus to.
+    :param output_type: Output format: v (VCF), z (bgzipped VCF), b (BCF) or u (uncompressed BCF). Defaults to the output file extension.
     """
     logger = Logger.get_logger("filter_nonstandard_variants")
     logger.info("Drops non-ACTG loci from a VCF.")
@@ -28,38 +40,46 @@ def filter_nonstandard_variants(input_vcf: str, output_vcf: str) -> None:
     written = 0
 
     # Full vcf reader
-    reader = pysam.VariantFile(input_vcf)
+    with Logger.span("open_input"):
+        reader = pysam.VariantFile(input_vcf)
 
     # Writer
-    mode = get_pysam_outmode(output_vcf)
+    mode = get_pysam_outmode(output_vcf, output_type)
     writer = pysam.VariantFile(output_vcf, mode=mode, header=reader.header)
 
+    diagnostics = DiagnosticsCollector(logger, details_file=diagnostics_file)
+
+    def process(record: pysam.VariantRecord) -> Optional[pysam.VariantRecord]:
+        nonlocal total, removed
+        total += 1
+        if record.alleles is None:
+            return None
+        alleles = list("".join(list(record.alleles)).upper())
+        check = set(alleles) - ALLOWED_BASES
+        if check:
+            diagnostics.warn(
+                "nonstandard_allele",
+                lambda: "Removing {0}:{1}:{2}".format(
+                    record.chrom, record.pos, ",".join(alleles)
+                ),
+            )
+            removed += 1
+            return None
+        return record
+
     # Process
     try:
-        for record in reader.fetch():
-            total += 1
-            if record.alleles is not None:
-                alleles = list("".join(list(record.alleles)).upper())
-                check = set(alleles) - ALLOWED_BASES
-                if check:
-                    logger.warning(
-                        "Removing {0}:{1}:{2}".format(
-                            record.chrom, record.pos, ",".join(alleles)
-                        )
-                    )
-                    removed += 1
-                else:
-                    written += 1
-                    writer.write(record)
+        with Logger.span("process_records"):
+            written = run_pipeline(reader, process, writer.write)
 
     finally:
         reader.close()
         writer.close()
+        diagnostics.close()
 
-    if output_vcf.endswith(".gz"):
-        logger.info("Creating tabix index...")
-        pysam.tabix_index(output_vcf, preset="vcf", force=True)
+    index_vcf(logger, output_vcf, mode)
 
     logger.info(
         "Processed {} records - Removed {}; Wrote {} ".format(total, removed, written)
     )
+    diagnostics.summary()
@@ -6,13 +6,30 @@ made to validate this.
 @author: Kyle Hernandez <kmhernan@uchicago.edu>
 """
 
+from typing import Optional, Tuple
+
 import pysam
 
 from gdc_filtration_tools.logger import Logger
-from gdc_filtration_tools.utils import get_pysam_outmode
+from gdc_filtration_tools.passthrough import (
+    COPY,
+    DROP,
+    can_passthrough,
+    passthrough_vcf,
+    read_header_text,
+)
+from gdc_filtration_tools.pipeline import run_pipeline
+from gdc_filtration_tools.utils import (
+    OutputTypeT,
+    PysamModeT,
+    get_pysam_outmode,
+    index_vcf,
+)
 
 
-def position_filter_dkfz(input_vcf: str, output_vcf: str) -> None:
+def position_filter_dkfz(
+    input_vcf: str, output_vcf: str, *, output_type: Optional[OutputTypeT] = None
+) -> None:
     """
     Removes VCF records where the POS-2 is less than 0 which
     will cause an Exception to be thrown in DKFZBiasFilter. We
@@ -20,38 +37,66 @@ def position_filter_dkfz(input_vcf: str, output_vcf: str) -> None:
     are made to validate this.
 
     :param input_vcf: The input VCF file to filter.
-    :param output_vcf: The output filtered VCF file to create. BGzip and tabix-index created if ends with '.gz'.
+    :param output_vcf: The output filtered VCF file to create. BGzip and tabix-index created if ends with '.gz', BCF and CSI-index if ends with '.bcf'.
+    :param output_type: Output format: v (VCF), z (bgzipped VCF), b (BCF) or u (uncompressed BCF). Defaults to the output file extension.
     """
     logger = Logger.get_logger("position_filter_dkfz")
     logger.info("Position Filter for DKFZ.")
 
-    # setup
-    total = 0
-    removed = 0
-    written = 0
+    with Logger.span("open_input"):
+        reader = pysam.VariantFile(input_vcf)
+    mode = get_pysam_outmode(output_vcf, output_type)
+
+    if can_passthrough(reader, input_vcf, output_vcf, mode):
+        # Only records at the head of a contig can fail, the rest are copied
+        reader.close()
+        logger.info("Checking the head of each contig and copying the rest...")
+        with Logger.span("process_records"):
+            counts = passthrough_vcf(
+                input_vcf,
+                output_vcf,
+                read_header_text(input_vcf),
+                lambda contig: COPY,
+                skip_head=_fails_position_check,
+            )
+        written = counts[COPY]
+        removed = counts[DROP]
+    else:
+        written, removed = _filter_records(reader, output_vcf, mode)
+
+    index_vcf(logger, output_vcf, mode)
+
+    logger.info(
+        "Processed {} records - Removed {}; Wrote {} ".format(
+            written + removed, removed, written
+        )
+    )
 
-    reader = pysam.VariantFile(input_vcf)
-    mode = get_pysam_outmode(output_vcf)
+
+def _fails_position_check(line: bytes) -> bool:
+    return int(line.split(b"\t", 2)[1]) - 2 < 0
+
+
+def _filter_records(
+    reader: pysam.VariantFile, output_vcf: str, mode: PysamModeT
+) -> Tuple[int, int]:
+    removed = 0
     writer = pysam.VariantFile(output_vcf, mode=mode, header=reader.header)
 
+    def process(record: pysam.VariantRecord) -> Optional[pysam.VariantRecord]:
+        nonlocal removed
+        if record.pos - 2 < 0:
+            removed += 1
+            return None
+        return record
+
     # Process
     try:
-        for record in reader.fetch():
-            total += 1
-            if record.pos - 2 < 0:
-                removed += 1
-                continue
-            written += 1
-            writer.write(record)
+        with Logger.span("process_records"):
+            written = run_pipeline(reader, process, writer.write)
 
     finally:
         reader.close()
         writer.close()
 
-    if output_vcf.endswith(".gz"):
-        logger.info("Creating tabix index...")
-        pysam.tabix_index(output_vcf, preset="vcf", force=True)
-
-    logger.info(
-        "Processed {} records - Removed {}; Wrote {} ".format(total, removed, written)
-    )
+    return written, removed
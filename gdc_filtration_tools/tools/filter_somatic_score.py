@@ -5,10 +5,14 @@ than drop_somatic_score but less than min_somatic_score.
 @author: Kyle Hernandez <kmhernan@uchicago.edu>
 """
 
+from typing import Optional
+
 import pysam
 
+from gdc_filtration_tools.accessors import FilterTag, SampleField
 from gdc_filtration_tools.logger import Logger
-from gdc_filtration_tools.utils import get_pysam_outmode
+from gdc_filtration_tools.pipeline import run_pipeline
+from gdc_filtration_tools.utils import OutputTypeT, get_pysam_outmode, index_vcf
 
 
 def filter_somatic_score(
@@ -18,15 +22,17 @@ def filter_somatic_score(
     tumor_sample_name: str = "TUMOR",
     drop_somatic_score: int = 25,
     min_somatic_score: int = 40,
+    output_type: Optional[OutputTypeT] = None,
 ) -> None:
     """
     Filters SomaticSniper VCF files based on the Somatic Score.
 
     :param input_vcf: The input VCF file to filter.
-    :param output_vcf: The output filtered VCF file to create. BGzip and tabix-index created if ends with '.gz'.
+    :param output_vcf: The output filtered VCF file to create. BGzip and tabix-index created if ends with '.gz', BCF and CSI-index if ends with '.bcf'.
     :param tumor_sample_name: The name of the tumor sample in the VCF.
     :param drop_somatic_score: If the somatic score is < this, remove it.
     :param min_somatic_score: If the somatic score is > drop_somatic_score and < this value, add ssc filter tag.
+    :param output_type: Output format: v (VCF), z (bgzipped VCF), b (BCF) or u (uncompressed BCF). Defaults to the output file extension.
     """
     logger = Logger.get_logger("filter_somatic_score")
     logger.info("Filters SomaticSniper VCF files based on Somatic Score.")
@@ -35,40 +41,42 @@ def filter_somatic_score(
     total = 0
     removed = 0
     tagged = 0
-    written = 0
 
-    reader = pysam.VariantFile(input_vcf)
+    with Logger.span("open_input"):
+        reader = pysam.VariantFile(input_vcf)
     filter_tag = "ssc{0}".format(min_somatic_score)
     logger.info("Filter tag: {}".format(filter_tag))
     reader.header.filters.add(
         filter_tag, None, None, "Somatic Score < {0}".format(min_somatic_score)
     )
-    mode = get_pysam_outmode(output_vcf)
+    mode = get_pysam_outmode(output_vcf, output_type)
     writer = pysam.VariantFile(output_vcf, mode=mode, header=reader.header)
+    ssc_field = SampleField(reader.header, tumor_sample_name, "SSC")
+    tag = FilterTag(reader.header, filter_tag)
 
-    # Process
-    try:
-        for record in reader.fetch():
-            total += 1
-            ssc = record.samples[tumor_sample_name]["SSC"]
+    def process(record: pysam.VariantRecord) -> Optional[pysam.VariantRecord]:
+        nonlocal total, removed, tagged
+        total += 1
+        ssc = ssc_field.get(record)
 
-            if ssc < drop_somatic_score:
-                removed += 1
-                continue
-            elif ssc < min_somatic_score:
-                tagged += 1
-                record.filter.add(filter_tag)
+        if ssc < drop_somatic_score:
+            removed += 1
+            return None
+        elif ssc < min_somatic_score:
+            tagged += 1
+            tag.add(record)
+        return record
 
-            written += 1
-            writer.write(record)
+    # Process
+    try:
+        with Logger.span("process_records"):
+            written = run_pipeline(reader, process, writer.write)
 
     finally:
         reader.close()
         writer.close()
 
-    if output_vcf.endswith(".gz"):
-        logger.info("Creating tabix index...")
-        pysam.tabix_index(output_vcf, preset="vcf", force=True)
+    index_vcf(logger, output_vcf, mode)
 
     logger.info(
         "Processed {} records - Removed {}; Tagged {}; Wrote {} ".format(
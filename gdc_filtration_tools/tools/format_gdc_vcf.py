@@ -12,15 +12,52 @@ metadata attributes:
 """
 
 import datetime
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
 
 import pysam
 
 from gdc_filtration_tools.logger import Logger
-from gdc_filtration_tools.utils import get_pysam_outmode
+from gdc_filtration_tools.pipeline import run_pipeline
+from gdc_filtration_tools.reheader import can_reheader, reheader_vcf
+from gdc_filtration_tools.tools.batch import read_manifest
+from gdc_filtration_tools.utils import (
+    OutputTypeT,
+    PysamModeT,
+    get_pysam_outmode,
+    index_vcf,
+)
 
 VariantFileT = pysam.VariantFile
 VcfHeaderT = pysam.VariantHeader
 
+# Columns of the format_gdc_vcf_batch metadata table
+METADATA_COLUMNS = [
+    "input_vcf",
+    "output_vcf",
+    "patient_barcode",
+    "case_id",
+    "tumor_barcode",
+    "tumor_aliquot_uuid",
+    "tumor_bam_uuid",
+    "normal_barcode",
+    "normal_aliquot_uuid",
+    "normal_bam_uuid",
+]
+
+
+def build_constant_lines(reference_name: str) -> List[str]:
+    """
+    Returns the GDC header lines that are the same for every file of a
+    run: the file date, the center and the reference name.
+    """
+    return [
+        "##fileDate={0}".format(datetime.date.today().strftime("%Y%m%d")),
+        '##center="NCI Genomic Data Commons (GDC)"',
+        "##reference={0}".format(reference_name),
+    ]
+
 
 def build_header(
     reader: VariantFileT,
@@ -33,10 +70,13 @@ def build_header(
     normal_aliquot_uuid: str,
     normal_bam_uuid: str,
     reference_name: str,
+    constant_lines: Optional[List[str]] = None,
 ) -> VcfHeaderT:
     """
     Takes the user arguments and the input VCF to generate the GDC
-    formatted header entries and returns the header object.
+    formatted header entries and returns the header object. The
+    ``constant_lines`` from build_constant_lines can be passed in when
+    formatting many files.
     """
     # First, load the old header, skipping ones that we will update
     lst = []
@@ -50,11 +90,11 @@ def build_header(
         lst.append(str(record))
 
     # Add GDC specific metadata
+    if constant_lines is None:
+        constant_lines = build_constant_lines(reference_name)
+    lst.extend(constant_lines)
     lst.extend(
         [
-            "##fileDate={0}".format(datetime.date.today().strftime("%Y%m%d")),
-            '##center="NCI Genomic Data Commons (GDC)"',
-            "##reference={0}".format(reference_name),
             "##INDIVIDUAL=<NAME={0},ID={1}>".format(patient_barcode, case_id),
             "##SAMPLE=<ID=NORMAL,NAME={0},ALIQUOT_ID={1},BAM_ID={2}>".format(
                 normal_barcode, normal_aliquot_uuid, normal_bam_uuid
@@ -78,6 +118,43 @@ def build_header(
     return new_head
 
 
+def write_gdc_vcf(
+    logger: Any,
+    reader: VariantFileT,
+    input_vcf: str,
+    output_vcf: str,
+    new_header: VcfHeaderT,
+    mode: PysamModeT,
+    copy_records: bool,
+) -> None:
+    """
+    Writes the records of ``reader`` under ``new_header`` and indexes the
+    output. The reader is closed.
+    """
+    if copy_records and can_reheader(reader, input_vcf, output_vcf, mode):
+        reader.close()
+        logger.info("Copying records without re-encoding them...")
+        with Logger.span("process_records"):
+            index_path = reheader_vcf(input_vcf, output_vcf, str(new_header))
+        if index_path is None:
+            index_vcf(logger, output_vcf, mode)
+        else:
+            logger.info("Reused the input index for {0}".format(index_path))
+        return
+
+    writer = pysam.VariantFile(output_vcf, mode=mode, header=new_header)
+
+    # Process
+    try:
+        with Logger.span("process_records"):
+            run_pipeline(reader, lambda record: record, writer.write)
+    finally:
+        reader.close()
+        writer.close()
+
+    index_vcf(logger, output_vcf, mode)
+
+
 def format_gdc_vcf(
     input_vcf: str,
     output_vcf: str,
@@ -91,12 +168,14 @@ def format_gdc_vcf(
     normal_bam_uuid: str,
     *,
     reference_name: str = "GRCh38.d1.vd1.fa",
+    output_type: Optional[OutputTypeT] = None,
+    copy_records: bool = False,
 ) -> None:
     """
     Adds VCF header metadata specific to the GDC.
 
     :param input_vcf: The input VCF file to format.
-    :param output_vcf: The output formatted VCF file to create. BGzip and tabix-index created if ends with '.gz'.
+    :param output_vcf: The output formatted VCF file to create. BGzip and tabix-index created if ends with '.gz', BCF and CSI-index if ends with '.bcf'.
     :param patient_barcode: The case submitter id.
     :param case_id: The case uuid.
     :param tumor_barcode: The tumor aliquot submitter id.
@@ -106,38 +185,135 @@ def format_gdc_vcf(
     :param normal_aliquot_uuid: The normal aliquot uuid.
     :param normal_bam_uuid: The normal bam uuid.
     :param reference_name: Reference name to use in header.
+    :param output_type: Output format: v (VCF), z (bgzipped VCF), b (BCF) or u (uncompressed BCF). Defaults to the output file extension.
+    :param copy_records: Reheader only: copy the records verbatim after the new header instead of re-encoding them. Only used when the input and output are both plain or both bgzipped VCF files.
     """
     logger = Logger.get_logger("format_gdc_vcf")
     logger.info("Format GDC tumor/normal paired VCFs.")
 
     # setup
-    reader = pysam.VariantFile(input_vcf)
-    mode = get_pysam_outmode(output_vcf)
-
-    # Load new header
-    new_header = build_header(
-        reader,
-        patient_barcode,
-        case_id,
-        tumor_barcode,
-        tumor_aliquot_uuid,
-        tumor_bam_uuid,
-        normal_barcode,
-        normal_aliquot_uuid,
-        normal_bam_uuid,
-        reference_name,
-    )
-
-    writer = pysam.VariantFile(output_vcf, mode=mode, header=new_header)
+    with Logger.span("open_input"):
+        reader = pysam.VariantFile(input_vcf)
 
-    # Process
     try:
-        for record in reader.fetch():
-            writer.write(record)
+        mode = get_pysam_outmode(output_vcf, output_type)
+
+        # Load new header
+        with Logger.span("build_header"):
+            new_header = build_header(
+                reader,
+                patient_barcode,
+                case_id,
+                tumor_barcode,
+                tumor_aliquot_uuid,
+                tumor_bam_uuid,
+                normal_barcode,
+                normal_aliquot_uuid,
+                normal_bam_uuid,
+                reference_name,
+            )
+
+        write_gdc_vcf(
+            logger, reader, input_vcf, output_vcf, new_header, mode, copy_records
+        )
     finally:
         reader.close()
-        writer.close()
 
-    if output_vcf.endswith(".gz"):
-        logger.info("Creating tabix index...")
-        pysam.tabix_index(output_vcf, preset="vcf", force=True)
+
+def _format_row(
+    logger: Any,
+    row: Dict[str, str],
+    constant_lines: List[str],
+    output_type: Optional[str],
+    copy_records: bool,
+) -> None:
+    with Logger.span("format_vcf", input_vcf=row["input_vcf"]):
+        reader = pysam.VariantFile(row["input_vcf"])
+        try:
+            new_header = build_header(
+                reader,
+                row["patient_barcode"],
+                row["case_id"],
+                row["tumor_barcode"],
+                row["tumor_aliquot_uuid"],
+                row["tumor_bam_uuid"],
+                row["normal_barcode"],
+                row["normal_aliquot_uuid"],
+                row["normal_bam_uuid"],
+                # The reference line is one of the constant lines
+                "",
+                constant_lines=constant_lines,
+            )
+            mode = get_pysam_outmode(row["output_vcf"], output_type)
+            write_gdc_vcf(
+                logger,
+                reader,
+                row["input_vcf"],
+                row["output_vcf"],
+                new_header,
+                mode,
+                copy_records,
+            )
+        finally:
+            reader.close()
+
+
+def format_gdc_vcf_batch(
+    metadata: str,
+    *,
+    reference_name: str = "GRCh38.d1.vd1.fa",
+    workers: Optional[int] = None,
+    output_type: Optional[OutputTypeT] = None,
+    copy_records: bool = False,
+) -> None:
+    """
+    Adds VCF header metadata specific to the GDC to every VCF of a TSV or
+    JSON (.json) metadata table in one process, with one row per file and
+    the columns input_vcf, output_vcf, patient_barcode, case_id,
+    tumor_barcode, tumor_aliquot_uuid, tumor_bam_uuid, normal_barcode,
+    normal_aliquot_uuid and normal_bam_uuid.
+
+    :param metadata: The TSV or JSON metadata table.
+    :param reference_name: Reference name to use in header.
+    :param workers: Number of files formatted at once. Defaults to the number of CPUs.
+    :param output_type: Output format: v (VCF), z (bgzipped VCF), b (BCF) or u (uncompressed BCF). Defaults to the output file extension.
+    :param copy_records: Reheader only: copy the records verbatim after the new header instead of re-encoding them. Only used when the input and output are both plain or both bgzipped VCF files.
+    """
+    logger = Logger.get_logger("format_gdc_vcf")
+    logger.info("Format GDC tumor/normal paired VCFs from a metadata table.")
+
+    # Validate every row before formatting anything
+    rows = read_manifest(metadata)
+    for idx, row in enumerate(rows, 1):
+        missing = [i for i in METADATA_COLUMNS if not row.get(i)]
+        if missing:
+            raise ValueError(
+                "Missing columns for row {0}: {1}".format(idx, ", ".join(missing))
+            )
+
+    # The date, center and reference lines are shared by every file
+    constant_lines = build_constant_lines(reference_name)
+    workers = workers or os.cpu_count() or 1
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(
+                _format_row, logger, row, constant_lines, output_type, copy_records
+            ): row
+            for row in rows
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                failed += 1
+                logger.error(
+                    "Failed to format {0}: {1}: {2}".format(
+                        futures[future]["input_vcf"], type(e).__name__, e
+                    )
+                )
+
+    logger.info("Processed {0} VCFs - {1} failed".format(len(rows), failed))
+    if failed:
+        raise SystemExit(1)
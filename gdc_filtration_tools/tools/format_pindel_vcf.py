@@ -10,12 +10,32 @@
 @author: Kyle Hernandez <kmhernan@uchicago.edu>
 """
 
-from typing import Any, List, Tuple
+import logging
+from typing import List, Optional
 
 import pysam
 
+from gdc_filtration_tools.accessors import SampleField
 from gdc_filtration_tools.logger import Logger
-from gdc_filtration_tools.utils import get_pysam_outmode
+from gdc_filtration_tools.pipeline import run_pipeline
+from gdc_filtration_tools.readvcf import VcfReader
+from gdc_filtration_tools.rewrite import (
+    AddInfoFlag,
+    DropRedundantEnd,
+    Edit,
+    RenameInfoKey,
+    SetSampleGT,
+    can_rewrite,
+    rewrite_vcf,
+)
+from gdc_filtration_tools.translate import keeps_end, translate_record
+from gdc_filtration_tools.utils import (
+    OutputTypeT,
+    PysamModeT,
+    get_progress_reporter,
+    get_pysam_outmode,
+    index_vcf,
+)
 
 VariantHeaderT = pysam.VariantHeader
 VariantRecordT = pysam.VariantRecord
@@ -72,80 +92,112 @@ def get_header(old_header: VariantHeaderT) -> VariantHeaderT:
     return header
 
 
-def get_info(record: VariantRecordT, flag: bool) -> List[Tuple[str, Any]]:
+def format_record(
+    record: VariantRecordT,
+    header: VariantHeaderT,
+    tumor_gt: Optional[SampleField] = None,
+) -> VariantRecordT:
     """
-    Parses the INFO column to fix the SVTYPE and possibly add forcedHet tag
+    Moves the record to the new header, renaming SVTYPE to TYPEOFSV and
+    forcing homozygous reference tumor genotypes to heterozygous with the
+    forcedHet tag. ``tumor_gt`` is resolved from the input header by the
+    record loop, or from the record header when not given.
     """
-    new_info = []
+    if tumor_gt is None:
+        tumor_gt = SampleField(record.header, "TUMOR", "GT")
+    flag = tumor_gt.get(record) == (0, 0)
     if flag:
-        new_info.append(("forcedHet", True))
+        tumor_gt.set(record, (0, 1))
+
+    # forcedHet goes first (after a kept END) and TYPEOFSV where SVTYPE was,
+    # so the keys from the first changed one on are set again, in their order
+    keys = list(record.info)
+    if flag or keeps_end(record):
+        start = 0
+    elif "SVTYPE" in keys:
+        start = keys.index("SVTYPE")
+    else:
+        return translate_record(record, header)
+    values = [(key, record.info[key]) for key in keys[start:]]
+
+    record = translate_record(record, header, drop_info=keys[start:])
+    if flag:
+        record.info["forcedHet"] = True
+    for key, value in values:
+        record.info["TYPEOFSV" if key == "SVTYPE" else key] = value
+    return record
 
-    for k, v in record.info.items():
-        if k == "SVTYPE":
-            new_info.append(("TYPEOFSV", v))
-        else:
-            new_info.append((k, v))
-    return new_info
+
+def get_edits() -> List[Edit]:
+    """
+    Returns the text edits that make the same changes as format_record.
+    """
+    force_het = SetSampleGT("TUMOR", "0/1", replace=["0/0", "0|0"])
+    return [
+        force_het,
+        RenameInfoKey("SVTYPE", "TYPEOFSV"),
+        AddInfoFlag("forcedHet", after=force_het, first=True),
+        DropRedundantEnd(),
+    ]
+
+
+def _format_records(
+    logger: logging.Logger,
+    input_vcf: str,
+    reader: pysam.VariantFile,
+    output_vcf: str,
+    header: VariantHeaderT,
+    mode: PysamModeT,
+) -> int:
+    writer = pysam.VariantFile(output_vcf, mode=mode, header=header)
+    tumor_gt = SampleField(reader.header, "TUMOR", "GT")
+    progress = get_progress_reporter(logger, input_vcf, reader)
+    try:
+        with Logger.span("process_records"):
+            total = run_pipeline(
+                reader,
+                lambda record: format_record(record, writer.header, tumor_gt),
+                writer.write,
+                progress=progress,
+            )
+    finally:
+        reader.close()
+        writer.close()
+    return total
 
 
-def format_pindel_vcf(input_vcf: str, output_vcf: str) -> None:
+def format_pindel_vcf(
+    input_vcf: str, output_vcf: str, *, output_type: Optional[OutputTypeT] = None
+) -> None:
     """
     Formats Pindel VCFs to work better with GDC downstream workflows.
 
     :param input_vcf: The input VCF file to filter.
-    :param output_vcf: The output filtered VCF file to create. BGzip and tabix-index created if ends with '.gz'.
+    :param output_vcf: The output filtered VCF file to create. BGzip and tabix-index created if ends with '.gz', BCF and CSI-index if ends with '.bcf'.
+    :param output_type: Output format: v (VCF), z (bgzipped VCF), b (BCF) or u (uncompressed BCF). Defaults to the output file extension.
     """
     logger = Logger.get_logger("format_pindel_vcf")
     logger.info("Formats Pindel VCFs.")
 
     # setup
-    total = 0
-    reader = pysam.VariantFile(input_vcf)
-    header = get_header(reader.header)
-    mode = get_pysam_outmode(output_vcf)
-    writer = pysam.VariantFile(output_vcf, mode=mode, header=header)
-
-    # Process
-    try:
-        for record in reader.fetch():
-            total += 1
-
-            tgt = record.samples["TUMOR"]["GT"]
-            flag = tgt == (0, 0)
-            if flag:
-                record.samples["TUMOR"]["GT"] = (0, 1)
-            # Info
-            new_info = get_info(record, flag)
-
-            # New record
-            new_record = writer.new_record()
-            new_record.contig = record.contig
-            new_record.alleles = record.alleles
-            new_record.start = record.start
-            new_record.stop = record.stop
-            new_record.id = record.id
-            new_record.qual = record.qual
-
-            for f in record.filter:
-                new_record.filter.add(f)
-
-            for i in new_info:
-                new_record.info[i[0]] = i[1]
-
-            for sample_name, sample_data in record.samples.items():
-                for k, v in sample_data.items():
-                    new_record.samples[sample_name][k] = v
-            # for i, sample in enumerate(record.samples):
-            #    for k, v in record.samples[sample].items():
-            #        new_record.samples[i][k] = v
-            writer.write(new_record)
+    with Logger.span("open_input"):
+        reader = pysam.VariantFile(input_vcf)
+    with Logger.span("build_header"):
+        header = get_header(reader.header)
+    mode = get_pysam_outmode(output_vcf, output_type)
 
-    finally:
+    if can_rewrite(reader, input_vcf, output_vcf, mode):
         reader.close()
-        writer.close()
-
-    if output_vcf.endswith(".gz"):
-        logger.info("Creating tabix index...")
-        pysam.tabix_index(output_vcf, preset="vcf", force=True)
+        logger.info("Editing the records as text...")
+        vcf = VcfReader(input_vcf)
+        progress = get_progress_reporter(logger, input_vcf, position=vcf.tell_raw)
+        with Logger.span("process_records"):
+            total = rewrite_vcf(
+                vcf, output_vcf, str(header), get_edits(), mode, progress
+            )
+    else:
+        total = _format_records(logger, input_vcf, reader, output_vcf, header, mode)
+
+    index_vcf(logger, output_vcf, mode)
 
     logger.info("Processed {} records.".format(total))
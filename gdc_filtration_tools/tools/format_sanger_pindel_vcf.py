@@ -5,66 +5,92 @@
 @author: Kyle Hernandez <kmhernan@uchicago.edu>
 """
 
+import logging
+from typing import Optional
+
 import pysam
 
+from gdc_filtration_tools.accessors import SampleField
 from gdc_filtration_tools.logger import Logger
-from gdc_filtration_tools.utils import get_pysam_outmode
+from gdc_filtration_tools.pipeline import run_pipeline
+from gdc_filtration_tools.readvcf import VcfReader
+from gdc_filtration_tools.rewrite import (
+    DropRedundantEnd,
+    SetSampleGT,
+    can_rewrite,
+    rewrite_vcf,
+)
+from gdc_filtration_tools.translate import translate_record
+from gdc_filtration_tools.utils import (
+    OutputTypeT,
+    PysamModeT,
+    get_progress_reporter,
+    get_pysam_outmode,
+    index_vcf,
+)
+
+
+def _format_records(
+    logger: logging.Logger,
+    input_vcf: str,
+    reader: pysam.VariantFile,
+    output_vcf: str,
+    mode: PysamModeT,
+) -> int:
+    writer = pysam.VariantFile(output_vcf, mode=mode, header=reader.header)
+    tumor_gt = SampleField(reader.header, "TUMOR", "GT")
+    normal_gt = SampleField(reader.header, "NORMAL", "GT")
+    progress = get_progress_reporter(logger, input_vcf, reader)
+
+    def process(record: pysam.VariantRecord) -> pysam.VariantRecord:
+        tumor_gt.set(record, (0, 1))
+        normal_gt.set(record, (0, 0))
+        return translate_record(record, writer.header)
 
+    try:
+        with Logger.span("process_records"):
+            total = run_pipeline(reader, process, writer.write, progress=progress)
 
-def format_sanger_pindel_vcf(input_vcf: str, output_vcf: str) -> None:
+    finally:
+        reader.close()
+        writer.close()
+    return total
+
+
+def format_sanger_pindel_vcf(
+    input_vcf: str, output_vcf: str, *, output_type: Optional[OutputTypeT] = None
+) -> None:
     """
     Formats Sanger Pindel VCFs to work better with GDC downstream workflows.
 
     :param input_vcf: The input VCF file to format.
-    :param output_vcf: The output formatted VCF file to create. BGzip and tabix-index created if ends with '.gz'.
+    :param output_vcf: The output formatted VCF file to create. BGzip and tabix-index created if ends with '.gz', BCF and CSI-index if ends with '.bcf'.
+    :param output_type: Output format: v (VCF), z (bgzipped VCF), b (BCF) or u (uncompressed BCF). Defaults to the output file extension.
     """
     logger = Logger.get_logger("format_sanger_pindel_vcf")
     logger.info("Formats Sanger Pindel VCFs.")
 
     # setup
-    total = 0
-    reader = pysam.VariantFile(input_vcf)
-    mode = get_pysam_outmode(output_vcf)
-    writer = pysam.VariantFile(output_vcf, mode=mode, header=reader.header)
-
-    # Process
-    try:
-        for record in reader.fetch():
-            total += 1
-
-            record.samples["TUMOR"]["GT"] = (0, 1)
-            record.samples["NORMAL"]["GT"] = (0, 0)
-
-            # New record
-            new_record = writer.new_record()
-            new_record.contig = record.contig
-            new_record.alleles = record.alleles
-            new_record.start = record.start
-            new_record.stop = record.stop
-            new_record.id = record.id
-            new_record.qual = record.qual
-
-            for f in record.filter:
-                new_record.filter.add(f)
-
-            for k, v in record.info.items():
-                new_record.info[k] = v
-
-            for i, sample in enumerate(record.samples):
-                for k, v in record.samples[sample].items():
-                    new_record.samples[i][k] = v
+    with Logger.span("open_input"):
+        reader = pysam.VariantFile(input_vcf)
+    mode = get_pysam_outmode(output_vcf, output_type)
 
-            writer.write(new_record)
-
-            if total % 100000 == 0:
-                logger.info("Processed {0} records...".format(total))
-
-    finally:
+    if can_rewrite(reader, input_vcf, output_vcf, mode):
+        header = str(reader.header)
         reader.close()
-        writer.close()
-
-    if output_vcf.endswith(".gz"):
-        logger.info("Creating tabix index...")
-        pysam.tabix_index(output_vcf, preset="vcf", force=True)
+        logger.info("Editing the records as text...")
+        vcf = VcfReader(input_vcf)
+        progress = get_progress_reporter(logger, input_vcf, position=vcf.tell_raw)
+        edits = [
+            SetSampleGT("TUMOR", "0/1"),
+            SetSampleGT("NORMAL", "0/0"),
+            DropRedundantEnd(),
+        ]
+        with Logger.span("process_records"):
+            total = rewrite_vcf(vcf, output_vcf, header, edits, mode, progress)
+    else:
+        total = _format_records(logger, input_vcf, reader, output_vcf, mode)
+
+    index_vcf(logger, output_vcf, mode)
 
     logger.info("Processed {} records.".format(total))
@@ -12,52 +12,297 @@ Format Strelka2 VCF output and perform additional quality filtration.
 5. Ensure GT format specification exists in header
 """
 
-from typing import Tuple
+import heapq
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Generator, Iterable, Iterator, List, Optional, Tuple
 
 from pysam import tabix_index
 
-from gdc_filtration_tools.logger import Logger
-from gdc_filtration_tools.readvcf import GdcVcfRecord, VcfReader
-
-
-def format_strelka_vcf(input_vcf: str, output_vcf: str) -> None:
+from gdc_filtration_tools.bgzf import EOF_BLOCK, BgzfWriter
+from gdc_filtration_tools.formatcodec import get_codec
+from gdc_filtration_tools.logger import Logger, ProgressReporter
+from gdc_filtration_tools.readvcf import VcfReader, VcfRecord, VcfSectionTracker
+from gdc_filtration_tools.utils import (
+    STDIO_PATH,
+    get_progress_reporter,
+    open_bytes,
+)
+
+INDEL_INFO_KEYS = {
+    "IC",
+    "IHP",
+    "QSI",
+    "OVERLAP",
+    "QSI_NT",
+    "RC",
+    "RU",
+    "TQSI",
+    "TQSI_NT",
+}
+SNV_INFO_KEYS = {
+    "ACGTNacgtnMINUS",
+    "ACGTNacgtnPLUS",
+    "DP",
+    "QSS",
+    "QSS_NT",
+    "ReadPosRankSum",
+    "SNVSB",
+    "TQSS",
+    "TQSS_NT",
+}
+COMMON_INFO_KEYS = {
+    "MQ",
+    "MQ0",
+    "NT",
+    "SGT",
+    "SOMATIC",
+    "SomaticEVS",
+}
+
+# Ranges each worker formats, so a slow range does not hold up the others
+RANGES_PER_WORKER = 4
+
+
+def format_strelka_vcf(
+    input_vcf: str,
+    output_vcf: str,
+    *,
+    indel_vcf: Optional[str] = None,
+    region: Optional[str] = None,
+    workers: Optional[int] = None,
+) -> None:
     """
     Processes Strelka2 VCFs to add GT calls in standard format and adds a conservative quality
     filter to remove obviously incorrect variant calls.
 
     :param input_vcf: The input VCF file to undo the Picard header fix.
     :param output_vcf: The output formatted VCF file to create. BGzip and tabix-index created if ends with '.gz'.
+    :param indel_vcf: The Strelka2 INDEL VCF to merge with the SNV input_vcf into one sorted output.
+    :param region: Only format the records that start in this region, e.g. 'chr1:1-1000000'. Needs indexed BGZF inputs.
+    :param workers: Number of processes formatting byte ranges of an uncompressed or BGZF input without indel_vcf or region. Defaults to 1.
     """
 
     logger = Logger.get_logger("format_strelka_vcf")
     logger.info("Formats Strelka2 Somatic VCFs.")
     logger.info(f"Input: {input_vcf}")
+    if indel_vcf is not None:
+        logger.info(f"INDEL input: {indel_vcf}")
+    if region is not None:
+        logger.info(f"Region: {region}")
     logger.info(f"Output: {output_vcf}")
 
-    vcf = VcfReader(input_vcf)
-    vcf.header["FORMAT"] = ensure_gt(vcf.header["FORMAT"])
-    vcf.header["FILTER"] = add_filter(vcf.header["FILTER"])
-
-    with open(output_vcf.removesuffix(".gz"), "wt") as outvcf:
+    with Logger.span("open_input"):
+        vcf = VcfReader(input_vcf)
+        indels = None if indel_vcf is None else VcfReader(indel_vcf)
+    with Logger.span("build_header"):
+        if indels is not None:
+            vcf.header = merge_headers(vcf.header, indels.header)
+        vcf.header["FORMAT"] = ensure_gt(vcf.header["FORMAT"])
+        vcf.header["FILTER"] = add_filter(vcf.header["FILTER"])
+    header = "".join(line + "\n" for line in vcf.iter_header_lines()).encode()
+
+    workers = workers or 1
+    if (
+        workers > 1
+        and indels is None
+        and region is None
+        and (vcf.is_mapped or vcf.is_bgzf)
+    ):
+        ranges = vcf.split_records(workers * RANGES_PER_WORKER)
+        logger.info(f"Writing records in {len(ranges)} ranges with {workers} workers")
+        progress = get_progress_reporter(logger, input_vcf)
+        with Logger.span("process_records"):
+            count = _format_ranges(
+                input_vcf, output_vcf, header, ranges, workers, progress
+            )
+        logger.info(f"Finished writing {count} records")
+        logger.info("Indexing VCF")
+        if output_vcf.endswith(".gz"):
+            with Logger.span("tabix_index"):
+                # the parts are already bgzipped
+                tabix_index(output_vcf, preset="vcf", force=True)
+        logger.info("DONE")
+        return
+
+    lines: Iterator[bytes]
+    if indels is None:
+        lines = adjust_lines(vcf, region=region)
+    else:
+        # both inputs are sorted, so they are merged as they are formatted
+        lines = merge_lines(
+            list(vcf.header.get("contig", {})),
+            adjust_lines(vcf, region=region),
+            adjust_lines(indels, region=region),
+        )
+    if indels is None and region is None:
+        progress = get_progress_reporter(logger, input_vcf, position=vcf.tell_raw)
+    else:
+        progress = get_progress_reporter(logger, input_vcf)
+    with open_bytes(output_vcf.removesuffix(".gz"), "wb") as outvcf:
         # write header
         logger.info("Writing header")
-        for line in vcf.iter_header_lines():
-            print(line, file=outvcf)
-        # adjust and write rows
+        outvcf.write(header)
+        # adjust and write rows, without decoding the sample columns
         logger.info("Writing records")
         count = 0
-        for row in vcf.iter_rows():
-            new_row = adjust_record(row)
-            print(str(new_row), file=outvcf)
-            if count % 10000:
-                logger.info(f"written {count} records")
-        logger.info("Finished writing records")
+        with Logger.span("process_records"):
+            for line in lines:
+                outvcf.write(line + b"\n")
+                count += 1
+                progress.update(count)
+        logger.info(f"Finished writing {count} records")
     logger.info("Indexing VCF")
     if output_vcf.endswith(".gz"):
-        tabix_index(output_vcf.removesuffix(".gz"), preset="vcf")
+        with Logger.span("tabix_index"):
+            tabix_index(output_vcf.removesuffix(".gz"), preset="vcf")
     logger.info("DONE")
 
 
+def adjust_lines(
+    vcf: VcfReader,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    region: Optional[str] = None,
+) -> Generator[bytes, None, None]:
+    """
+    Yields the record lines of ``vcf``, of a range of them from
+    split_records or of a region, adjusted with adjust_line and without line
+    endings.
+    """
+    normal_index = vcf.column_names.index("NORMAL")
+    tumor_index = vcf.column_names.index("TUMOR")
+    for line in vcf.iter_raw_lines(start=start, end=end, region=region):
+        if line:
+            yield adjust_line(line, normal_index, tumor_index)
+
+
+def merge_lines(contigs: List[str], *sources: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Merges record lines from sources that are each sorted by position and by
+    contig in the order of ``contigs``, e.g. the contigs of the header. Lines
+    at the same position are kept in the order of the sources.
+    """
+    order = {contig.encode(): i for i, contig in enumerate(contigs)}
+
+    def key(line: bytes) -> Tuple[int, int]:
+        chrom, pos, _ = line.split(b"\t", 2)
+        if chrom not in order:
+            raise ValueError(f"Contig {chrom.decode()} is not in the header")
+        return order[chrom], int(pos)
+
+    return heapq.merge(*sources, key=key)
+
+
+def merge_headers(
+    header: dict[str, dict[str, str]], other: dict[str, dict[str, str]]
+) -> dict[str, dict[str, str]]:
+    """
+    Unions the header sections of the SNV and INDEL VCFs. Lines with an ID
+    already in ``header`` are kept from ``header`` and other lines are added
+    once. The column header lines must match.
+    """
+    columns = list(header.get("COLUMN_NAMES", {}).values())
+    if columns != list(other.get("COLUMN_NAMES", {}).values()):
+        raise ValueError("The SNV and INDEL VCFs have different columns")
+    merged = {
+        sid: dict(section) for sid, section in header.items() if sid != "COLUMN_NAMES"
+    }
+    seen = {line for section in merged.values() for line in section.values()}
+    for sid, section in other.items():
+        if sid == "COLUMN_NAMES":
+            continue
+        target = merged.setdefault(sid, {})
+        for line_id, line in section.items():
+            if line in seen:
+                continue
+            if sid in VcfSectionTracker.id_header_sections:
+                if line_id in target:
+                    continue
+            else:
+                # lines without an ID are keyed by a counter
+                n = len(target)
+                while str(n) in target:
+                    n += 1
+                line_id = str(n)
+            target[line_id] = line
+            seen.add(line)
+    merged["COLUMN_NAMES"] = header.get("COLUMN_NAMES", {})
+    return merged
+
+
+def _format_ranges(
+    input_vcf: str,
+    output_vcf: str,
+    header: bytes,
+    ranges: List[Tuple[int, int]],
+    workers: int,
+    progress: ProgressReporter,
+) -> int:
+    """
+    Formats each range of the records into its own part file in a process
+    pool, then writes the header and the parts in order to ``output_vcf``.
+    Bgzipped parts end without an EOF block, so they concatenate into one
+    BGZF file.
+    """
+    compress = output_vcf.endswith(".gz")
+    tmpdir = tempfile.mkdtemp(
+        dir=None if output_vcf == STDIO_PATH else os.path.dirname(output_vcf) or "."
+    )
+    try:
+        parts = [os.path.join(tmpdir, f"part{i}") for i in range(len(ranges))]
+        count = 0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for n in pool.map(
+                _format_range,
+                [input_vcf] * len(ranges),
+                [start for start, _ in ranges],
+                [end for _, end in ranges],
+                parts,
+                [compress] * len(ranges),
+            ):
+                count += n
+                progress.update(count)
+
+        with open_bytes(output_vcf, "wb") as outvcf:
+            if compress:
+                writer = BgzfWriter(outvcf)
+                writer.write(header)
+                writer.close(eof=False)
+            else:
+                outvcf.write(header)
+            for part in parts:
+                with open(part, "rb") as fh:
+                    shutil.copyfileobj(fh, outvcf)
+            if compress:
+                outvcf.write(EOF_BLOCK)
+    finally:
+        shutil.rmtree(tmpdir)
+    return count
+
+
+def _format_range(
+    input_vcf: str, start: int, end: int, part: str, compress: bool
+) -> int:
+    """
+    Formats the records in one range of ``input_vcf`` from split_records into
+    ``part``, bgzipped without an EOF block if ``compress``.
+    """
+    vcf = VcfReader(input_vcf)
+    count = 0
+    with open(part, "wb") as fh:
+        writer = BgzfWriter(fh) if compress else None
+        write = fh.write if writer is None else writer.write
+        for line in adjust_lines(vcf, start, end):
+            write(line + b"\n")
+            count += 1
+        if writer is not None:
+            writer.close(eof=False)
+    return count
+
+
 def ensure_gt(format_section: dict[str, str]) -> dict[str, str]:
     """
     Ensure GT format specification exists in header
@@ -78,7 +323,7 @@ def add_filter(filter_section: dict[str, str]) -> dict[str, str]:
     return filter_section
 
 
-# def adjust_record(row: GdcVcfRecord) -> GdcVcfRecord:
+# def adjust_record(row: VcfRecord) -> VcfRecord:
 #     """
 #     Orchestrate adjustments to individual record
 #     """
@@ -86,7 +331,7 @@ def add_filter(filter_section: dict[str, str]) -> dict[str, str]:
 #     return adjust_fn(row)
 
 
-def adjust_SNV(row: GdcVcfRecord) -> GdcVcfRecord:
+def adjust_SNV(row: VcfRecord) -> VcfRecord:
     """
     Extract germline GT from NT INFO field
     Set somatic GT to 0/1
@@ -102,11 +347,11 @@ def adjust_SNV(row: GdcVcfRecord) -> GdcVcfRecord:
     n_str = ":".join([germline_GT] + n_values)
     t_str = ":".join([somatic_GT] + t_values)
     # add GT tag to FORMAT
-    fmt = "GT:" + row.FORMAT
+    fmt = get_codec(row.FORMAT).prepend("GT").format
     return row.replace(NORMAL=n_str, TUMOR=t_str, FORMAT=fmt)
 
 
-def adjust_INDEL(row: GdcVcfRecord) -> GdcVcfRecord:
+def adjust_INDEL(row: VcfRecord) -> VcfRecord:
     """
     Extract somatic GT from NT INFO field
     Extract germline GT from SGT INFO field
@@ -124,7 +369,7 @@ def adjust_INDEL(row: GdcVcfRecord) -> GdcVcfRecord:
     n_str = ":".join([germline_GT] + n_values)
     t_str = ":".join([somatic_GT] + t_values)
     # add GT tag to FORMAT
-    fmt = "GT:" + row.FORMAT
+    fmt = get_codec(row.FORMAT).prepend("GT").format
     # filter QSI
     flt_str = row.FILTER
     if qsi_filter(row):
@@ -134,7 +379,7 @@ def adjust_INDEL(row: GdcVcfRecord) -> GdcVcfRecord:
     return row.replace(NORMAL=n_str, TUMOR=t_str, FORMAT=fmt, FILTER=flt_str)
 
 
-def qsi_filter(row: GdcVcfRecord) -> bool:
+def qsi_filter(row: VcfRecord) -> bool:
     """
     A filter to catch low quality data that was still making it past the EVS filter.
     QSI Values above 11 pass the filter.
@@ -159,47 +404,52 @@ def convert_gt_spec(strelka_gt: str) -> str:
     return conversion[strelka_gt]
 
 
-def adjust_record(row: GdcVcfRecord) -> GdcVcfRecord:
-    indel_info_key_set = {
-        "IC",
-        "IHP",
-        "QSI",
-        "OVERLAP",
-        "QSI_NT",
-        "RC",
-        "RU",
-        "TQSI",
-        "TQSI_NT",
-    }
-    snv_info_key_set = {
-        "ACGTNacgtnMINUS",
-        "ACGTNacgtnPLUS",
-        "DP",
-        "QSS",
-        "QSS_NT",
-        "ReadPosRankSum",
-        "SNVSB",
-        "TQSS",
-        "TQSS_NT",
-    }
-    common_key_set = {
-        "MQ",
-        "MQ0",
-        "NT",
-        "SGT",
-        "SOMATIC",
-        "SomaticEVS",
-    }
+def adjust_record(row: VcfRecord) -> VcfRecord:
     info = parse_info(row.INFO)
-    if set(info.keys()) - indel_info_key_set == common_key_set:
+    if is_indel(info, row.INFO):
         return adjust_INDEL(row)
-    if set(info.keys()) - snv_info_key_set == common_key_set:
-        return adjust_SNV(row)
+    return adjust_SNV(row)
+
+
+def adjust_line(line: bytes, normal_index: int = 9, tumor_index: int = 10) -> bytes:
+    """
+    Same as adjust_record for a raw record line without its line ending.
+    Only the INFO column is decoded, the other columns are kept as bytes.
+    """
+    fields = line.split(b"\t")
+    info_string = fields[7].decode()
+    info = parse_info(info_string)
+    germline_GT = convert_gt_spec(info["NT"])
+    if is_indel(info, info_string):
+        somatic_GT = convert_gt_spec(info["SGT"].split("->", 1)[1])
+        # filter QSI
+        if int(info["QSI"]) <= 10:
+            flt_items = [flt for flt in fields[6].split(b";") if flt != b"PASS"]
+            flt_items += [b"LowQSI"]
+            fields[6] = b";".join(flt_items)
+    else:
+        somatic_GT = "0/1"
+    fields[8] = get_codec(fields[8]).prepend(b"GT").format
+    fields[normal_index] = germline_GT.encode() + b":" + fields[normal_index]
+    fields[tumor_index] = somatic_GT.encode() + b":" + fields[tumor_index]
+    return b"\t".join(fields)
+
+
+def is_indel(info: dict, info_string: str) -> bool:
+    """
+    Returns True for INDEL records and False for SNV records, based on the
+    INFO keys.
+    """
+    keys = set(info.keys())
+    if keys - INDEL_INFO_KEYS == COMMON_INFO_KEYS:
+        return True
+    if keys - SNV_INFO_KEYS == COMMON_INFO_KEYS:
+        return False
     raise ValueError(
-        f"Row INFO section contained unexpected set of keys: {row.INFO}\n"
-        f"Expected: {common_key_set}\n"
-        f"And either: {indel_info_key_set}\n"
-        f"OR: {snv_info_key_set}\n"
+        f"Row INFO section contained unexpected set of keys: {info_string}\n"
+        f"Expected: {COMMON_INFO_KEYS}\n"
+        f"And either: {INDEL_INFO_KEYS}\n"
+        f"OR: {SNV_INFO_KEYS}\n"
     )
 
 
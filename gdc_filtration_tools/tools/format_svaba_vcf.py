@@ -3,12 +3,19 @@
 @author: Linghao Song <linghao@uchicago.edu>
 """
 
-from typing import TypeAlias
+from typing import Optional, TypeAlias
 
 import pysam
 
 from gdc_filtration_tools.logger import Logger
-from gdc_filtration_tools.utils import get_pysam_outmode
+from gdc_filtration_tools.pipeline import run_pipeline
+from gdc_filtration_tools.translate import translate_record
+from gdc_filtration_tools.utils import (
+    OutputTypeT,
+    get_progress_reporter,
+    get_pysam_outmode,
+    index_vcf,
+)
 
 VariantHeaderT: TypeAlias = pysam.VariantHeader
 VariantRecordT: TypeAlias = pysam.VariantRecord
@@ -66,73 +73,85 @@ def get_header(old_header: VariantHeaderT) -> VariantHeaderT:
     return header
 
 
-def fill_new_variant_record(
-    old_record: VariantRecordT, new_record: VariantRecordT
-) -> VariantRecordT:
+def format_record(record: VariantRecordT, header: VariantHeaderT) -> VariantRecordT:
     """
-    Copy data from old variant record to new record while making the following changes:
+    Moves the record to the new header while making the following changes:
     Format field GQ is set to 0 in all cases
     Format field PL is rounded to the nearest integer value
+    Format field AD is split into the ref and alt depths, using DP
     """
-    new_record.contig = old_record.contig
-    new_record.start = old_record.start
-    new_record.stop = old_record.stop
-    new_record.id = old_record.id
-    new_record.alleles = old_record.alleles
-    new_record.qual = old_record.qual
-    for f in old_record.filter:
-        new_record.filter.add(str(f))
-    for k, v in old_record.info.items():
-        new_record.info[k] = v
-    for sample_name, sample_data in old_record.samples.items():
-        for k, v in sample_data.items():
-            if k == "GQ":
-                new_record.samples[sample_name][k] = 0
-            elif k == "PL":
-                new_record.samples[sample_name][k] = tuple([int(round(i)) for i in v])
-            elif k == "AD":
-                dp = sample_data["DP"]
-                ad = v
-                ref_dp = dp - ad
-                alt_dp = ad
-                new_record.samples[sample_name][k] = tuple([ref_dp, alt_dp])
-            else:
-                new_record.samples[sample_name][k] = v
-    return new_record
-
-
-def format_svaba_vcf(input_vcf: str, output_vcf: str) -> None:
+    keys = list(record.format)
+    changed = [i for i, key in enumerate(keys) if key in ("GQ", "PL", "AD")]
+    if not changed:
+        return translate_record(record, header)
+
+    # the keys from the first changed one on are set again, in their order
+    reset = keys[changed[0] :]
+    samples = []
+    for name, data in record.samples.items():
+        values = {key: data.get(key) for key in reset}
+        if values.get("AD") is not None:
+            dp = data.get("DP")
+            if dp is None:
+                raise ValueError(
+                    "Sample {0} at {1}:{2} has AD but no DP".format(
+                        name, record.chrom, record.pos
+                    )
+                )
+            values["AD"] = (dp - values["AD"], values["AD"])
+        if "GQ" in values:
+            values["GQ"] = 0
+        if values.get("PL") is not None:
+            values["PL"] = tuple([int(round(i)) for i in values["PL"]])
+        samples.append((name, values))
+
+    record = translate_record(record, header, drop_format=reset)
+    for name, values in samples:
+        data = record.samples[name]
+        for key, value in values.items():
+            # pysam can't set a missing value for the per-allele AD and PL
+            if value is not None or key not in ("AD", "PL"):
+                data[key] = value
+    return record
+
+
+def format_svaba_vcf(
+    input_vcf: str, output_vcf: str, *, output_type: Optional[OutputTypeT] = None
+) -> None:
     """
     Formats SvABA indel VCFs to work better with GDC downstream workflows.
 
     :param input_vcf: The input VCF file to undo the Picard header fix.
-    :param output_vcf: The output formatted VCF file to create. BGzip and tabix-index created if ends with '.gz'.
+    :param output_vcf: The output formatted VCF file to create. BGzip and tabix-index created if ends with '.gz', BCF and CSI-index if ends with '.bcf'.
+    :param output_type: Output format: v (VCF), z (bgzipped VCF), b (BCF) or u (uncompressed BCF). Defaults to the output file extension.
     """
     logger = Logger.get_logger("format_svaba_vcf")
     logger.info("Formats SvABA indel VCFs.")
 
     # setup
-    total = 0
-    reader = pysam.VariantFile(input_vcf)
-    mode = get_pysam_outmode(output_vcf)
+    with Logger.span("open_input"):
+        reader = pysam.VariantFile(input_vcf)
+    mode = get_pysam_outmode(output_vcf, output_type)
     if not check_samples(reader):
         raise ValueError("Expected samples [NORMAL, TUMOR] not found.")
-    header = get_header(reader.header.copy())
+    with Logger.span("build_header"):
+        header = get_header(reader.header.copy())
     writer = pysam.VariantFile(output_vcf, mode=mode, header=header)
+    progress = get_progress_reporter(logger, input_vcf, reader)
+
     # Process
     try:
-        for old_record in reader.fetch():
-            new_record = fill_new_variant_record(old_record, writer.new_record())
-            writer.write(new_record)
-            total += 1
-            if total % 100000 == 0:
-                logger.info("Processed {0} records...".format(total))
+        with Logger.span("process_records"):
+            total = run_pipeline(
+                reader,
+                lambda record: format_record(record, writer.header),
+                writer.write,
+                progress=progress,
+            )
     finally:
         reader.close()
         writer.close()
 
-    if output_vcf.endswith(".gz"):
-        logger.info("Creating tabix index...")
-        pysam.tabix_index(output_vcf, preset="vcf", force=True)
+    index_vcf(logger, output_vcf, mode)
 
     logger.info("Processed {} records.".format(total))
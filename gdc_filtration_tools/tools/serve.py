@@ -0,0 +1,251 @@
+"""Persistent worker daemon that runs filtration jobs submitted over a
+Unix domain socket.
+
+The daemon keeps a warm process pool whose workers have already imported
+the tools and keep reference handles and parsed metrics cached between
+jobs, so many small jobs do not each pay for interpreter startup.
+
+Clients send one JSON object per line and receive one JSON object per line
+for each request, in the order the jobs finish:
+
+    {"id": "job-1", "argv": ["filter-contigs", "in.vcf", "out.vcf"], "cwd": "/data"}
+    {"id": "job-1", "status": 0, "error": null, "stdout": "", "elapsed_sec": 0.02, ...}
+
+``{"control": "ping"}`` returns the daemon status and
+``{"control": "shutdown"}`` stops it.
+"""
+
+import concurrent.futures
+import functools
+import json
+import os
+import queue
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Union
+
+from gdc_filtration_tools import commands
+from gdc_filtration_tools.jobs import NESTED_COMMANDS, init_worker, run_job, warm_up
+from gdc_filtration_tools.logger import Logger
+
+
+class JobServer(socketserver.ThreadingUnixStreamServer):
+    """Unix socket server that dispatches job requests to a process pool."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, pool: ProcessPoolExecutor, workers: int):
+        self.pool = pool
+        self.workers = workers
+        self.started = time.monotonic()
+        self.submitted = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        super().__init__(socket_path, JobHandler)
+
+    def dispatch(
+        self, request: Dict[str, Any]
+    ) -> Union[Dict[str, Any], "Future[Dict[str, Any]]"]:
+        """
+        Handles a request. Job requests are submitted to the pool and return
+        a Future; control and invalid requests return the reply.
+        """
+        job_id = request.get("id")
+        control = request.get("control")
+        if control == "ping":
+            return {"id": job_id, "status": 0, "error": None, **self.stats()}
+        if control == "shutdown":
+            threading.Thread(target=self.shutdown).start()
+            return {"id": job_id, "status": 0, "error": None, **self.stats()}
+        argv = request.get("argv")
+        if control is not None or not isinstance(argv, list):
+            return {"id": job_id, "status": 2, "error": "Invalid request"}
+
+        with self._lock:
+            self.submitted += 1
+        return self.pool.submit(run_job, [str(i) for i in argv], request.get("cwd"))
+
+    def result(self, job_id: Any, future: "Future[Dict[str, Any]]") -> Dict[str, Any]:
+        """Builds the reply for a finished job."""
+        try:
+            reply = future.result()
+        except Exception as e:
+            # e.g. BrokenProcessPool when a worker is killed
+            reply = {"status": 1, "error": "{0}: {1}".format(type(e).__name__, e)}
+        if reply["status"] != 0:
+            with self._lock:
+                self.failed += 1
+        return {"id": job_id, **reply}
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the daemon status."""
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "workers": self.workers,
+                "submitted": self.submitted,
+                "failed": self.failed,
+                "uptime_sec": round(time.monotonic() - self.started, 3),
+            }
+
+
+class JobHandler(socketserver.StreamRequestHandler):
+    """Reads requests from a connection and streams back the replies."""
+
+    server: JobServer
+
+    def handle(self) -> None:
+        replies: "queue.SimpleQueue[Optional[Dict[str, Any]]]" = queue.SimpleQueue()
+        writer = threading.Thread(target=self.write_replies, args=(replies,))
+        writer.start()
+
+        pending = []
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("request must be a JSON object")
+            except ValueError as e:
+                replies.put(
+                    {"id": None, "status": 2, "error": "Invalid request: {0}".format(e)}
+                )
+                continue
+
+            reply = self.server.dispatch(request)
+            if isinstance(reply, dict):
+                replies.put(reply)
+                continue
+            reply.add_done_callback(
+                functools.partial(self.queue_result, replies, request.get("id"))
+            )
+            pending.append(reply)
+
+        concurrent.futures.wait(pending)
+        replies.put(None)
+        writer.join()
+
+    def queue_result(
+        self,
+        replies: "queue.SimpleQueue[Optional[Dict[str, Any]]]",
+        job_id: Any,
+        future: "Future[Dict[str, Any]]",
+    ) -> None:
+        """Queues the reply of a finished job."""
+        replies.put(self.server.result(job_id, future))
+
+    def write_replies(
+        self, replies: "queue.SimpleQueue[Optional[Dict[str, Any]]]"
+    ) -> None:
+        """Writes replies as they arrive until the None sentinel."""
+        while True:
+            reply = replies.get()
+            if reply is None:
+                return
+            try:
+                self.wfile.write(json.dumps(reply).encode() + b"\n")
+                self.wfile.flush()
+            except OSError:
+                # The client went away, keep draining the queue
+                pass
+
+
+def submit_job(
+    socket_path: str,
+    argv: List[str],
+    *,
+    job_id: Optional[str] = None,
+    cwd: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Submits a job to a ``serve`` daemon and waits for its reply.
+
+    :param socket_path: The Unix socket the daemon listens on.
+    :param argv: The subcommand and its arguments.
+    :param job_id: Optional identifier echoed back in the reply.
+    :param cwd: Directory relative paths are resolved from. Defaults to the current one.
+    :return: the reply with the exit status and metrics of the job
+    """
+    request = {"id": job_id, "argv": argv, "cwd": cwd or os.getcwd()}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        sock.shutdown(socket.SHUT_WR)
+        with sock.makefile("rb") as fh:
+            line = fh.readline()
+    if not line:
+        raise ConnectionError("No reply from {0}".format(socket_path))
+    return dict(json.loads(line))
+
+
+def serve(
+    socket_path: str,
+    *,
+    workers: Optional[int] = None,
+    preload: Optional[List[str]] = None,
+) -> None:
+    """
+    Runs a daemon that serves filtration jobs over a Unix domain socket
+    with a warm process pool. Jobs are submitted with the submit subcommand
+    or by writing JSON requests to the socket.
+
+    :param socket_path: The Unix socket to listen on.
+    :param workers: Number of worker processes. Defaults to the number of CPUs.
+    :param preload: Subcommands each worker imports at startup. Defaults to all.
+    """
+    logger = Logger.get_logger("serve")
+    workers = workers or os.cpu_count() or 1
+    if preload is None:
+        preload = [i for i in commands.COMMANDS if i not in NESTED_COMMANDS]
+
+    if os.path.exists(socket_path):
+        logger.warning("Removing stale socket {0}".format(socket_path))
+        os.unlink(socket_path)
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=init_worker, initargs=(preload,)
+    ) as pool:
+        warm_up(pool, workers)
+        server = JobServer(socket_path, pool, workers)
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(
+                signal.SIGTERM,
+                lambda *_: threading.Thread(target=server.shutdown).start(),
+            )
+        logger.info("Serving jobs on {0} with {1} workers".format(socket_path, workers))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            os.unlink(socket_path)
+
+    stats = server.stats()
+    logger.info(
+        "Processed {0} jobs - {1} failed".format(stats["submitted"], stats["failed"])
+    )
+
+
+def submit(socket_path: str, *command: str) -> None:
+    """
+    Submits a job to a serve daemon and waits for it to finish, e.g.
+    ``submit /tmp/gdc.sock -- filter-contigs in.vcf out.vcf``. The job stdout
+    is written to stdout and the command exits with the job exit status.
+
+    :param socket_path: The Unix socket the daemon listens on.
+    :param command: The subcommand to run and its arguments.
+    """
+    logger = Logger.get_logger("submit")
+    reply = submit_job(socket_path, list(command))
+    sys.stdout.write(reply.pop("stdout", None) or "")
+    logger.info("Job metrics: {0}".format(json.dumps(reply)))
+    if reply["status"] != 0:
+        logger.error(reply["error"])
+        raise SystemExit(reply["status"])
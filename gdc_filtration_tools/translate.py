@@ -0,0 +1,69 @@
+"""Moves pysam records to a new header without copying their fields.
+
+Formatters that change a few header lines used to build every output record
+with ``writer.new_record()`` and copy each field through Python. htslib can
+instead remap the header IDs of a record in place, so only the fields a
+tool changes have to be rewritten.
+"""
+
+from typing import Any, Iterable, List, Tuple, TypeAlias
+
+import pysam
+
+VariantHeaderT: TypeAlias = pysam.VariantHeader
+VariantRecordT: TypeAlias = pysam.VariantRecord
+
+
+def keeps_end(record: VariantRecordT) -> bool:
+    """
+    Checks whether pysam writes the INFO END of ``record``, which it only
+    keeps when the end differs from the one implied by POS and REF.
+    """
+    return bool(record.stop != record.pos + len(record.ref or "") - 1)
+
+
+def translate_record(
+    record: VariantRecordT,
+    header: VariantHeaderT,
+    drop_info: Iterable[str] = (),
+    drop_format: Iterable[str] = (),
+) -> VariantRecordT:
+    """
+    Retargets ``record`` to ``header`` in place. The header must declare the
+    same samples and every key left in the record. Keys that are renamed or
+    change type in the new header are removed first with ``drop_info`` and
+    ``drop_format`` and set again by the caller on the returned record.
+
+    The copying formatters set the stop before the INFO keys, so a kept END
+    came first. When it does, the other INFO keys are set again after it,
+    unless the caller drops them all itself.
+
+    :param record: the record read with the input header
+    :param header: the output header, e.g. ``writer.header``
+    :param drop_info: INFO keys to remove before translating
+    :param drop_format: FORMAT keys to remove before translating
+    :return: the translated record, or a packed copy of it if keys were removed
+    """
+    reset: List[Tuple[str, Any]] = []
+    if keeps_end(record):
+        drop = set(drop_info)
+        reset = [(key, record.info[key]) for key in record.info if key not in drop]
+        drop_info = list(record.info)
+
+    dropped = False
+    for key in drop_info:
+        if key in record.info:
+            del record.info[key]
+            dropped = True
+    for key in drop_format:
+        if key in record.format:
+            del record.format[key]
+            dropped = True
+    record.translate(header)
+    if dropped:
+        # htslib only marks removed keys until the record is packed, and
+        # setting one again would reuse its old type
+        record = record.copy()
+    for key, value in reset:
+        record.info[key] = value
+    return record
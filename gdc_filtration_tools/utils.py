@@ -4,17 +4,200 @@ package.
 @author: Kyle Hernandez <kmhernan@uchicago.edu>
 """
 
-from typing import cast
+import logging
+import os
+import sys
+from contextlib import contextmanager
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Generator,
+    Optional,
+    TextIO,
+    cast,
+)
 
 from typing_extensions import Literal
 
+from gdc_filtration_tools.logger import Logger, ProgressReporter
+from gdc_filtration_tools.vcfindex import find_index, read_index
 
-def get_pysam_outmode(fname: str) -> Literal["r", "w", "wh", "rb", "wb", "wbu", "wb0"]:
+BGZF_MAGIC = b"\x1f\x8b\x08\x04"
+STDIO_PATH = "-"
+
+
+OutputTypeT = Literal["v", "z", "b", "u"]
+PysamModeT = Literal["r", "w", "wh", "rb", "wb", "wbu", "wb0"]
+
+OUTPUT_TYPE_MODES: Dict[str, str] = {
+    "v": "w",
+    "z": "wz",
+    "b": "wb",
+    "u": "wb0",
+}
+
+
+def get_output_type(fname: str, output_type: Optional[str] = None) -> OutputTypeT:
+    """
+    Resolves the output format of ``fname``: ``v`` (VCF), ``z`` (bgzipped
+    VCF), ``b`` (BCF) or ``u`` (uncompressed BCF). An explicit
+    ``output_type`` wins over the extension.
+
+    :param fname: the output filename
+    :param output_type: the requested output type, if any
+    :return: the output type
+    """
+    if output_type is not None:
+        if output_type not in OUTPUT_TYPE_MODES:
+            raise ValueError("Unknown output type: {0}".format(output_type))
+        return cast(OutputTypeT, output_type)
+    if fname == STDIO_PATH:
+        return "u"
+    if fname.endswith(".bcf"):
+        return "b"
+    if fname.endswith((".gz", ".bgz")):
+        return "z"
+    return "v"
+
+
+def get_pysam_outmode(fname: str, output_type: Optional[str] = None) -> PysamModeT:
     """
-    Based on the filename returns wz etc.
+    Based on the filename (or ``output_type``) returns the pysam write mode:
+    ``w`` for VCF, ``wz`` for bgzipped VCF, ``wb`` for BCF and ``wb0`` for
+    uncompressed BCF. Standard output (``-``) is written as uncompressed
+    BCF, which is the cheapest format to pass between processes in a
+    pipeline.
 
     :param fname: the output filename
+    :param output_type: the requested output type, if any
     :return: string pysam mode
     """
-    mode = "w" if fname.endswith("gz") else "w"
-    return cast(Literal["r", "w", "wh", "rb", "wb", "wbu", "wb0"], mode)
+    # The pysam stubs do not list "wz", which pysam accepts
+    return cast(PysamModeT, OUTPUT_TYPE_MODES[get_output_type(fname, output_type)])
+
+
+def index_vcf(logger: logging.Logger, fname: str, mode: str) -> Optional[str]:
+    """
+    Indexes an output written with the pysam ``mode``: bgzipped VCFs get a
+    tabix index and compressed BCFs a CSI index. Plain VCF, uncompressed
+    BCF and standard output are not indexed.
+
+    :param logger: the tool logger
+    :param fname: the output file
+    :param mode: the pysam mode the file was written with
+    :return: the index path, if one was created
+    """
+    if fname == STDIO_PATH or mode not in ("wz", "wb"):
+        return None
+    csi = mode == "wb"
+    logger.info("Creating {0} index...".format("CSI" if csi else "tabix"))
+    # Imported here so tools that only read or write text do not pay for
+    # importing pysam.
+    import pysam
+
+    with Logger.span("tabix_index"):
+        pysam.tabix_index(fname, preset="vcf", force=True, csi=csi)
+    return fname + (".csi" if csi else ".tbi")
+
+
+@contextmanager
+def open_text(fname: str, mode: str = "rt") -> Generator[TextIO, None, None]:
+    """
+    Opens a text file, or stdin/stdout when ``fname`` is ``-``. The
+    standard streams are flushed but not closed.
+
+    :param fname: the file to open or ``-``
+    :param mode: the open mode
+    :return: the file handle
+    """
+    if fname != STDIO_PATH:
+        with open(fname, mode) as fh:
+            yield cast(TextIO, fh)
+        return
+    stream = sys.stdin if "r" in mode else sys.stdout
+    try:
+        yield stream
+    finally:
+        if "r" not in mode:
+            stream.flush()
+
+
+@contextmanager
+def open_bytes(fname: str, mode: str = "rb") -> Generator[BinaryIO, None, None]:
+    """
+    Opens a binary file, or the buffer of stdin/stdout when ``fname`` is
+    ``-``. The standard streams are flushed but not closed.
+
+    :param fname: the file to open or ``-``
+    :param mode: the open mode
+    :return: the file handle
+    """
+    if fname != STDIO_PATH:
+        with open(fname, mode) as fh:
+            yield cast(BinaryIO, fh)
+        return
+    stream = sys.stdin.buffer if "r" in mode else sys.stdout.buffer
+    try:
+        yield cast(BinaryIO, stream)
+    finally:
+        if "r" not in mode:
+            stream.flush()
+
+
+def is_bgzf(fname: str) -> bool:
+    """
+    Checks the magic bytes of ``fname`` for a BGZF (bgzip/BCF) file.
+
+    :param fname: the file to check
+    :return: True if the file is BGZF compressed
+    """
+    with open(fname, "rb") as fh:
+        return fh.read(4) == BGZF_MAGIC
+
+
+def _reader_position(reader: Any, shift: int) -> Callable[[], int]:
+    def position() -> int:
+        return int(reader.tell()) >> shift
+
+    return position
+
+
+def get_progress_reporter(
+    logger: logging.Logger,
+    input_path: str,
+    reader: Optional[Any] = None,
+    position: Optional[Callable[[], int]] = None,
+) -> ProgressReporter:
+    """
+    Builds a ProgressReporter for a tool reading ``input_path``. The record
+    total is taken from the index metadata when the input is indexed, and the
+    file size and the position of ``reader`` (a pysam.VariantFile) are used
+    otherwise.
+
+    :param logger: the tool logger
+    :param input_path: the input file
+    :param reader: the open pysam.VariantFile, if any
+    :param position: returns the byte offset reached in ``input_path``, if no reader
+    :return: the progress reporter
+    """
+    total_records = None
+    total_bytes = None
+    if os.path.isfile(input_path):
+        total_bytes = os.path.getsize(input_path)
+        index_path = find_index(input_path)
+        if index_path is not None:
+            try:
+                total_records = read_index(index_path).n_mapped
+            except (OSError, ValueError):
+                pass
+        if reader is not None:
+            # pysam reports virtual offsets for BGZF inputs
+            position = _reader_position(reader, 16 if is_bgzf(input_path) else 0)
+    return ProgressReporter(
+        logger,
+        total_records=total_records,
+        total_bytes=total_bytes,
+        position=position,
+    )
@@ -0,0 +1,197 @@
+"""Minimal readers for tabix (.tbi) and CSI (.csi) index files.
+
+pysam does not expose the per-contig metadata stored in the pseudo-bin of
+an index (the virtual offsets of the first and last record and the number
+of mapped records), so this module parses the binary index directly.
+"""
+
+import gzip
+import os
+import struct
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from gdc_filtration_tools.bgzf import BgzfWriter
+
+TBI_MAGIC = b"TBI\x01"
+CSI_MAGIC = b"CSI\x01"
+
+
+class IndexReference(NamedTuple):
+    """Per-contig metadata from the index pseudo-bin."""
+
+    name: str
+    off_beg: int
+    off_end: int
+    n_mapped: int
+    n_unmapped: int
+
+
+class VcfIndex(object):
+    """
+    Parsed tabix or CSI index. ``references`` are in index order and keyed by
+    contig name in ``by_name``. Contigs without records have no pseudo-bin
+    and are reported with zero counts. ``has_metadata`` is False when a
+    contig with records has no pseudo-bin either, as in indexes written by
+    some older or third-party indexers, and the counts can't be trusted.
+    """
+
+    def __init__(
+        self, path: str, references: List[IndexReference], has_metadata: bool = True
+    ) -> None:
+        self.path = path
+        self.references = references
+        self.has_metadata = has_metadata
+        self.by_name: Dict[str, IndexReference] = {i.name: i for i in references}
+
+    @property
+    def n_mapped(self) -> int:
+        return sum(i.n_mapped for i in self.references)
+
+    def contigs_with_records(self) -> List[str]:
+        return [i.name for i in self.references if i.n_mapped > 0]
+
+
+def find_index(vcf_path: str) -> Optional[str]:
+    """
+    Returns the path to the ``.tbi`` or ``.csi`` index next to ``vcf_path``
+    or None if neither exists.
+    """
+    for suffix in (".tbi", ".csi"):
+        if os.path.exists(vcf_path + suffix):
+            return vcf_path + suffix
+    return None
+
+
+def _read_names(data: bytes, offset: int) -> Tuple[List[str], int]:
+    # tabix header: format, col_seq, col_beg, col_end, meta, skip, l_nm
+    (l_nm,) = struct.unpack_from("<i", data, offset + 24)
+    start = offset + 28
+    names = data[start : start + l_nm].split(b"\x00")
+    return [i.decode() for i in names if i], start + l_nm
+
+
+def _read_bins(
+    data: bytes, offset: int, pseudo_bin: int, has_loffset: bool
+) -> Tuple[Optional[Tuple[int, int, int, int]], int, int]:
+    (n_bin,) = struct.unpack_from("<i", data, offset)
+    offset += 4
+    meta = None
+    for _ in range(n_bin):
+        (bin_id,) = struct.unpack_from("<I", data, offset)
+        offset += 12 if has_loffset else 4
+        (n_chunk,) = struct.unpack_from("<i", data, offset)
+        offset += 4
+        if bin_id == pseudo_bin and n_chunk == 2:
+            meta = struct.unpack_from("<QQQQ", data, offset)
+        offset += 16 * n_chunk
+    return meta, n_bin, offset
+
+
+def read_index(index_path: str, contigs: Optional[List[str]] = None) -> VcfIndex:
+    """
+    Parses the per-contig metadata of a tabix or CSI index. ``contigs`` are
+    required for CSI indexes of BCF files, which do not store contig names
+    and instead use the order of the contig lines in the header.
+
+    :param index_path: Path to the ``.tbi`` or ``.csi`` file.
+    :param contigs: Header contig names in order.
+    """
+    with gzip.open(index_path, "rb") as fh:
+        data = fh.read()
+
+    magic = data[:4]
+    if magic == TBI_MAGIC:
+        (n_ref,) = struct.unpack_from("<i", data, 4)
+        names, offset = _read_names(data, 8)
+        pseudo_bin = 37450
+        has_loffset = False
+    elif magic == CSI_MAGIC:
+        min_shift, depth, l_aux = struct.unpack_from("<iii", data, 4)
+        offset = 16
+        names = _read_names(data, offset)[0] if l_aux >= 28 else list(contigs or [])
+        offset += l_aux
+        (n_ref,) = struct.unpack_from("<i", data, offset)
+        offset += 4
+        pseudo_bin = ((1 << ((depth + 1) * 3)) - 1) // 7 + 1
+        has_loffset = True
+    else:
+        raise ValueError("Unrecognized index format: {0}".format(index_path))
+
+    references = []
+    has_metadata = True
+    for i in range(n_ref):
+        meta, n_bin, offset = _read_bins(data, offset, pseudo_bin, has_loffset)
+        if meta is None and n_bin > 0:
+            has_metadata = False
+        if magic == TBI_MAGIC:
+            (n_intv,) = struct.unpack_from("<i", data, offset)
+            offset += 4 + 8 * n_intv
+        name = names[i] if i < len(names) else str(i)
+        off_beg, off_end, n_mapped, n_unmapped = meta or (0, 0, 0, 0)
+        references.append(IndexReference(name, off_beg, off_end, n_mapped, n_unmapped))
+    return VcfIndex(index_path, references, has_metadata)
+
+
+def remap_index(index_path: str, output_path: str, remap: Callable[[int], int]) -> None:
+    """
+    Writes a copy of a tabix or CSI index with every virtual offset passed
+    through ``remap``, for a data file whose blocks moved but whose records
+    did not change (e.g. after replacing the header).
+
+    :param index_path: Path to the ``.tbi`` or ``.csi`` file.
+    :param output_path: Path to the index to write.
+    :param remap: Maps a virtual offset of the old file to the new file.
+    """
+    with gzip.open(index_path, "rb") as fh:
+        data = bytearray(fh.read())
+
+    def remap_at(offset: int) -> None:
+        (voffset,) = struct.unpack_from("<Q", data, offset)
+        struct.pack_into("<Q", data, offset, remap(voffset))
+
+    magic = bytes(data[:4])
+    if magic == TBI_MAGIC:
+        (n_ref,) = struct.unpack_from("<i", data, 4)
+        offset = _read_names(bytes(data), 8)[1]
+        pseudo_bin = 37450
+        has_loffset = False
+    elif magic == CSI_MAGIC:
+        _, depth, l_aux = struct.unpack_from("<iii", data, 4)
+        offset = 16 + l_aux
+        (n_ref,) = struct.unpack_from("<i", data, offset)
+        offset += 4
+        pseudo_bin = ((1 << ((depth + 1) * 3)) - 1) // 7 + 1
+        has_loffset = True
+    else:
+        raise ValueError("Unrecognized index format: {0}".format(index_path))
+
+    for _ in range(n_ref):
+        (n_bin,) = struct.unpack_from("<i", data, offset)
+        offset += 4
+        for _ in range(n_bin):
+            (bin_id,) = struct.unpack_from("<I", data, offset)
+            offset += 4
+            if has_loffset:
+                remap_at(offset)
+                offset += 8
+            (n_chunk,) = struct.unpack_from("<i", data, offset)
+            offset += 4
+            if bin_id == pseudo_bin:
+                # Only the first pair holds offsets, the second holds counts
+                remap_at(offset)
+                remap_at(offset + 8)
+            else:
+                for i in range(2 * n_chunk):
+                    remap_at(offset + 8 * i)
+            offset += 16 * n_chunk
+        if magic == TBI_MAGIC:
+            (n_intv,) = struct.unpack_from("<i", data, offset)
+            offset += 4
+            for i in range(n_intv):
+                remap_at(offset + 8 * i)
+            offset += 8 * n_intv
+
+    with open(output_path, "wb") as out:
+        writer = BgzfWriter(out)
+        writer.write(bytes(data))
+        writer.close()
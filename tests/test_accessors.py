@@ -0,0 +1,50 @@
+"""Tests the ``gdc_filtration_tools.accessors`` module."""
+
+import unittest
+
+import pysam
+
+from gdc_filtration_tools.accessors import FilterTag, SampleField, sample_index
+
+
+def build_header():
+    header = pysam.VariantHeader()
+    header.add_line("##contig=<ID=chr1,length=1000>")
+    header.add_line('##FILTER=<ID=ssc40,Description="low">')
+    header.add_line('##FORMAT=<ID=GT,Number=1,Type=String,Description="gt">')
+    header.add_line('##FORMAT=<ID=SSC,Number=1,Type=Integer,Description="ssc">')
+    header.add_sample("NORMAL")
+    header.add_sample("TUMOR")
+    return header
+
+
+class TestAccessors(unittest.TestCase):
+    def setUp(self):
+        self.header = build_header()
+        self.record = self.header.new_record(
+            contig="chr1", start=9, alleles=("A", "T"), filter=["PASS"]
+        )
+        self.record.samples["NORMAL"]["GT"] = (0, 0)
+        self.record.samples["TUMOR"]["GT"] = (0, 1)
+        self.record.samples["TUMOR"]["SSC"] = 30
+
+    def test_sample_index(self):
+        self.assertEqual(sample_index(self.header, "TUMOR"), 1)
+        with self.assertRaises(ValueError):
+            sample_index(self.header, "SAMPLE")
+
+    def test_sample_field(self):
+        ssc = SampleField(self.header, "TUMOR", "SSC")
+        self.assertEqual(ssc.get(self.record), 30)
+        self.assertEqual(ssc.sample(self.record).name, "TUMOR")
+        self.assertIsNone(SampleField(self.header, "NORMAL", "SSC").get(self.record))
+
+        gt = SampleField(self.header, "NORMAL", "GT")
+        gt.set(self.record, (0, 1))
+        self.assertEqual(self.record.samples["NORMAL"]["GT"], (0, 1))
+
+    def test_filter_tag(self):
+        FilterTag(self.header, "ssc40").add(self.record)
+        self.assertEqual(list(self.record.filter), ["ssc40"])
+        with self.assertRaises(ValueError):
+            FilterTag(self.header, "oxog")
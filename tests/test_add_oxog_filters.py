@@ -1,5 +1,6 @@
 """Tests the ``gdc_filtration_tools.tools.add_oxog_filters`` module."""
 
+import shutil
 import tempfile
 import unittest
 
@@ -39,6 +40,37 @@ class TestAddOxogFilters(unittest.TestCase):
         finally:
             cleanup_files(fn)
 
+    def test_add_oxog_filters_passthrough(self):
+        oxo_vcf = get_test_data_path("test_input_for_add_oxog_filters_from_maf.vcf.gz")
+        (fd, ivcf) = tempfile.mkstemp(suffix=".vcf")
+        shutil.copy(get_test_data_path("test_input_for_add_oxog_filters.vcf"), ivcf)
+        ivcf = pysam.tabix_index(ivcf, preset="vcf", force=True)
+        (fd, fn) = tempfile.mkstemp(suffix=".vcf.gz")
+        try:
+            with captured_output() as (_, stderr):
+                add_oxog_filters(ivcf, oxo_vcf, fn)
+            serr = stderr.getvalue()
+            self.assertTrue("as raw BGZF blocks" in serr)
+            self.assertTrue("Processed 4 records - Tagged 1; Wrote 4" in serr)
+
+            vcf = pysam.VariantFile(fn)
+            try:
+                self.assertEqual(vcf.header.filters.keys(), ["PASS", "oxog"])
+                found = [(i.contig, i.pos, list(i.filter)) for i in vcf]
+            finally:
+                vcf.close()
+            exp = pysam.VariantFile(ivcf)
+            try:
+                expected = [
+                    (i.contig, i.pos, ["oxog"] if i.pos == 10 else ["PASS"])
+                    for i in exp
+                ]
+            finally:
+                exp.close()
+            self.assertEqual(found, expected)
+        finally:
+            cleanup_files([ivcf, ivcf + ".tbi", fn, fn + ".tbi"])
+
     def test_cli(self):
         oxo_vcf = get_test_data_path("test_input_for_add_oxog_filters_from_maf.vcf.gz")
         vcf_file = get_test_data_path("test_input_for_add_oxog_filters.vcf")
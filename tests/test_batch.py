@@ -0,0 +1,127 @@
+"""Tests the ``gdc_filtration_tools.tools.batch`` module."""
+
+import json
+import os
+import tempfile
+import unittest
+
+import pysam
+
+from gdc_filtration_tools.tools.batch import batch, build_argv, read_manifest
+from tests.utils import captured_output, cleanup_files, get_test_data_path
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        for fname in os.listdir(self.tmpdir):
+            cleanup_files(os.path.join(self.tmpdir, fname))
+        os.rmdir(self.tmpdir)
+
+    def path(self, fname):
+        return os.path.join(self.tmpdir, fname)
+
+    def test_build_argv(self):
+        argv = build_argv(
+            {
+                "id": "s1",
+                "subcommand": "filter-somatic-score",
+                "input_vcf": "in.vcf",
+                "output_vcf": "out.vcf",
+                "min_somatic_score": 30,
+            }
+        )
+        self.assertEqual(
+            argv,
+            [
+                "filter-somatic-score",
+                "in.vcf",
+                "out.vcf",
+                "--min-somatic-score",
+                "30",
+            ],
+        )
+
+        with self.assertRaises(ValueError):
+            build_argv({"subcommand": "filter-contigs", "input_vcf": "in.vcf"})
+        with self.assertRaises(ValueError):
+            build_argv(
+                {
+                    "subcommand": "filter-contigs",
+                    "input_vcf": "in.vcf",
+                    "output_vcf": "out.vcf",
+                    "bogus": "1",
+                }
+            )
+        with self.assertRaises(ValueError):
+            build_argv({"subcommand": "batch", "manifest": "jobs.tsv"})
+
+    def test_read_manifest(self):
+        manifest = self.path("jobs.tsv")
+        with open(manifest, "wt") as o:
+            o.write("id\tsubcommand\tinput_vcf\toutput_vcf\tmin_somatic_score\n")
+            o.write("s1\tfilter-contigs\ta.vcf\tb.vcf\t\n")
+        self.assertEqual(
+            read_manifest(manifest),
+            [
+                {
+                    "id": "s1",
+                    "subcommand": "filter-contigs",
+                    "input_vcf": "a.vcf",
+                    "output_vcf": "b.vcf",
+                }
+            ],
+        )
+
+    def test_batch(self):
+        manifest = self.path("jobs.json")
+        rows = [
+            {
+                "id": "contigs",
+                "subcommand": "filter-contigs",
+                "input_vcf": get_test_data_path("filter_contigs.vcf"),
+                "output_vcf": self.path("contigs.vcf"),
+            },
+            {
+                "id": "score",
+                "subcommand": "filter-somatic-score",
+                "input_vcf": get_test_data_path("test_somatic_score.vcf"),
+                "output_vcf": self.path("score.vcf"),
+            },
+        ]
+        with open(manifest, "wt") as o:
+            json.dump(rows, o)
+
+        results = self.path("results.tsv")
+        with captured_output() as (_, stderr):
+            batch(manifest, workers=2, results_file=results)
+        self.assertIn("Processed 2 jobs - 0 failed", stderr.getvalue())
+
+        with open(results, "rt") as fh:
+            lines = [i.rstrip("\n").split("\t") for i in fh]
+        self.assertEqual(lines[0][:3], ["id", "subcommand", "status"])
+        self.assertEqual(
+            sorted((i[0], i[2]) for i in lines[1:]), [("contigs", "0"), ("score", "0")]
+        )
+
+        rdr = pysam.VariantFile(self.path("contigs.vcf"))
+        try:
+            self.assertEqual(len(list(rdr)), 2)
+        finally:
+            rdr.close()
+
+    def test_batch_failed(self):
+        manifest = self.path("jobs.tsv")
+        with open(manifest, "wt") as o:
+            o.write("id\tsubcommand\tinput_vcf\toutput_vcf\n")
+            o.write("s1\tfilter-contigs\tmissing.vcf\t{0}\n".format(self.path("a.vcf")))
+            o.write("s2\tfilter-contigs\tmissing.vcf\t{0}\n".format(self.path("b.vcf")))
+
+        with captured_output() as (_, stderr):
+            with self.assertRaises(SystemExit) as cm:
+                batch(manifest, workers=1, max_pending=1, fail_fast=True)
+        self.assertEqual(cm.exception.code, 1)
+        self.assertIn("Processed 1 jobs - 1 failed", stderr.getvalue())
+        self.assertIn("Skipped 1 jobs after a failure", stderr.getvalue())
@@ -0,0 +1,104 @@
+"""Tests the ``gdc_filtration_tools.bgzf`` module."""
+
+import gzip
+import io
+import unittest
+
+from gdc_filtration_tools.bgzf import (
+    BLOCK_SIZE,
+    EOF_BLOCK,
+    BgzfWriter,
+    compress_block,
+    decompress_block,
+    find_line_start,
+    iter_block_offsets,
+    iter_blocks,
+    iter_range,
+    make_virtual_offset,
+    read_block,
+    split_virtual_offset,
+)
+from tests.utils import get_test_data_path
+
+
+class TestBgzf(unittest.TestCase):
+    def test_virtual_offset(self):
+        voffset = make_virtual_offset(1234, 56)
+        self.assertEqual(voffset, (1234 << 16) | 56)
+        self.assertEqual(split_virtual_offset(voffset), (1234, 56))
+
+    def test_compress_block(self):
+        self.assertEqual(compress_block(b""), EOF_BLOCK)
+        block = compress_block(b"chr1\t1\n")
+        self.assertEqual(decompress_block(block), b"chr1\t1\n")
+        self.assertEqual(read_block(io.BytesIO(block)), block)
+
+        with self.assertRaises(ValueError):
+            compress_block(b"x" * (BLOCK_SIZE + 1))
+
+    def test_read_block(self):
+        with open(
+            get_test_data_path("test_input_for_add_oxog_filters_from_maf.vcf.gz"), "rb"
+        ) as fh:
+            blocks = list(iter_blocks(fh))
+        self.assertEqual(blocks[-1][1], EOF_BLOCK)
+        self.assertEqual(blocks[0][0], 0)
+        self.assertTrue(decompress_block(blocks[0][1]).startswith(b"##fileformat"))
+
+        with self.assertRaises(ValueError):
+            read_block(io.BytesIO(b"##fileformat=VCFv4.2\n"))
+        with self.assertRaises(ValueError):
+            read_block(io.BytesIO(EOF_BLOCK[:-4]))
+
+    def test_writer(self):
+        out = io.BytesIO()
+        writer = BgzfWriter(out)
+        writer.write(b"x" * (BLOCK_SIZE + 10))
+        self.assertEqual(split_virtual_offset(writer.tell())[1], 10)
+        writer.write_block(compress_block(b"y"))
+        writer.close()
+
+        self.assertEqual(
+            gzip.decompress(out.getvalue()), b"x" * (BLOCK_SIZE + 10) + b"y"
+        )
+        sizes = [
+            len(decompress_block(i)) for _, i in iter_blocks(io.BytesIO(out.getvalue()))
+        ]
+        self.assertEqual(sizes, [BLOCK_SIZE, 10, 1, 0])
+
+        # No second EOF block after a copied one
+        out = io.BytesIO()
+        writer = BgzfWriter(out)
+        writer.write_block(EOF_BLOCK)
+        writer.close()
+        self.assertEqual(out.getvalue(), EOF_BLOCK)
+
+    def test_iter_range(self):
+        out = io.BytesIO()
+        writer = BgzfWriter(out)
+        writer.write(b"ab\ncd")
+        writer.flush()
+        writer.write(b"ef\n")
+        writer.close()
+        fh = io.BytesIO(out.getvalue())
+
+        offsets = list(iter_block_offsets(fh))
+        fh.seek(0)
+        self.assertEqual(offsets, [i for i, _ in iter_blocks(fh)])
+        second = make_virtual_offset(offsets[1], 0)
+        end = make_virtual_offset(len(out.getvalue()), 0)
+
+        self.assertEqual(find_line_start(fh, 0), make_virtual_offset(0, 3))
+        # the line ends its block, so the next one starts the EOF block
+        eof = make_virtual_offset(offsets[2], 0)
+        self.assertEqual(find_line_start(fh, make_virtual_offset(0, 3)), eof)
+        self.assertEqual(find_line_start(fh, second), eof)
+        self.assertEqual(find_line_start(fh, eof), end)
+        self.assertEqual(
+            b"".join(iter_range(fh, make_virtual_offset(0, 3), end)), b"cdef\n"
+        )
+        self.assertEqual(b"".join(iter_range(fh, 0, second)), b"ab\ncd")
+        self.assertEqual(
+            b"".join(iter_range(fh, 0, make_virtual_offset(offsets[1], 1))),
+            b"ab\ncde",
+        )
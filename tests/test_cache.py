@@ -0,0 +1,55 @@
+"""Tests the ``gdc_filtration_tools.cache`` module."""
+
+import os
+import tempfile
+import unittest
+
+from gdc_filtration_tools.cache import ResourceCache, get_fasta, get_fasta_contigs
+from tests.utils import cleanup_files, get_test_data_path
+
+
+class Resource(object):
+    def __init__(self, path):
+        self.path = path
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class TestResourceCache(unittest.TestCase):
+    def setUp(self):
+        (fd, self.fn) = tempfile.mkstemp(suffix=".txt")
+        os.close(fd)
+
+    def tearDown(self):
+        cleanup_files(self.fn)
+
+    def test_get(self):
+        cache = ResourceCache()
+        first = cache.get("test", self.fn, Resource)
+        self.assertIs(cache.get("test", self.fn, Resource), first)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        # A changed file is reloaded and the stale resource closed
+        with open(self.fn, "wt") as o:
+            o.write("changed\n")
+        second = cache.get("test", self.fn, Resource)
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+
+        cache.clear()
+        self.assertTrue(second.closed)
+
+    def test_evict(self):
+        cache = ResourceCache(maxsize=1)
+        first = cache.get("a", self.fn, Resource)
+        cache.get("b", self.fn, Resource)
+        self.assertTrue(first.closed)
+        self.assertIsNot(cache.get("a", self.fn, Resource), first)
+        self.assertEqual(cache.misses, 3)
+
+    def test_fasta(self):
+        ifa = get_test_data_path("test_oxog_ref.fa")
+        self.assertIs(get_fasta(ifa), get_fasta(ifa))
+        self.assertEqual(get_fasta_contigs(ifa), [("chr1", 100)])
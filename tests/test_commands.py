@@ -0,0 +1,82 @@
+"""Tests the ``gdc_filtration_tools.commands`` module."""
+
+import subprocess
+import sys
+import unittest
+from unittest.mock import patch
+
+from gdc_filtration_tools import commands
+from tests.utils import captured_output
+
+LAZY_SCRIPT = """
+import sys
+from gdc_filtration_tools import commands, readvcf, utils
+commands.bind(["extract-oxoq-from-sqlite", "in.db"])
+print(sorted(i for i in sys.modules if i.startswith("gdc_filtration_tools.tools.")))
+print("pysam" in sys.modules)
+"""
+
+
+class TestCommands(unittest.TestCase):
+    def test_registry(self):
+        for name, target in commands.COMMANDS.items():
+            func = commands.load_command(name)
+            self.assertEqual(func.__name__.replace("_", "-"), name)
+            self.assertEqual(func.__name__, target.split(":")[1])
+
+    def test_select_commands(self):
+        self.assertEqual(
+            commands.select_commands(["filter-contigs", "a.vcf", "b.vcf"]),
+            ("filter-contigs",),
+        )
+        self.assertEqual(commands.select_commands([]), tuple(commands.COMMANDS))
+        self.assertEqual(
+            commands.select_commands(["--version"]), tuple(commands.COMMANDS)
+        )
+
+    def test_build_parser_cached(self):
+        parser = commands.build_parser(("filter-contigs",))
+        self.assertIs(parser, commands.build_parser(("filter-contigs",)))
+
+    def test_bind(self):
+        call = commands.bind(["filter-somatic-score", "in.vcf", "out.vcf"])
+        # defopt wraps the bound call to exit on documented exceptions
+        bound = call.__wrapped__
+        self.assertEqual(bound.func, commands.load_command("filter-somatic-score"))
+        self.assertEqual(bound.args, ("in.vcf", "out.vcf"))
+
+    def test_bind_documented_raises(self):
+        def fail(name: str) -> None:
+            """
+            Fails.
+
+            :param name: a name
+            :raises ValueError: always
+            """
+            raise ValueError("bad {0}".format(name))
+
+        # --version is read from the package of the tool module
+        fail.__module__ = commands.__name__
+        with patch.dict(commands.COMMANDS, {"fake-command": "fake:fail"}):
+            with patch.object(commands, "load_command", return_value=fail):
+                call = commands.bind(["fake-command", "x"])
+        commands.build_parser.cache_clear()
+        with self.assertRaises(SystemExit) as cm:
+            call()
+        self.assertEqual(cm.exception.code, "bad x")
+
+    def test_bind_missing_command(self):
+        with captured_output():
+            with self.assertRaises(SystemExit):
+                commands.bind([])
+
+    def test_lazy_imports(self):
+        res = subprocess.run(
+            [sys.executable, "-c", LAZY_SCRIPT],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        modules, has_pysam = res.stdout.splitlines()
+        self.assertEqual(modules, "['gdc_filtration_tools.tools.extract_oxoq']")
+        self.assertEqual(has_pysam, "False")
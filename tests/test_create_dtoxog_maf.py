@@ -6,6 +6,7 @@ import unittest
 import pysam
 
 from gdc_filtration_tools.__main__ import main
+from gdc_filtration_tools.diagnostics import DiagnosticsCollector
 from gdc_filtration_tools.tools.create_dtoxog_maf import (
     MAF_COLUMNS,
     create_dtoxog_maf,
@@ -151,17 +152,40 @@ class TestCreatedToxoGMaf(unittest.TestCase):
         fa_file = get_test_data_path("test_oxog_ref.fa")
         fasta = pysam.FastaFile(fa_file)
         vcf = pysam.VariantFile(vcf_file)
-        logger = Logger.get_logger("create_dtoxog_maf")
+        diagnostics = DiagnosticsCollector(Logger.get_logger("create_dtoxog_maf"))
         count = 0
         try:
             for record in vcf:
-                maf_record = generate_maf_record(record, fasta, mets, 32.0, logger)
+                maf_record = generate_maf_record(record, fasta, mets, 32.0, diagnostics)
                 self.assertEqual(maf_record, TestCreatedToxoGMaf.exp_maf[count])
                 count += 1
 
         finally:
             fasta.close()
             vcf.close()
+        self.assertEqual(diagnostics.counts, {})
+
+    def test_generate_maf_record_skipped(self):
+        from gdc_filtration_tools.logger import Logger
+
+        vcf_file = get_test_data_path("test_input_for_dtoxog.vcf")
+        fa_file = get_test_data_path("test_oxog_ref.fa")
+        fasta = pysam.FastaFile(fa_file)
+        vcf = pysam.VariantFile(vcf_file)
+        logger = Logger.get_logger("create_dtoxog_maf")
+        diagnostics = DiagnosticsCollector(logger, max_examples=1)
+        try:
+            with self.assertLogs(logger, level="WARNING") as cm:
+                for record in vcf:
+                    self.assertIsNone(
+                        generate_maf_record(record, fasta, {}, 32.0, diagnostics)
+                    )
+        finally:
+            fasta.close()
+            vcf.close()
+        self.assertEqual(diagnostics.counts, {"missing_oxog_metrics": 3})
+        self.assertEqual(len(cm.output), 2)
+        self.assertIn("Unable to find key chr1:1", cm.output[0])
 
     def test_create_dtoxog_maf(self):
         imets = get_test_data_path("test_oxog_metrics.txt")
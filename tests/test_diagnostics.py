@@ -0,0 +1,68 @@
+"""Tests the ``gdc_filtration_tools.diagnostics`` module."""
+
+import tempfile
+import unittest
+
+from gdc_filtration_tools.diagnostics import DiagnosticsCollector
+from gdc_filtration_tools.logger import Logger
+from tests.utils import cleanup_files
+
+
+class TestDiagnosticsCollector(unittest.TestCase):
+    def test_warn(self):
+        logger = Logger.get_logger("test_diagnostics")
+        diagnostics = DiagnosticsCollector(logger, max_examples=2)
+        evaluated = []
+
+        def message():
+            evaluated.append(1)
+            return "bad record"
+
+        with self.assertLogs(logger, level="WARNING") as cm:
+            for _ in range(5):
+                diagnostics.warn("bad", message)
+            diagnostics.warn("other", "other record")
+        self.assertEqual(diagnostics.counts, {"bad": 5, "other": 1})
+        self.assertEqual(len(evaluated), 2)
+        self.assertEqual(
+            [i.split(":", 2)[-1] for i in cm.output],
+            [
+                "bad record",
+                "bad record",
+                "Further 'bad' warnings will only be counted",
+                "other record",
+            ],
+        )
+
+    def test_details_file(self):
+        (fd, fn) = tempfile.mkstemp(suffix=".tsv")
+        try:
+            logger = Logger.get_logger("test_diagnostics")
+            diagnostics = DiagnosticsCollector(
+                logger, max_examples=0, details_file=fn, buffer_size=2
+            )
+            with self.assertNoLogs(logger, level="WARNING"):
+                for i in range(5):
+                    diagnostics.warn("bad", lambda: "record {0}".format(i))
+            diagnostics.close()
+            with open(fn, "rt") as fh:
+                lines = fh.read().splitlines()
+            self.assertEqual(lines[0], "category\tmessage")
+            self.assertEqual(lines[1:], ["bad\trecord {0}".format(i) for i in range(5)])
+        finally:
+            cleanup_files(fn)
+
+    def test_summary(self):
+        logger = Logger.get_logger("test_diagnostics")
+        diagnostics = DiagnosticsCollector(logger, max_examples=0)
+        with self.assertNoLogs(logger, level="WARNING"):
+            diagnostics.summary()
+
+        diagnostics.warn("missing_alt_allele", "a")
+        diagnostics.warn("nonstandard_allele", "b")
+        diagnostics.warn("nonstandard_allele", "c")
+        with self.assertLogs(logger, level="WARNING") as cm:
+            diagnostics.summary()
+        self.assertIn("Diagnostics summary:", cm.output[0])
+        self.assertTrue(cm.output[2].endswith("missing_alt_allele           1"))
+        self.assertTrue(cm.output[3].endswith("nonstandard_allele           2"))
@@ -1,12 +1,22 @@
 """Tests the ``gdc_filtration_tools.tools.filter_contigs`` module."""
 
+import os
+import shutil
+import subprocess
+import sys
 import tempfile
 import unittest
+from unittest import mock
 
 import pysam
 
 from gdc_filtration_tools.tools.filter_contigs import filter_contigs
-from tests.utils import captured_output, cleanup_files, get_test_data_path
+from tests.utils import (
+    captured_output,
+    cleanup_files,
+    get_test_data_path,
+    strip_pseudo_bins,
+)
 
 
 class TestFilterContigs(unittest.TestCase):
@@ -42,3 +52,161 @@ class TestFilterContigs(unittest.TestCase):
             rdr.close()
         self.assertEqual(found, 2)
         cleanup_files(fn)
+
+    def assert_reader_closed(self, ivcf):
+        readers = []
+        variant_file = pysam.VariantFile
+
+        def open_vcf(path, *args, **kwargs):
+            if kwargs.get("mode", "r").startswith("w"):
+                raise OSError("cannot create {0}".format(path))
+            readers.append(variant_file(path, *args, **kwargs))
+            return readers[-1]
+
+        with mock.patch(
+            "gdc_filtration_tools.tools.filter_contigs.pysam.VariantFile",
+            side_effect=open_vcf,
+        ):
+            with captured_output():
+                with self.assertRaises(OSError):
+                    filter_contigs(ivcf, "unused.vcf")
+        self.assertEqual(len(readers), 1)
+        self.assertFalse(readers[0].is_open)
+
+    def test_filter_contigs_writer_fails(self):
+        self.assert_reader_closed(get_test_data_path("filter_contigs.vcf"))
+
+    def test_filter_contigs_bcf(self):
+        ivcf = get_test_data_path("filter_contigs.vcf")
+        (fd, fn) = tempfile.mkstemp(suffix=".bcf")
+        (fd, ofn) = tempfile.mkstemp(suffix=".vcf")
+        try:
+            with captured_output() as (_, stderr):
+                filter_contigs(ivcf, fn)
+                # BCF input is read natively
+                filter_contigs(fn, ofn, output_type="b")
+
+            self.assertTrue(os.path.exists(fn + ".csi"))
+            self.assertTrue(os.path.exists(ofn + ".csi"))
+            for path in (fn, ofn):
+                rdr = pysam.VariantFile(path)
+                try:
+                    self.assertTrue(rdr.is_bcf)
+                    self.assertEqual([i.chrom for i in rdr], ["chr1", "chr2"])
+                finally:
+                    rdr.close()
+        finally:
+            cleanup_files([fn, fn + ".csi", ofn, ofn + ".csi"])
+
+    def test_filter_contigs_passthrough(self):
+        (fd, ivcf) = tempfile.mkstemp(suffix=".vcf")
+        shutil.copy(get_test_data_path("filter_contigs.vcf"), ivcf)
+        ivcf = pysam.tabix_index(ivcf, preset="vcf", force=True)
+        (fd, fn) = tempfile.mkstemp(suffix=".vcf.gz")
+        try:
+            with captured_output() as (_, stderr):
+                filter_contigs(ivcf, fn)
+            serr = stderr.getvalue()
+            self.assertTrue("Copying contigs as raw BGZF blocks" in serr)
+            self.assertTrue(
+                "Processed 3 records, wrote 2 records, and removed 1 records" in serr
+            )
+
+            rdr = pysam.VariantFile(fn)
+            try:
+                self.assertEqual([i.chrom for i in rdr], ["chr1", "chr2"])
+                self.assertEqual([i.chrom for i in rdr.fetch("chr2")], ["chr2"])
+            finally:
+                rdr.close()
+        finally:
+            cleanup_files([ivcf, ivcf + ".tbi", fn, fn + ".tbi"])
+
+    def test_filter_contigs_index_without_metadata(self):
+        (fd, ivcf) = tempfile.mkstemp(suffix=".vcf")
+        shutil.copy(get_test_data_path("filter_contigs.vcf"), ivcf)
+        ivcf = pysam.tabix_index(ivcf, preset="vcf", force=True)
+        strip_pseudo_bins(ivcf + ".tbi")
+        (fd, fn) = tempfile.mkstemp(suffix=".vcf.gz")
+        try:
+            with captured_output() as (_, stderr):
+                filter_contigs(ivcf, fn)
+            serr = stderr.getvalue()
+            self.assertFalse("Copying contigs as raw BGZF blocks" in serr)
+            self.assertTrue(
+                "Processed 3 records, wrote 2 records, and removed 1 records" in serr
+            )
+
+            rdr = pysam.VariantFile(fn)
+            try:
+                self.assertEqual(list(rdr.header.contigs), ["chr1", "chr2", "chr3"])
+                self.assertEqual([i.chrom for i in rdr], ["chr1", "chr2"])
+            finally:
+                rdr.close()
+        finally:
+            cleanup_files([ivcf, ivcf + ".tbi", fn, fn + ".tbi"])
+
+    def test_filter_contigs_indexed(self):
+        (fd, ivcf) = tempfile.mkstemp(suffix=".vcf")
+        shutil.copy(get_test_data_path("filter_contigs.vcf"), ivcf)
+        ivcf = pysam.tabix_index(ivcf, preset="vcf", force=True)
+        (fd, fn) = tempfile.mkstemp(suffix=".vcf")
+        try:
+            with captured_output() as (_, stderr):
+                filter_contigs(ivcf, fn)
+            serr = stderr.getvalue()
+            self.assertTrue(
+                "Dropping 1 records on 1 contigs not in the header: chr10" in serr
+            )
+            self.assertTrue(
+                "Processed 3 records, wrote 2 records, and removed 1 records" in serr
+            )
+
+            rdr = pysam.VariantFile(fn)
+            try:
+                # The contig htslib adds from the index is not written
+                self.assertEqual(list(rdr.header.contigs), ["chr1", "chr2", "chr3"])
+                self.assertEqual([i.chrom for i in rdr], ["chr1", "chr2"])
+            finally:
+                rdr.close()
+        finally:
+            cleanup_files([ivcf, ivcf + ".tbi", fn])
+
+    def test_filter_contigs_indexed_writer_fails(self):
+        (fd, ivcf) = tempfile.mkstemp(suffix=".vcf")
+        shutil.copy(get_test_data_path("filter_contigs.vcf"), ivcf)
+        ivcf = pysam.tabix_index(ivcf, preset="vcf", force=True)
+        try:
+            self.assert_reader_closed(ivcf)
+        finally:
+            cleanup_files([ivcf, ivcf + ".tbi"])
+
+    def test_filter_contigs_pipe(self):
+        ivcf = get_test_data_path("filter_contigs.vcf")
+        (fd, fn) = tempfile.mkstemp(suffix=".vcf")
+        cmd = [sys.executable, "-m", "gdc_filtration_tools", "filter-contigs"]
+        cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        try:
+            # The first stage writes uncompressed BCF to the second
+            first = subprocess.Popen(
+                cmd + [ivcf, "-"],
+                cwd=cwd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+            subprocess.run(
+                cmd + ["-", fn],
+                cwd=cwd,
+                stdin=first.stdout,
+                stderr=subprocess.DEVNULL,
+                check=True,
+            )
+            first.stdout.close()
+            self.assertEqual(first.wait(), 0)
+
+            rdr = pysam.VariantFile(fn)
+            try:
+                self.assertEqual([i.chrom for i in rdr], ["chr1", "chr2"])
+            finally:
+                rdr.close()
+        finally:
+            cleanup_files(fn)
@@ -1,5 +1,7 @@
 """Tests the ``gdc_filtration_tools.tools.filter_nonstandard_variants`` module."""
 
+import os
+import shutil
 import tempfile
 import unittest
 
@@ -71,3 +73,18 @@ class TestFilterNonstandardVariants(unittest.TestCase):
             self.assertTrue("gdc_filtration_tools.main" in serr[-1])
         finally:
             cleanup_files(fn)
+
+    def test_missing_input(self):
+        tmpdir = tempfile.mkdtemp()
+        details = os.path.join(tmpdir, "details.tsv")
+        try:
+            with captured_output():
+                with self.assertRaises(OSError):
+                    filter_nonstandard_variants(
+                        os.path.join(tmpdir, "missing.vcf"),
+                        os.path.join(tmpdir, "out.vcf"),
+                        diagnostics_file=details,
+                    )
+            self.assertFalse(os.path.exists(details))
+        finally:
+            shutil.rmtree(tmpdir)
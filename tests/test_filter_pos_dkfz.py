@@ -1,5 +1,6 @@
 """Tests the ``gdc_filtration_tools.tools.test_filter_pos_dkfz`` module."""
 
+import shutil
 import tempfile
 import unittest
 
@@ -31,6 +32,26 @@ class TestFilterPosDkfz(unittest.TestCase):
         finally:
             cleanup_files(fn)
 
+    def test_position_filter_dkfz_passthrough(self):
+        (fd, ivcf) = tempfile.mkstemp(suffix=".vcf")
+        shutil.copy(get_test_data_path("test_dfkz.vcf"), ivcf)
+        ivcf = pysam.tabix_index(ivcf, preset="vcf", force=True)
+        (fd, fn) = tempfile.mkstemp(suffix=".vcf.gz")
+        try:
+            with captured_output() as (_, stderr):
+                position_filter_dkfz(ivcf, fn)
+            serr = stderr.getvalue()
+            self.assertTrue("Checking the head of each contig" in serr)
+            self.assertTrue("Processed 2 records - Removed 1; Wrote 1" in serr)
+
+            vcf = pysam.VariantFile(fn)
+            try:
+                self.assertEqual([(i.chrom, i.pos) for i in vcf], [("chr2", 10)])
+            finally:
+                vcf.close()
+        finally:
+            cleanup_files([ivcf, ivcf + ".tbi", fn, fn + ".tbi"])
+
     def test_cli(self):
         ivcf = get_test_data_path("test_dfkz.vcf")
         (fd, fn) = tempfile.mkstemp(suffix=".vcf.gz")
@@ -1,14 +1,21 @@
 """Tests the ``gdc_filtration_tools.tools.format_gdc_vcf`` module."""
 
 import datetime
+import os
 import tempfile
 import unittest
+from unittest import mock
 
 import attr
 import pysam
 
 from gdc_filtration_tools.__main__ import main
-from gdc_filtration_tools.tools.format_gdc_vcf import build_header, format_gdc_vcf
+from gdc_filtration_tools.tools.format_gdc_vcf import (
+    METADATA_COLUMNS,
+    build_header,
+    format_gdc_vcf,
+    format_gdc_vcf_batch,
+)
 from tests.utils import captured_output, cleanup_files, get_test_data_path
 
 
@@ -124,6 +131,110 @@ class TestFormatGdcVcf(unittest.TestCase):
         cleanup_files(fn)
         self.validate_header(obj, hdr)
 
+    def test_format_gdc_vcf_reheader(self):
+        ivcf = get_test_data_path("test_input_for_add_oxog_filters_from_maf.vcf.gz")
+        (fd, fn) = tempfile.mkstemp(suffix=".vcf.gz")
+        (fd, exp_fn) = tempfile.mkstemp(suffix=".vcf.gz")
+        obj = FakeOpts(ivcf, fn)
+        try:
+            with captured_output() as (_, stderr):
+                format_gdc_vcf(**attr.asdict(obj), copy_records=True)
+                format_gdc_vcf(**attr.asdict(FakeOpts(ivcf, exp_fn)))
+            self.assertIn("Copying records", stderr.getvalue())
+            self.assertTrue(os.path.exists(fn + ".tbi"))
+
+            vcf = pysam.VariantFile(fn)
+            exp = pysam.VariantFile(exp_fn)
+            try:
+                self.assertEqual(str(vcf.header), str(exp.header))
+                self.assertEqual(
+                    [str(i) for i in vcf.fetch("chr1")], [str(i) for i in exp]
+                )
+            finally:
+                vcf.close()
+                exp.close()
+        finally:
+            cleanup_files([fn, fn + ".tbi", exp_fn, exp_fn + ".tbi"])
+
+    def test_format_gdc_vcf_batch(self):
+        inputs = [
+            get_test_data_path("test.vcf"),
+            get_test_data_path("test_input_for_add_oxog_filters_from_maf.vcf.gz"),
+        ]
+        opts = []
+        for idx, ivcf in enumerate(inputs):
+            (fd, fn) = tempfile.mkstemp(suffix=".vcf.gz")
+            opts.append(
+                FakeOpts(ivcf, fn, patient_barcode="PAT-0{0}".format(idx), case_id=fn)
+            )
+        (fd, metadata) = tempfile.mkstemp(suffix=".tsv")
+        with open(metadata, "wt") as o:
+            o.write("\t".join(METADATA_COLUMNS) + "\n")
+            for obj in opts:
+                row = attr.asdict(obj)
+                o.write("\t".join(row[i] for i in METADATA_COLUMNS) + "\n")
+
+        outputs = [i.output_vcf for i in opts]
+        try:
+            with captured_output() as (_, stderr):
+                format_gdc_vcf_batch(metadata, workers=2, copy_records=True)
+            self.assertIn("Processed 2 VCFs - 0 failed", stderr.getvalue())
+
+            for obj in opts:
+                vcf = pysam.VariantFile(obj.output_vcf)
+                hdr = vcf.header.copy()
+                vcf.close()
+                self.assertTrue(os.path.exists(obj.output_vcf + ".tbi"))
+                if obj.input_vcf.endswith(".vcf"):
+                    self.validate_header(obj, hdr)
+                else:
+                    individual = [i for i in hdr.records if i.key == "INDIVIDUAL"]
+                    self.assertEqual(individual[0].get("NAME"), obj.patient_barcode)
+
+            # A failed file fails the run but not the other files
+            with open(metadata, "at") as o:
+                row = attr.asdict(FakeOpts("missing.vcf", outputs[0]))
+                o.write("\t".join(row[i] for i in METADATA_COLUMNS) + "\n")
+            with captured_output() as (_, stderr):
+                with self.assertRaises(SystemExit):
+                    format_gdc_vcf_batch(metadata)
+            self.assertIn("Failed to format missing.vcf", stderr.getvalue())
+
+            with open(metadata, "wt") as o:
+                o.write("input_vcf\toutput_vcf\n{0}\tout.vcf\n".format(inputs[0]))
+            with self.assertRaises(ValueError):
+                format_gdc_vcf_batch(metadata)
+        finally:
+            cleanup_files([metadata] + outputs + [i + ".tbi" for i in outputs])
+
+    def test_format_gdc_vcf_batch_closes_reader(self):
+        readers = []
+        variant_file = pysam.VariantFile
+
+        def open_vcf(*args, **kwargs):
+            readers.append(variant_file(*args, **kwargs))
+            return readers[-1]
+
+        obj = FakeOpts(get_test_data_path("test.vcf"), "unused.vcf")
+        (fd, metadata) = tempfile.mkstemp(suffix=".tsv")
+        os.close(fd)
+        with open(metadata, "wt") as o:
+            row = attr.asdict(obj)
+            o.write("\t".join(METADATA_COLUMNS) + "\n")
+            o.write("\t".join(row[i] for i in METADATA_COLUMNS) + "\n")
+        module = "gdc_filtration_tools.tools.format_gdc_vcf"
+        try:
+            with mock.patch(module + ".pysam.VariantFile", side_effect=open_vcf):
+                with mock.patch(module + ".build_header", side_effect=ValueError):
+                    with captured_output():
+                        with self.assertRaises(SystemExit):
+                            format_gdc_vcf_batch(metadata)
+            self.assertEqual(len(readers), 1)
+            self.assertFalse(readers[0].is_open)
+            self.assertFalse(os.path.exists("unused.vcf"))
+        finally:
+            cleanup_files(metadata)
+
     def test_cli(self):
         ivcf = get_test_data_path("test.vcf")
         (fd, fn) = tempfile.mkstemp(suffix=".vcf.gz")
@@ -3,36 +3,45 @@
 import tempfile
 import unittest
 
-import attr
 import pysam
 
 from gdc_filtration_tools.__main__ import main
 from gdc_filtration_tools.tools.format_pindel_vcf import (
     format_pindel_vcf,
+    format_record,
     get_header,
-    get_info,
 )
 from tests.utils import captured_output, cleanup_files, get_test_data_path
 
-
-@attr.s
-class FakeVariantRecord(object):
-    info = attr.ib(default=dict())
+# The records written for pindel_test.vcf before the formatter stopped
+# copying fields, which both the record and the text path must match
+EXPECTED = [
+    "chr1\t13\t.\tG\tGT\t.\tPASS\tHOMLEN=0;SVLEN=1;TYPEOFSV=INS\tGT:AD:DP:SS"
+    "\t0/0:10,0:10:2\t0/1:10,10:20:2\n",
+    "chr1\t20\t.\tG\tGT\t.\tPASS\tforcedHet;HOMLEN=0;SVLEN=1;TYPEOFSV=INS"
+    "\tGT:AD:DP:SS\t0/0:10,0:10:2\t0/1:10,10:20:2\n",
+]
 
 
 class TestFormatPindelVcf(unittest.TestCase):
-    def test_get_info(self):
-        iobj = FakeVariantRecord({"SVTYPE": "BND", "OTHER": "stuff"})
-        res = get_info(iobj, False)
-        self.assertTrue(len(res) == 2)
-        self.assertTrue(("TYPEOFSV", "BND") in res)
-        self.assertTrue(("OTHER", "stuff") in res)
-
-        res = get_info(iobj, True)
-        self.assertTrue(len(res) == 3)
-        self.assertTrue(("TYPEOFSV", "BND") in res)
-        self.assertTrue(("OTHER", "stuff") in res)
-        self.assertTrue(("forcedHet", True) in res)
+    def test_format_record(self):
+        ivcf = get_test_data_path("pindel_test.vcf")
+        vcf = pysam.VariantFile(ivcf)
+        try:
+            header = get_header(vcf.header)
+            rec = format_record(next(vcf), header)
+            self.assertIs(rec.header, header)
+            self.assertEqual(rec.info["TYPEOFSV"], "INS")
+            self.assertFalse("SVTYPE" in rec.info)
+            self.assertFalse("forcedHet" in rec.info)
+            self.assertEqual(rec.samples["TUMOR"]["AD"], (10, 10))
+
+            rec = format_record(next(vcf), header)
+            self.assertTrue(rec.info["forcedHet"])
+            self.assertEqual(rec.samples["TUMOR"]["GT"], (0, 1))
+            self.assertEqual(rec.info["SVLEN"], (1,))
+        finally:
+            vcf.close()
 
     def test_get_header(self):
         ivcf = get_test_data_path("pindel_test.vcf")
@@ -97,6 +106,45 @@ class TestFormatPindelVcf(unittest.TestCase):
         finally:
             cleanup_files(fn)
 
+    def test_format_pindel_vcf_bcf(self):
+        # BCF output goes through pysam instead of the text edits
+        ivcf = get_test_data_path("pindel_test.vcf")
+        (fd, fn) = tempfile.mkstemp(suffix=".bcf")
+        try:
+            with captured_output() as (_, stderr):
+                format_pindel_vcf(ivcf, fn)
+
+            with pysam.VariantFile(fn) as vcf:
+                records = list(vcf)
+            self.assertEqual([str(i) for i in records], EXPECTED)
+            self.assertEqual([i.info["TYPEOFSV"] for i in records], ["INS", "INS"])
+            self.assertEqual(["forcedHet" in i.info for i in records], [False, True])
+            self.assertEqual(
+                [i.samples["TUMOR"]["GT"] for i in records], [(0, 1), (0, 1)]
+            )
+            self.assertFalse("Editing the records as text" in stderr.getvalue())
+        finally:
+            cleanup_files([fn, fn + ".csi"])
+
+    def test_format_pindel_vcf_paths_match(self):
+        # the text edits write the same records as pysam
+        ivcf = get_test_data_path("pindel_test.vcf")
+        (fd, text) = tempfile.mkstemp(suffix=".vcf")
+        (fd, bcf) = tempfile.mkstemp(suffix=".bcf")
+        try:
+            with captured_output() as (_, stderr):
+                format_pindel_vcf(ivcf, text)
+                format_pindel_vcf(ivcf, bcf)
+
+            with open(text, "rt") as fh:
+                lines = [i for i in fh if not i.startswith("#")]
+            self.assertEqual(lines, EXPECTED)
+            with pysam.VariantFile(bcf) as vcf:
+                self.assertEqual(lines, [str(i) for i in vcf])
+            self.assertFalse("END=" in "".join(lines))
+        finally:
+            cleanup_files([text, bcf, bcf + ".csi"])
+
     def test_cli(self):
         ivcf = get_test_data_path("pindel_test.vcf")
         (fd, fn) = tempfile.mkstemp(suffix=".vcf.gz")
@@ -1,41 +1,50 @@
+import gzip
+import os
+import shutil
+import tempfile
 from unittest import TestCase
 from unittest.mock import MagicMock, Mock, call, mock_open, patch
 
+import pysam
+
+from gdc_filtration_tools.formatcodec import get_codec
+from gdc_filtration_tools.readvcf import VcfReader
 from gdc_filtration_tools.tools.format_strelka_vcf import (
     add_filter,
     adjust_INDEL,
+    adjust_line,
     adjust_record,
     adjust_SNV,
     convert_gt_spec,
     ensure_gt,
     format_strelka_vcf,
+    merge_headers,
+    merge_lines,
     parse_field,
     parse_info,
     qsi_filter,
 )
+from tests.utils import captured_output, cleanup_files, get_test_data_path
 
 
 class TestFormatStrelka(TestCase):
-    @patch("gdc_filtration_tools.tools.format_strelka_vcf.print")
     @patch("gdc_filtration_tools.tools.format_strelka_vcf.add_filter")
     @patch("gdc_filtration_tools.tools.format_strelka_vcf.ensure_gt")
     @patch(
-        "gdc_filtration_tools.tools.format_strelka_vcf.adjust_record",
-        return_value="new_row",
+        "gdc_filtration_tools.tools.format_strelka_vcf.adjust_line",
+        return_value=b"new_row",
     )
     @patch("gdc_filtration_tools.tools.format_strelka_vcf.tabix_index")
-    def test_format_strelka_vcf(
-        self, tabix_index, adjust_record, ensure_gt, add_filter, print_fn
-    ):
+    def test_format_strelka_vcf(self, tabix_index, adjust_line, ensure_gt, add_filter):
         vcf = MagicMock()
-        # fd = {"FORMAT": 'header_format'}
         vcf.header.__getitem__.side_effect = ["header_format", "header_filter"]
+        vcf.column_names = ["CHROM", "FORMAT", "TUMOR", "NORMAL"]
         vcf.iter_header_lines = Mock(return_value=["header_line"])
-        vcf.iter_rows = Mock(return_value=["row"])
+        vcf.iter_raw_lines = Mock(return_value=[b"row", b""])
         open_fn = mock_open()
 
         with (
-            patch("gdc_filtration_tools.tools.format_strelka_vcf.open", open_fn),
+            patch("gdc_filtration_tools.tools.format_strelka_vcf.open_bytes", open_fn),
             patch(
                 "gdc_filtration_tools.tools.format_strelka_vcf.VcfReader",
                 return_value=vcf,
@@ -46,16 +55,201 @@ class TestFormatStrelka(TestCase):
             vcfreader.assert_called_once_with("input.vcf")
             ensure_gt.assert_called_once_with("header_format")
             add_filter.assert_called_once_with("header_filter")
-            open_fn.assert_called_once_with("out.vcf", "wt")
+            open_fn.assert_called_once_with("out.vcf", "wb")
             handle = open_fn()
-            print_call_list = [
-                call("header_line", file=handle),
-                call("new_row", file=handle),
+            assert handle.write.call_args_list == [
+                call(b"header_line\n"),
+                call(b"new_row\n"),
             ]
-            assert print_fn.call_args_list == print_call_list
-            adjust_record.assert_called_once_with("row")
+            adjust_line.assert_called_once_with(b"row", 3, 2)
             tabix_index.assert_called_once_with("out.vcf", preset="vcf")
 
+    def test_format_strelka_vcf_file(self):
+        ivcf = get_test_data_path("test_strelka.vcf")
+        fn = tempfile.mkstemp(suffix=".vcf")[1]
+        try:
+            with captured_output():
+                format_strelka_vcf(ivcf, fn)
+            vcf = VcfReader(ivcf)
+            expected = [str(adjust_record(row)) for row in vcf.iter_rows()]
+            with open(fn) as fh:
+                lines = fh.read().splitlines()
+            records = [i for i in lines if not i.startswith("#")]
+            self.assertEqual(records, expected)
+            self.assertEqual(
+                [i.split("\t")[6] for i in records], ["PASS", "LowQSI", "LowEVS"]
+            )
+            self.assertTrue(
+                '##FILTER=<ID=LowQSI,Description="QSI value is at or below 10">'
+                in lines
+            )
+        finally:
+            cleanup_files([fn])
+
+    def test_format_strelka_vcf_workers(self):
+        ivcf = get_test_data_path("test_strelka.vcf")
+        fn = tempfile.mkstemp(suffix=".vcf")[1]
+        gz = tempfile.mkstemp(suffix=".vcf.gz")[1]
+        try:
+            with captured_output():
+                format_strelka_vcf(ivcf, fn)
+            with open(fn) as fh:
+                expected = fh.read()
+            with captured_output():
+                format_strelka_vcf(ivcf, fn, workers=2)
+            with open(fn) as fh:
+                self.assertEqual(fh.read(), expected)
+
+            bgz = gz.replace(".vcf.gz", ".in.vcf.gz")
+            pysam.tabix_compress(ivcf, bgz)
+            with captured_output():
+                format_strelka_vcf(bgz, gz, workers=2)
+            with gzip.open(gz, "rt") as fh:
+                self.assertEqual(fh.read(), expected)
+            self.assertTrue(os.path.exists(gz + ".tbi"))
+        finally:
+            cleanup_files([fn, gz, gz + ".tbi", bgz])
+
+    def test_format_strelka_vcf_indel_vcf(self):
+        snvs = get_test_data_path("test_strelka_snvs.vcf")
+        indels = get_test_data_path("test_strelka_indels.vcf")
+        fn = tempfile.mkstemp(suffix=".vcf")[1]
+        try:
+            with captured_output():
+                format_strelka_vcf(snvs, fn, indel_vcf=indels)
+            with open(fn) as fh:
+                lines = fh.read().splitlines()
+            header = [i for i in lines if i.startswith("##")]
+            records = [i.split("\t") for i in lines if not i.startswith("#")]
+            self.assertEqual(
+                [(i[0], i[1], i[3]) for i in records],
+                [
+                    ("chr1", "100", "A"),
+                    ("chr1", "200", "A"),
+                    ("chr1", "200", "AT"),
+                    ("chr1", "300", "AT"),
+                    ("chr2", "10", "AT"),
+                    ("chr2", "50", "A"),
+                ],
+            )
+            self.assertEqual(len(header), len(set(header)))
+            self.assertEqual(len([i for i in header if i.startswith("##contig")]), 2)
+            self.assertTrue(any(i.startswith("##INFO=<ID=QSI,") for i in header))
+            self.assertTrue(any(i.startswith("##INFO=<ID=QSS,") for i in header))
+            self.assertTrue("##content=strelka somatic indel calls" in header)
+            self.assertEqual(lines.count(lines[len(header)]), 1)
+        finally:
+            cleanup_files([fn])
+
+    def test_format_strelka_vcf_region(self):
+        tmpdir = tempfile.mkdtemp()
+        fn = os.path.join(tmpdir, "out.vcf")
+        try:
+            inputs = []
+            for name in ("test_strelka_snvs.vcf", "test_strelka_indels.vcf"):
+                shutil.copy(get_test_data_path(name), tmpdir)
+                inputs.append(
+                    pysam.tabix_index(os.path.join(tmpdir, name), preset="vcf")
+                )
+            with captured_output():
+                format_strelka_vcf(
+                    inputs[0], fn, indel_vcf=inputs[1], region="chr1:150-300"
+                )
+            with open(fn) as fh:
+                records = [i.split("\t") for i in fh if not i.startswith("#")]
+            self.assertEqual(
+                [(i[0], i[1], i[3]) for i in records],
+                [("chr1", "200", "A"), ("chr1", "200", "AT"), ("chr1", "300", "AT")],
+            )
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_merge_lines(self):
+        merged = merge_lines(
+            ["chr2", "chr1"],
+            [b"chr2\t5\ta", b"chr1\t1\ta"],
+            [b"chr2\t1\tb", b"chr2\t5\tb", b"chr1\t2\tb"],
+        )
+        self.assertEqual(
+            list(merged),
+            [
+                b"chr2\t1\tb",
+                b"chr2\t5\ta",
+                b"chr2\t5\tb",
+                b"chr1\t1\ta",
+                b"chr1\t2\tb",
+            ],
+        )
+        with self.assertRaises(ValueError):
+            list(merge_lines(["chr1"], [b"chr3\t1\ta"], []))
+
+    def test_merge_headers(self):
+        header = {
+            "fileformat": {"0": "##fileformat=VCFv4.1"},
+            "misc_0": {"0": "##content=snv"},
+            "INFO": {"DP": "##INFO=<ID=DP,Number=1>"},
+            "COLUMN_NAMES": {"0": "#CHROM\tPOS"},
+        }
+        other = {
+            "fileformat": {"0": "##fileformat=VCFv4.1"},
+            "misc_0": {"0": "##content=indel"},
+            "INFO": {"DP": "##INFO=<ID=DP,Number=2>", "QSI": "##INFO=<ID=QSI>"},
+            "FILTER": {"LowEVS": "##FILTER=<ID=LowEVS>"},
+            "COLUMN_NAMES": {"0": "#CHROM\tPOS"},
+        }
+        merged = merge_headers(header, other)
+        self.assertEqual(
+            list(merged),
+            ["fileformat", "misc_0", "INFO", "FILTER", "COLUMN_NAMES"],
+        )
+        self.assertEqual(
+            merged["misc_0"], {"0": "##content=snv", "1": "##content=indel"}
+        )
+        self.assertEqual(
+            merged["INFO"],
+            {"DP": "##INFO=<ID=DP,Number=1>", "QSI": "##INFO=<ID=QSI>"},
+        )
+        self.assertEqual(header["INFO"], {"DP": "##INFO=<ID=DP,Number=1>"})
+
+        other["COLUMN_NAMES"] = {"0": "#CHROM\tPOS\tID"}
+        with self.assertRaises(ValueError):
+            merge_headers(header, other)
+
+    def test_adjust_line(self):
+        line = (
+            b"chr1\t200\t.\tAT\tA\t.\tPASS\tQSI=5;NT=het;SGT=ref->hom\t"
+            b"DP:TIR\t30:0,0\t30:9,9"
+        )
+        info = {"QSI": "5", "NT": "het", "SGT": "ref->hom"}
+        with patch(
+            "gdc_filtration_tools.tools.format_strelka_vcf.is_indel",
+            return_value=True,
+        ) as ii:
+            result = adjust_line(line)
+            ii.assert_called_once_with(info, "QSI=5;NT=het;SGT=ref->hom")
+        assert result == (
+            b"chr1\t200\t.\tAT\tA\t.\tLowQSI\tQSI=5;NT=het;SGT=ref->hom\t"
+            b"GT:DP:TIR\t0/1:30:0,0\t1/1:30:9,9"
+        )
+
+        with (
+            patch(
+                "gdc_filtration_tools.tools.format_strelka_vcf.is_indel",
+                return_value=False,
+            ),
+            patch(
+                "gdc_filtration_tools.tools.format_strelka_vcf.get_codec",
+                wraps=get_codec,
+            ) as gc,
+        ):
+            result = adjust_line(line, normal_index=10, tumor_index=9)
+            # the output FORMAT comes from the shared codec cache
+            gc.assert_called_once_with(b"DP:TIR")
+        assert result == (
+            b"chr1\t200\t.\tAT\tA\t.\tPASS\tQSI=5;NT=het;SGT=ref->hom\t"
+            b"GT:DP:TIR\t0/1:30:0,0\t0/1:30:9,9"
+        )
+
     def test_ensure_gt(self):
         fs = {"FOO": "FOO"}
         expected = fs.copy()
@@ -198,7 +392,7 @@ class TestFormatStrelka(TestCase):
             adjust_snv.assert_called_once_with(row)
 
     def test_adjust_record_unknown(self):
-        key_set = {"NOT" "EXPECTED"}
+        key_set = {"NOTEXPECTED"}
         row = Mock()
         info_keydict = {k: v for k, v in zip(key_set, range(len(key_set)))}
         with patch(
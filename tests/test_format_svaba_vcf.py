@@ -0,0 +1,59 @@
+"""Tests the ``gdc_filtration_tools.tools.format_svaba_vcf`` module."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from gdc_filtration_tools.tools.format_svaba_vcf import format_svaba_vcf
+from tests.utils import captured_output
+
+HEADER = """##fileformat=VCFv4.2
+##contig=<ID=chr1,length=1000>
+##FILTER=<ID=PASS,Description="All filters passed">
+##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">
+##FORMAT=<ID=AD,Number=1,Type=Integer,Description="Allele depth">
+##FORMAT=<ID=DP,Number=1,Type=Integer,Description="Depth">
+##FORMAT=<ID=GQ,Number=1,Type=Float,Description="Genotype quality">
+##FORMAT=<ID=PL,Number=G,Type=Float,Description="Likelihoods">
+##FORMAT=<ID=LO,Number=1,Type=Float,Description="Log-odds">
+#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tNORMAL\tTUMOR
+"""
+
+
+class TestFormatSvabaVcf(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.output = os.path.join(self.tmpdir, "out.vcf")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def run_tool(self, *records):
+        path = os.path.join(self.tmpdir, "in.vcf")
+        with open(path, "wt") as fh:
+            fh.write(HEADER)
+            fh.writelines(i + "\n" for i in records)
+        with captured_output():
+            format_svaba_vcf(path, self.output)
+        with open(self.output, "rt") as fh:
+            return [i.rstrip("\n") for i in fh if not i.startswith("#")]
+
+    def test_format_svaba_vcf(self):
+        rows = self.run_tool(
+            "chr1\t10\ta\tA\tAT\t5\tPASS\t.\tGT:AD:DP:GQ:PL:LO"
+            "\t0/0:0:12:0.5:0,3.6,39.2:1.5\t0/1:4:10:.:12.4,0,30.1:.",
+            "chr1\t11\tb\tA\tATT\t.\tPASS\t.\tGT:DP:AD\t0/0:12:1\t0/1:10:.",
+        )
+        self.assertEqual(
+            rows,
+            [
+                "chr1\t10\ta\tA\tAT\t5\tPASS\t.\tGT:AD:DP:GQ:PL:LO"
+                "\t0/0:12,0:12:0:0,4,39:1.5\t0/1:6,4:10:0:12,0,30:.",
+                "chr1\t11\tb\tA\tATT\t.\tPASS\t.\tGT:DP:AD\t0/0:12:11,1\t0/1:10:.,.",
+            ],
+        )
+
+    def test_format_svaba_vcf_no_dp(self):
+        with self.assertRaisesRegex(ValueError, "NORMAL at chr1:10 has AD but no DP"):
+            self.run_tool("chr1\t10\ta\tA\tAT\t5\tPASS\t.\tGT:AD\t0/0:1\t0/1:4")
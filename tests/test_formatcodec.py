@@ -0,0 +1,40 @@
+"""Tests the ``gdc_filtration_tools.formatcodec`` module."""
+
+import unittest
+
+from gdc_filtration_tools.formatcodec import get_codec
+
+
+class TestFormatCodec(unittest.TestCase):
+    def test_get_codec(self):
+        codec = get_codec("GT:AD:DP")
+        self.assertIs(get_codec("GT:AD:DP"), codec)
+        self.assertEqual(codec.keys, ["GT", "AD", "DP"])
+        self.assertEqual(codec.index, {"GT": 0, "AD": 1, "DP": 2})
+        self.assertIsNot(get_codec(b"GT:AD:DP"), codec)
+
+    def test_get(self):
+        codec = get_codec("GT:AD:DP")
+        self.assertEqual(codec.get("0/1:3,4:7", "GT"), "0/1")
+        self.assertEqual(codec.get("0/1", "GT"), "0/1")
+        self.assertEqual(codec.get("0/1:3,4:7", "DP"), "7")
+        self.assertIsNone(codec.get("0/1:3,4", "DP"))
+        self.assertIsNone(codec.get("0/1:3,4:7", "GQ"))
+        self.assertEqual(get_codec(b"DP:TIR").get(b"30:9,9", b"TIR"), b"9,9")
+
+    def test_set(self):
+        codec = get_codec("GT:AD:DP")
+        self.assertEqual(codec.set("0/0:3,4:7", "GT", "0/1"), "0/1:3,4:7")
+        self.assertEqual(codec.set(".", "GT", "0/1"), "0/1")
+        self.assertEqual(codec.set("0/0:3,4:7", "DP", "8"), "0/0:3,4:8")
+        self.assertEqual(codec.set("0/0", "DP", "8"), "0/0:.:8")
+        with self.assertRaises(KeyError):
+            codec.set("0/0", "GQ", "1")
+
+    def test_prepend(self):
+        codec = get_codec(b"DP:TIR")
+        gt = codec.prepend(b"GT")
+        self.assertIs(codec.prepend(b"GT"), gt)
+        self.assertIs(gt, get_codec(b"GT:DP:TIR"))
+        self.assertEqual(gt.format, b"GT:DP:TIR")
+        self.assertEqual(gt.index[b"TIR"], 2)
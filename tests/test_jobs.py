@@ -0,0 +1,69 @@
+"""Tests the ``gdc_filtration_tools.jobs`` module."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from gdc_filtration_tools.jobs import run_job
+from tests.utils import captured_output, cleanup_files, get_test_data_path
+
+
+class TestJobs(unittest.TestCase):
+    def test_run_job(self):
+        ivcf = get_test_data_path("filter_contigs.vcf")
+        (fd, fn) = tempfile.mkstemp(suffix=".vcf")
+        os.close(fd)
+        try:
+            with captured_output():
+                result = run_job(["filter-contigs", ivcf, fn])
+            self.assertEqual(result["status"], 0)
+            self.assertIsNone(result["error"])
+            self.assertEqual(result["pid"], os.getpid())
+            self.assertGreaterEqual(result["elapsed_sec"], 0)
+            self.assertGreater(os.path.getsize(fn), 0)
+        finally:
+            cleanup_files(fn)
+
+    def test_run_job_failed(self):
+        # relative paths resolve in a scratch directory, never the checkout
+        tmpdir = tempfile.mkdtemp()
+        try:
+            with captured_output():
+                result = run_job(["filter-contigs", "missing.vcf", "out.vcf"], tmpdir)
+            self.assertEqual(result["status"], 1)
+            self.assertIn("FileNotFoundError", result["error"])
+            self.assertEqual(os.listdir(tmpdir), [])
+        finally:
+            shutil.rmtree(tmpdir)
+
+        with captured_output():
+            result = run_job(["filter-contigs"])
+        self.assertEqual(result["status"], 2)
+
+        result = run_job(["serve", "test.sock"])
+        self.assertEqual(result["status"], 1)
+        self.assertIn("cannot be run as a job", result["error"])
+
+        result = run_job(["filter-contigs", get_test_data_path("test.vcf"), "-"])
+        self.assertEqual(result["status"], 1)
+        self.assertIn("cannot read stdin or write stdout", result["error"])
+
+    def test_run_job_cwd(self):
+        cwd = os.getcwd()
+        tmpdir = tempfile.mkdtemp()
+        try:
+            with captured_output():
+                result = run_job(
+                    ["filter-contigs", get_test_data_path("test.vcf"), "out.vcf"],
+                    cwd=tmpdir,
+                )
+                self.assertEqual(result["status"], 0)
+                self.assertTrue(os.path.exists(os.path.join(tmpdir, "out.vcf")))
+                self.assertEqual(os.getcwd(), cwd)
+
+                result = run_job(["filter-contigs", "missing.vcf", "out.vcf"], tmpdir)
+                self.assertEqual(result["status"], 1)
+                self.assertEqual(os.getcwd(), cwd)
+        finally:
+            shutil.rmtree(tmpdir)
@@ -0,0 +1,162 @@
+"""Tests the ``gdc_filtration_tools.logger`` module."""
+
+import io
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from gdc_filtration_tools.bgzf import BLOCK_SIZE, BgzfWriter
+from gdc_filtration_tools.logger import Logger, ProgressReporter, TraceWriter
+from tests.utils import captured_output, cleanup_files
+
+
+def load_trace(fname):
+    with open(fname, "rt") as fh:
+        data = fh.read()
+    return json.loads(data.rstrip().rstrip(",") + "]")
+
+
+class TestTraceWriter(unittest.TestCase):
+    def setUp(self):
+        (fd, self.fn) = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        self.old_tracer = Logger.Tracer
+
+    def tearDown(self):
+        Logger.Tracer = self.old_tracer
+        os.environ.pop(Logger.TraceEnv, None)
+        cleanup_files(self.fn)
+
+    def test_span_disabled(self):
+        Logger.Tracer = None
+        with Logger.span("noop", records=1):
+            pass
+        self.assertEqual(os.path.getsize(self.fn), 0)
+
+    def test_span(self):
+        Logger.setup_tracer(self.fn)
+        self.assertEqual(os.environ[Logger.TraceEnv], self.fn)
+        Logger.Tracer.start()
+        with Logger.span("open_input", path="in.vcf"):
+            pass
+
+        def worker():
+            with Logger.span("shard", index=1):
+                pass
+
+        thread = threading.Thread(target=worker, name="shard-1")
+        thread.start()
+        thread.join()
+
+        events = load_trace(self.fn)
+        spans = [i for i in events if i["ph"] == "X"]
+        self.assertEqual([i["name"] for i in spans], ["open_input", "shard"])
+        self.assertEqual(spans[0]["args"], {"path": "in.vcf"})
+        self.assertEqual(spans[0]["pid"], os.getpid())
+        self.assertNotEqual(spans[0]["tid"], spans[1]["tid"])
+        names = [i["args"]["name"] for i in events if i["ph"] == "M"]
+        self.assertIn("shard-1", names)
+
+    def test_start_truncates(self):
+        tracer = TraceWriter(self.fn)
+        tracer.start()
+        tracer.add_span("first", 0, 1, {})
+        tracer.start()
+        tracer.add_span("second", 0, 1, {})
+        spans = [i["name"] for i in load_trace(self.fn) if i["ph"] == "X"]
+        self.assertEqual(spans, ["second"])
+
+    def test_bracket_without_start(self):
+        tracer = TraceWriter(self.fn)
+        tracer.add_span("first", 0, 1, {})
+        tracer.add_span("second", 0, 1, {})
+        with open(self.fn, "rt") as fh:
+            self.assertEqual(fh.read(2), "[\n")
+        spans = [i["name"] for i in load_trace(self.fn) if i["ph"] == "X"]
+        self.assertEqual(spans, ["first", "second"])
+
+    def test_span_processes(self):
+        Logger.Tracer = TraceWriter(self.fn)
+        pids = []
+        for i in range(4):
+            pid = os.fork()
+            if pid == 0:
+                for j in range(50):
+                    Logger.add_span("child", 0, 1)
+                os._exit(0)
+            pids.append(pid)
+        for pid in pids:
+            os.waitpid(pid, 0)
+        spans = [i for i in load_trace(self.fn) if i["ph"] == "X"]
+        self.assertEqual(len(spans), 200)
+
+    def test_compress_span(self):
+        Logger.Tracer = TraceWriter(self.fn)
+        writer = BgzfWriter(io.BytesIO())
+        writer.write(b"x" * (BLOCK_SIZE + 10))
+        writer.close()
+        spans = [i for i in load_trace(self.fn) if i["ph"] == "X"]
+        self.assertEqual([i["name"] for i in spans], ["compress"])
+        self.assertEqual(spans[0]["args"], {"blocks": 2, "bytes": BLOCK_SIZE + 10})
+
+
+class TestProgressReporter(unittest.TestCase):
+    def test_rate_limited(self):
+        logger = Logger.get_logger("test_progress")
+        progress = ProgressReporter(logger, interval=3600.0, check_every=1)
+        with self.assertNoLogs(logger, level="INFO"):
+            for i in range(1, 1001):
+                progress.update(i)
+
+    def test_update(self):
+        logger = Logger.get_logger("test_progress")
+        progress = ProgressReporter(
+            logger, interval=0.0, check_every=10, total_records=40
+        )
+        with self.assertLogs(logger, level="INFO") as cm:
+            for i in range(1, 21):
+                progress.update(i)
+        self.assertEqual(len(cm.output), 2)
+        self.assertIn("Processed 10 records (", cm.output[0])
+        self.assertIn("records/sec; ETA 0:00:00)", cm.output[1])
+
+    def test_eta_from_position(self):
+        logger = Logger.get_logger("test_progress")
+        progress = ProgressReporter(
+            logger,
+            interval=0.0,
+            check_every=1,
+            total_bytes=100,
+            position=lambda: 50,
+        )
+        with self.assertLogs(logger, level="INFO") as cm:
+            progress.update(1)
+        self.assertIn("; ETA ", cm.output[0])
+
+
+class TestRootLogger(unittest.TestCase):
+    def tearDown(self):
+        Logger.setup_root_logger(asynchronous=False, json_format=False)
+
+    def test_async_json(self):
+        with captured_output() as (_, stderr):
+            Logger.setup_root_logger(asynchronous=True, json_format=True)
+            self.assertIsNotNone(Logger.Listener)
+            logger = Logger.get_logger("test_async")
+            logger.info("record %s", 1)
+            logger.warning("record 2")
+            Logger.stop_listener()
+        lines = [json.loads(i) for i in stderr.getvalue().splitlines()]
+        self.assertEqual([i["message"] for i in lines], ["record 1", "record 2"])
+        self.assertEqual([i["level"] for i in lines], ["INFO", "WARNING"])
+        self.assertEqual(lines[0]["logger"], "gdc_filtration_tools.test_async")
+
+    def test_sync(self):
+        with captured_output() as (_, stderr):
+            Logger.setup_root_logger(asynchronous=False, json_format=False)
+            self.assertIsNone(Logger.Listener)
+            self.assertEqual(len(Logger.RootLogger.handlers), 1)
+            Logger.get_logger("test_sync").info("record 1")
+        self.assertIn("[gdc_filtration_tools.test_sync] - record 1", stderr.getvalue())
@@ -0,0 +1,134 @@
+"""Tests the ``gdc_filtration_tools.passthrough`` module."""
+
+import gzip
+import shutil
+import tempfile
+import unittest
+
+import pysam
+
+from gdc_filtration_tools.passthrough import (
+    COPY,
+    DROP,
+    PROCESS,
+    can_passthrough,
+    declared_contigs,
+    passthrough_vcf,
+    read_header_text,
+)
+from tests.utils import cleanup_files, get_test_data_path, strip_pseudo_bins
+
+HEADER = (
+    "##fileformat=VCFv4.2\n"
+    "##contig=<ID=chr1,length=100000000>\n"
+    "##contig=<ID=chr2,length=100000000>\n"
+    "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+)
+
+
+class TestPassthrough(unittest.TestCase):
+    def setUp(self):
+        # Enough records for each contig to span several BGZF blocks
+        self.lines = {}
+        (fd, fn) = tempfile.mkstemp(suffix=".vcf")
+        with open(fn, "wt") as o:
+            o.write(HEADER)
+            for contig in ("chr1", "chrUn", "chr2"):
+                self.lines[contig] = [
+                    "{0}\t{1}\t.\tA\tC\t.\tPASS\tDP={2}\n".format(contig, i * 10, i)
+                    for i in range(1, 10001)
+                ]
+                o.writelines(self.lines[contig])
+        self.gz = pysam.tabix_index(fn, preset="vcf", force=True)
+        (fd, self.out) = tempfile.mkstemp(suffix=".vcf.gz")
+
+    def tearDown(self):
+        cleanup_files([self.gz, self.gz + ".tbi", self.out])
+
+    def test_read_header_text(self):
+        header = read_header_text(self.gz)
+        self.assertEqual(header, HEADER)
+        self.assertEqual(declared_contigs(header), ["chr1", "chr2"])
+
+    def test_can_passthrough(self):
+        reader = pysam.VariantFile(self.gz)
+        try:
+            self.assertTrue(can_passthrough(reader, self.gz, "out.vcf.gz", "wz"))
+            self.assertFalse(can_passthrough(reader, self.gz, "out.vcf", "w"))
+            self.assertFalse(can_passthrough(reader, self.gz, "-", "wz"))
+        finally:
+            reader.close()
+
+        ivcf = get_test_data_path("test.vcf")
+        reader = pysam.VariantFile(ivcf)
+        try:
+            self.assertFalse(can_passthrough(reader, ivcf, "out.vcf.gz", "wz"))
+        finally:
+            reader.close()
+
+    def test_passthrough_vcf(self):
+        actions = {"chr1": COPY, "chrUn": DROP, "chr2": PROCESS}
+
+        def process(contig):
+            for line in self.lines[contig][:5]:
+                yield line.replace("PASS", "q10")
+
+        counts = passthrough_vcf(
+            self.gz, self.out, HEADER, actions.__getitem__, process
+        )
+        self.assertEqual(counts, {COPY: 10000, DROP: 10000, PROCESS: 10000})
+
+        with gzip.open(self.out, "rt") as fh:
+            found = fh.readlines()
+        expected = (
+            HEADER.splitlines(True)
+            + self.lines["chr1"]
+            + [i.replace("PASS", "q10") for i in self.lines["chr2"][:5]]
+        )
+        self.assertEqual(found, expected)
+
+        # The output is valid BGZF that htslib can index and query
+        pysam.tabix_index(self.out, preset="vcf", force=True)
+        reader = pysam.VariantFile(self.out)
+        try:
+            self.assertEqual(len(list(reader.fetch("chr1", 50000, 50100))), 10)
+        finally:
+            reader.close()
+            cleanup_files(self.out + ".tbi")
+
+        with self.assertRaises(ValueError):
+            passthrough_vcf(self.gz, self.out, HEADER, lambda contig: PROCESS)
+
+    def test_skip_head(self):
+        def skip(line):
+            return int(line.split(b"\t")[1]) < 40
+
+        counts = passthrough_vcf(
+            self.gz, self.out, HEADER, lambda contig: COPY, skip_head=skip
+        )
+        self.assertEqual(counts, {COPY: 29991, DROP: 9, PROCESS: 0})
+        with gzip.open(self.out, "rt") as fh:
+            found = [i for i in fh if not i.startswith("#")]
+        expected = [
+            i for contig in ("chr1", "chrUn", "chr2") for i in self.lines[contig][3:]
+        ]
+        self.assertEqual(found, expected)
+
+    def test_missing_metadata(self):
+        strip_pseudo_bins(self.gz + ".tbi")
+        reader = pysam.VariantFile(self.gz)
+        try:
+            self.assertFalse(can_passthrough(reader, self.gz, "out.vcf.gz", "wz"))
+        finally:
+            reader.close()
+        with self.assertRaises(ValueError):
+            passthrough_vcf(self.gz, self.out, HEADER, lambda contig: COPY)
+
+    def test_not_indexed(self):
+        (fd, fn) = tempfile.mkstemp(suffix=".vcf.gz")
+        shutil.copy(self.gz, fn)
+        try:
+            with self.assertRaises(ValueError):
+                passthrough_vcf(fn, self.out, HEADER, lambda contig: COPY)
+        finally:
+            cleanup_files(fn)
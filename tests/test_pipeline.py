@@ -0,0 +1,117 @@
+"""Tests the ``gdc_filtration_tools.pipeline`` module."""
+
+import threading
+import unittest
+from unittest.mock import Mock
+
+from gdc_filtration_tools.logger import ProgressReporter
+from gdc_filtration_tools.pipeline import run_pipeline
+
+
+def odd_squares(i):
+    return i * i if i % 2 else None
+
+
+class TestPipeline(unittest.TestCase):
+    def test_run_pipeline(self):
+        for threaded in (True, False):
+            written = []
+            n = run_pipeline(
+                range(1000), odd_squares, written.append, 7, 2, threaded=threaded
+            )
+            self.assertEqual(n, 500)
+            self.assertEqual(written, [i * i for i in range(1, 1000, 2)])
+
+    def test_run_pipeline_threads(self):
+        threads = {}
+
+        def records():
+            threads["read"] = threading.current_thread().name
+            yield 1
+
+        def transform(i):
+            threads["transform"] = threading.current_thread().name
+            return i
+
+        def write(i):
+            threads["write"] = threading.current_thread().name
+
+        run_pipeline(records(), transform, write, threaded=True)
+        self.assertEqual(threads["read"], "read_records")
+        self.assertEqual(threads["transform"], threading.current_thread().name)
+        self.assertEqual(threads["write"], "write_records")
+
+    def test_run_pipeline_progress(self):
+        read = []
+        calls = []
+        seen = []
+
+        def records():
+            for i in range(100):
+                read.append(i)
+                yield i
+
+        def position():
+            calls.append(threading.current_thread().name)
+            return len(read)
+
+        progress = ProgressReporter(
+            Mock(), total_bytes=100, position=position, check_every=1
+        )
+
+        def transform(i):
+            seen.append(progress.position())
+            return i
+
+        run_pipeline(records(), transform, lambda i: None, 10, 2, True, progress)
+        self.assertEqual(set(calls), {"read_records"})
+        # each record sees the position after the end of its batch
+        self.assertEqual(seen, [(i // 10 + 1) * 10 for i in range(100)])
+        self.assertIs(progress.position, position)
+
+    def test_run_pipeline_backpressure(self):
+        read = []
+        release = threading.Event()
+        read_at_release = []
+
+        def records():
+            for i in range(100):
+                read.append(i)
+                yield i
+
+        def unblock():
+            read_at_release.append(len(read))
+            release.set()
+
+        timer = threading.Timer(0.5, unblock)
+        timer.start()
+        n = run_pipeline(records(), lambda i: i, lambda i: release.wait(), 5, 2, True)
+        timer.join()
+        self.assertEqual(n, 100)
+        # the blocked writer holds back the transform and then the reader
+        self.assertLess(read_at_release[0], 50)
+
+    def test_run_pipeline_errors(self):
+        def bad_records():
+            yield from range(10)
+            raise IOError("read")
+
+        def bad_transform(i):
+            if i == 500:
+                raise ValueError("transform")
+            return i
+
+        def bad_write(i):
+            if i == 500:
+                raise KeyError("write")
+
+        for records, transform, write, error in (
+            (bad_records(), odd_squares, lambda i: None, IOError),
+            (range(10**6), bad_transform, lambda i: None, ValueError),
+            (range(10**6), lambda i: i, bad_write, KeyError),
+        ):
+            with self.assertRaises(error):
+                run_pipeline(records, transform, write, 10, 2, threaded=True)
+        self.assertEqual(
+            [i.name for i in threading.enumerate() if i.name.endswith("_records")], []
+        )
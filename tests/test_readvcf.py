@@ -1,8 +1,20 @@
-from io import StringIO
+import gzip
+import os
+import shutil
+import tempfile
+from io import BufferedReader, BytesIO, StringIO, TextIOWrapper
 from unittest import TestCase
 from unittest.mock import MagicMock, Mock, patch
 
-from gdc_filtration_tools.readvcf import GdcVcfRecord, VcfReader, VcfSectionTracker
+import pysam
+
+from gdc_filtration_tools.bgzf import BgzfWriter
+from gdc_filtration_tools.readvcf import (
+    VcfReader,
+    VcfSectionTracker,
+    make_record_class,
+    parse_region,
+)
 
 
 class TestVcfSectionTracker(TestCase):
@@ -245,37 +257,248 @@ class TestVcfReader(TestCase):
         )
         mock_file_io.seek = Mock()
         vr.open_fn = MagicMock(return_value=mock_file_io)
-        expected = GdcVcfRecord(
-            CHROM="chr1",
-            POS="100",
-            ID="200",
-            REF="A",
-            ALT="T",
-            QUAL=".",
-            FILTER="PASS",
-            INFO="info",
-            FORMAT="format",
-            NORMAL="normal",
-            TUMOR="tumor",
-            COLUMN_NAMES=[
-                "CHROM",
-                "POS",
-                "ID",
-                "REF",
-                "ALT",
-                "QUAL",
-                "FILTER",
-                "INFO",
-                "FORMAT",
-                "NORMAL",
-                "TUMOR",
-            ],
+        column_names = [
+            "CHROM",
+            "POS",
+            "ID",
+            "REF",
+            "ALT",
+            "QUAL",
+            "FILTER",
+            "INFO",
+            "FORMAT",
+            "NORMAL",
+            "TUMOR",
+        ]
+        expected = make_record_class(column_names)(
+            ["chr1", "100", "200", "A", "T", ".", "PASS"]
+            + ["info", "format", "normal", "tumor"]
         )
         result = list(vr.iter_rows())
         assert result == [expected]
+        assert result[0].TUMOR == "tumor"
         vr.open_fn.assert_called_once_with(filename, "rt")
         mock_file_io.seek.assert_called_once_with(10)
 
+    @patch.object(VcfReader, "_get_header")
+    def test_iter_lines(self, get_header):
+        filename = "test.vcf"
+        vr = VcfReader(filename)
+        vr.records_offset = 10
+        mock_file_io = StringIO(
+            "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+            "chr1\t100\t200\tA\tT\t.\tPASS\tinfo\n"
+            "chr1\t300\t400\tA\tT\t.\tPASS\tinfo"
+        )
+        mock_file_io.seek = Mock()
+        vr.open_fn = MagicMock(return_value=mock_file_io)
+        result = list(vr.iter_lines())
+        assert result == [
+            "chr1\t100\t200\tA\tT\t.\tPASS\tinfo\n",
+            "chr1\t300\t400\tA\tT\t.\tPASS\tinfo",
+        ]
+        mock_file_io.seek.assert_called_once_with(10)
+
+    @patch.object(VcfReader, "_get_header")
+    def test_iter_raw_lines(self, get_header):
+        filename = "test.vcf"
+        vr = VcfReader(filename)
+        vr.records_offset = 0
+        mock_file_io = BytesIO(
+            b"#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+            b"chr1\t100\t200\tA\tT\t.\tPASS\tinfo\r\n"
+            b"chr1\t300\t400\tA\tT\t.\tPASS\tinfo"
+        )
+        vr.open_fn = MagicMock(return_value=mock_file_io)
+        # chunks smaller than a line
+        result = list(vr.iter_raw_lines(chunk_size=7))
+        assert result == [
+            b"chr1\t100\t200\tA\tT\t.\tPASS\tinfo",
+            b"chr1\t300\t400\tA\tT\t.\tPASS\tinfo",
+        ]
+        vr.open_fn.assert_called_once_with(filename, "rb")
+
+    def test_iter_raw_lines_mapped(self):
+        data = (
+            "##fileformat=VCFv4.2\n"
+            "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+            + "".join(f"chr1\t{i}\t.\tA\tT\t.\tPASS\t.\n" for i in range(1, 101))
+        )
+        (fd, fn) = tempfile.mkstemp(suffix=".vcf")
+        try:
+            with open(fn, "w") as fh:
+                fh.write(data)
+            vr = VcfReader(fn)
+            assert vr.is_mapped
+            expected = [i.encode() for i in data.splitlines()[2:]]
+            assert list(vr.iter_raw_lines(chunk_size=50)) == expected
+            assert vr.tell_raw() == len(data)
+
+            ranges = vr.split_records(7)
+            assert len(ranges) == 7
+            assert ranges[0][0] == data.index("chr1")
+            assert ranges[-1][1] == len(data)
+            for (_, end), (start, _) in zip(ranges[:-1], ranges[1:]):
+                assert end == start
+                assert data[end - 1] == "\n"
+            result = [
+                line
+                for start, end in ranges
+                for line in vr.iter_raw_lines(chunk_size=50, start=start, end=end)
+            ]
+            assert result == expected
+            assert len(vr.split_records(1000)) == 100
+        finally:
+            os.unlink(fn)
+
+    def test_iter_raw_lines_mapped_no_records(self):
+        (fd, fn) = tempfile.mkstemp(suffix=".vcf")
+        try:
+            with open(fn, "w") as fh:
+                fh.write("##fileformat=VCFv4.2\n#CHROM\tPOS\n")
+            vr = VcfReader(fn)
+            assert list(vr.iter_raw_lines()) == []
+            assert vr.split_records(4) == []
+        finally:
+            os.unlink(fn)
+
+    def test_iter_raw_lines_range_compressed(self):
+        (fd, fn) = tempfile.mkstemp(suffix=".vcf.gz")
+        try:
+            with gzip.open(fn, "wt") as fh:
+                fh.write("##fileformat=VCFv4.2\n#CHROM\tPOS\nchr1\t1\n")
+            vr = VcfReader(fn)
+            assert not vr.is_mapped
+            assert not vr.is_bgzf
+            with self.assertRaises(ValueError):
+                list(vr.iter_raw_lines(start=0, end=10))
+            with self.assertRaises(ValueError):
+                vr.split_records(2)
+        finally:
+            os.unlink(fn)
+
+    def test_iter_raw_lines_bgzf(self):
+        data = (
+            "##fileformat=VCFv4.2\n"
+            "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+            + "".join(f"chr1\t{i}\t.\tA\tT\t.\tPASS\t.\n" for i in range(1, 101))
+        ).encode()
+        (fd, fn) = tempfile.mkstemp(suffix=".vcf.gz")
+        try:
+            with open(fn, "wb") as fh:
+                writer = BgzfWriter(fh)
+                # small blocks, with lines and the header split across them
+                for i in range(0, len(data), 100):
+                    writer.write(data[i : i + 100])
+                    writer.flush()
+                writer.close()
+            vr = VcfReader(fn)
+            assert vr.is_bgzf
+            expected = data.splitlines()[2:]
+            assert list(vr.iter_raw_lines()) == expected
+
+            ranges = vr.split_records(7)
+            assert len(ranges) == 7
+            for (_, end), (start, _) in zip(ranges[:-1], ranges[1:]):
+                assert end == start
+            assert all(start < end for start, end in ranges)
+            result = [
+                line
+                for start, end in ranges
+                for line in vr.iter_raw_lines(start=start, end=end)
+            ]
+            assert result == expected
+            assert (
+                list(vr.iter_raw_lines(start=ranges[1][0]))
+                == expected[
+                    len(list(vr.iter_raw_lines(start=ranges[0][0], end=ranges[0][1]))) :
+                ]
+            )
+        finally:
+            os.unlink(fn)
+
+    def test_iter_rows_region(self):
+        data = (
+            "##fileformat=VCFv4.2\n"
+            "##contig=<ID=chr1,length=1000>\n"
+            "##contig=<ID=chr2,length=1000>\n"
+            "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tNORMAL\tTUMOR\n"
+            "chr1\t10\t.\tA\tT\t.\tPASS\t.\tGT\t0/0\t0/1\n"
+            "chr1\t18\t.\tACGTA\tA\t.\tPASS\t.\tGT\t0/0\t0/1\n"
+            "chr1\t30\t.\tA\tT\t.\tPASS\t.\tGT\t0/0\t0/1\n"
+            "chr2\t5\t.\tA\tT\t.\tPASS\t.\tGT\t0/0\t0/1\n"
+        )
+        tmpdir = tempfile.mkdtemp()
+        fn = os.path.join(tmpdir, "test.vcf")
+        try:
+            with open(fn, "w") as fh:
+                fh.write(data)
+            with self.assertRaises(ValueError):
+                list(VcfReader(fn).iter_rows(region="chr1"))
+            fn = pysam.tabix_index(fn, preset="vcf")
+            vr = VcfReader(fn)
+
+            self.assertEqual(
+                [i.POS for i in vr.iter_rows(region="chr1")], ["10", "18", "30"]
+            )
+            # the deletion at 18 overlaps 20-30 but starts before it
+            self.assertEqual([i.POS for i in vr.iter_rows(region="chr1:20-30")], ["30"])
+            self.assertEqual(
+                [i.POS for i in vr.iter_rows(region="chr1:11")], ["18", "30"]
+            )
+            self.assertEqual(list(vr.iter_rows(region="chr3")), [])
+            self.assertEqual(
+                list(vr.iter_raw_lines(region="chr2:1-5")),
+                [b"chr2\t5\t.\tA\tT\t.\tPASS\t.\tGT\t0/0\t0/1"],
+            )
+            self.assertEqual(list(vr.iter_rows(region="chr2:1-5"))[0].TUMOR, "0/1")
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_parse_region(self):
+        self.assertEqual(parse_region("chr1"), ("chr1", 1, None))
+        self.assertEqual(parse_region("chr1:100"), ("chr1", 100, None))
+        self.assertEqual(parse_region("chr1:1,000-2,000"), ("chr1", 1000, 2000))
+        self.assertEqual(parse_region("chr1:0-5"), ("chr1", 1, 5))
+        self.assertEqual(parse_region("HLA-A*01:01:x"), ("HLA-A*01:01:x", 1, None))
+        with self.assertRaises(ValueError):
+            parse_region("chr1:10-5")
+
+    def test_make_record_class(self):
+        columns = ["CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER", "INFO"]
+        columns += ["FORMAT", "S1", "S2", "tumor-1"]
+        record_class = make_record_class(columns)
+        assert make_record_class(list(columns)) is record_class
+        assert record_class.SAMPLE_NAMES == ("S1", "S2", "tumor-1")
+        assert record_class.SAMPLE_INDEXES == (9, 10, 11)
+
+        row = record_class.from_line(
+            "chr1\t5\t.\tA\tT\t.\tPASS\t.\tGT\t0/0\t0/1\t1/1\n"
+        )
+        assert (row.CHROM, row.POS, row.S1, row.S2) == ("chr1", "5", "0/0", "0/1")
+        assert row.get("tumor-1") == "1/1"
+        assert row.samples == ["0/0", "0/1", "1/1"]
+        with self.assertRaises(AttributeError):
+            row.NORMAL
+
+        new = row.replace(S2="1/1", FILTER=None)
+        assert str(new) == "chr1\t5\t.\tA\tT\t.\tPASS\t.\tGT\t0/0\t1/1\t1/1"
+        assert row.S2 == "0/1"
+        row.S2 = "1/1"
+        assert row == new
+
+        line = "chr1\t5\t.\tA\tT\t.\tPASS\t.\tGT\t0/0\t0/1\n"
+        row = make_record_class(columns[:9] + ["NORMAL", "TUMOR"]).from_line(line)
+        assert (row.NORMAL, row.TUMOR) == ("0/0", "0/1")
+        assert str(row) == line.rstrip()
+
+    @patch.object(VcfReader, "_get_header")
+    def test_column_names(self, get_header):
+        vr = VcfReader("test.vcf")
+        assert vr.column_names == []
+        vr.header = {"COLUMN_NAMES": {"0": "#CHROM\tPOS\tID"}}
+        assert vr.column_names == ["CHROM", "POS", "ID"]
+
     @patch.object(VcfReader, "_get_header")
     def test_iter_header_lines(self, get_header):
         filename = "test.vcf"
@@ -311,9 +534,33 @@ class TestVcfReader(TestCase):
     def test__read_header_lines(self, get_header):
         filename = "test.vcf"
         vr = VcfReader(filename)
-        vr.open_fn = Mock(
-            return_value=StringIO("##header_line\n" "#CHROM\n" "records\n")
-        )
+        vr.open_fn = Mock(return_value=StringIO("##header_line\n#CHROM\nrecords\n"))
         expected = ["##header_line", "#CHROM"]
         result = list(vr._read_header_lines())
         assert result == expected
+
+    def test_stdin(self):
+        data = (
+            "##fileformat=VCFv4.2\n"
+            "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tNORMAL\tTUMOR\n"
+            "chr1\t100\t.\tA\tT\t.\tPASS\tinfo\tformat\tnormal\ttumor\n"
+            "chr1\t200\t.\tA\tT\t.\tPASS\tinfo\tformat\tnormal\ttumor\n"
+        ).encode()
+        for payload in (data, gzip.compress(data)):
+            # pipes are not seekable
+            raw = BytesIO(payload)
+            raw.seekable = Mock(return_value=False)
+            stdin = TextIOWrapper(BufferedReader(raw))
+            with patch("gdc_filtration_tools.readvcf.sys.stdin", stdin):
+                vr = VcfReader("-")
+                assert list(vr.header) == ["fileformat", "COLUMN_NAMES"]
+                result = list(vr.iter_rows())
+            assert [i.POS for i in result] == ["100", "200"]
+            assert result[0].TUMOR == "tumor"
+
+            raw = BytesIO(payload)
+            stdin = TextIOWrapper(BufferedReader(raw))
+            with patch("gdc_filtration_tools.readvcf.sys.stdin", stdin):
+                vr = VcfReader("-")
+                lines = list(vr.iter_raw_lines())
+            assert [i.split(b"\t")[1] for i in lines] == [b"100", b"200"]
@@ -0,0 +1,112 @@
+"""Tests the ``gdc_filtration_tools.reheader`` module."""
+
+import gzip
+import tempfile
+import unittest
+
+import pysam
+
+from gdc_filtration_tools.reheader import can_reheader, find_header_end, reheader_vcf
+from gdc_filtration_tools.vcfindex import read_index
+from tests.utils import cleanup_files, get_test_data_path
+
+
+def write_vcf(fn, n_records, n_comments=0):
+    header = pysam.VariantHeader()
+    for contig in ("chr1", "chr2", "chr3"):
+        header.add_line("##contig=<ID={0},length=100000000>".format(contig))
+    header.add_line('##INFO=<ID=DP,Number=1,Type=Integer,Description="Depth">')
+    for i in range(n_comments):
+        header.add_line("##comment{0}={1}".format(i, "x" * 40))
+    header.add_sample("TUMOR")
+    writer = pysam.VariantFile(fn, "wz", header=header)
+    for contig in ("chr1", "chr3"):
+        for i in range(n_records):
+            record = writer.new_record(
+                contig=contig, start=i * 100, alleles=("A", "C"), info={"DP": i}
+            )
+            writer.write(record)
+    writer.close()
+
+
+class TestReheader(unittest.TestCase):
+    def test_find_header_end(self):
+        self.assertEqual(find_header_end(b"#CHROM\tPOS\nchr1"), 11)
+        self.assertEqual(find_header_end(b"##x=1\n#CHROM\tPOS\n"), 17)
+        self.assertIsNone(find_header_end(b"##x=1\n#CHROM\tP"))
+        self.assertIsNone(find_header_end(b"##x=1\n"))
+
+    def test_can_reheader(self):
+        ivcf = get_test_data_path("test.vcf")
+        reader = pysam.VariantFile(ivcf)
+        try:
+            self.assertTrue(can_reheader(reader, ivcf, "out.vcf", "w"))
+            self.assertFalse(can_reheader(reader, ivcf, "out.vcf.gz", "wz"))
+            self.assertFalse(can_reheader(reader, ivcf, "-", "wb0"))
+        finally:
+            reader.close()
+
+        ivcf = get_test_data_path("test_input_for_add_oxog_filters_from_maf.vcf.gz")
+        reader = pysam.VariantFile(ivcf)
+        try:
+            self.assertTrue(can_reheader(reader, ivcf, "out.vcf.gz", "wz"))
+            self.assertFalse(can_reheader(reader, ivcf, "out.bcf", "wb"))
+        finally:
+            reader.close()
+
+    def test_reheader_text(self):
+        ivcf = get_test_data_path("test.vcf")
+        (fd, fn) = tempfile.mkstemp(suffix=".vcf")
+        try:
+            header = "##fileformat=VCFv4.2\n##new=1\n#CHROM\tPOS\tID\n"
+            self.assertIsNone(reheader_vcf(ivcf, fn, header))
+            with open(ivcf, "rt") as fh:
+                expected = [i for i in fh if not i.startswith("#")]
+            with open(fn, "rt") as fh:
+                found = fh.readlines()
+            self.assertEqual(found, header.splitlines(True) + expected)
+        finally:
+            cleanup_files(fn)
+
+    def test_reheader_bgzf(self):
+        for csi in (False, True):
+            (fd, ifn) = tempfile.mkstemp(suffix=".vcf.gz")
+            (fd, ofn) = tempfile.mkstemp(suffix=".vcf.gz")
+            suffix = ".csi" if csi else ".tbi"
+            try:
+                # Spans several blocks in both the header and the records
+                write_vcf(ifn, 5000, n_comments=2000)
+                pysam.tabix_index(ifn, preset="vcf", force=True, csi=csi)
+
+                reader = pysam.VariantFile(ifn)
+                header = reader.header.copy()
+                reader.close()
+                header.add_line("##new=1")
+                self.assertEqual(reheader_vcf(ifn, ofn, str(header)), ofn + suffix)
+
+                with gzip.open(ifn, "rt") as fh:
+                    expected = [i for i in fh if not i.startswith("#")]
+                with gzip.open(ofn, "rt") as fh:
+                    found = fh.readlines()
+                self.assertEqual(found, str(header).splitlines(True) + expected)
+
+                old = read_index(ifn + suffix, ["chr1", "chr2", "chr3"])
+                new = read_index(ofn + suffix, ["chr1", "chr2", "chr3"])
+                self.assertEqual(
+                    [i.n_mapped for i in old.references],
+                    [i.n_mapped for i in new.references],
+                )
+
+                reader = pysam.VariantFile(ofn)
+                try:
+                    self.assertIn("new", [i.key for i in reader.header.records])
+                    for region in (("chr1",), ("chr3", 1000, 2000), ("chr2",)):
+                        found = [str(i) for i in reader.fetch(*region)]
+                        check = pysam.VariantFile(ifn)
+                        exp = [str(i) for i in check.fetch(*region)]
+                        check.close()
+                        self.assertEqual(found, exp)
+                finally:
+                    reader.close()
+            finally:
+                cleanup_files([ifn, ifn + suffix, ofn, ofn + suffix])
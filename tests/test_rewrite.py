@@ -0,0 +1,155 @@
+"""Tests the ``gdc_filtration_tools.rewrite`` module."""
+
+import tempfile
+import unittest
+
+import pysam
+
+from gdc_filtration_tools.readvcf import VcfReader
+from gdc_filtration_tools.rewrite import (
+    AddInfoFlag,
+    AppendFilter,
+    DropRedundantEnd,
+    RecordRewriter,
+    RenameInfoKey,
+    SetSampleGT,
+    can_rewrite,
+    rewrite_vcf,
+)
+from tests.utils import cleanup_files, get_test_data_path
+
+COLUMNS = [
+    "CHROM",
+    "POS",
+    "ID",
+    "REF",
+    "ALT",
+    "QUAL",
+    "FILTER",
+    "INFO",
+    "FORMAT",
+    "NORMAL",
+    "TUMOR",
+]
+
+
+def rewrite(edits, line):
+    return RecordRewriter(COLUMNS, edits).rewrite(line)
+
+
+class TestRewrite(unittest.TestCase):
+    def test_set_sample_gt(self):
+        line = "chr1\t10\t.\tA\tT\t.\tPASS\tDP=3\tGT:DP\t./.:1\t./.:2\n"
+        edits = [SetSampleGT("TUMOR", "0/1"), SetSampleGT("NORMAL", "0/0")]
+        self.assertEqual(
+            rewrite(edits, line),
+            "chr1\t10\t.\tA\tT\t.\tPASS\tDP=3\tGT:DP\t0/0:1\t0/1:2\n",
+        )
+
+        line = "chr1\t10\t.\tA\tT\t.\tPASS\tDP=3\tGT\t0/0\t0/0"
+        self.assertEqual(
+            rewrite([SetSampleGT("TUMOR", "0/1")], line),
+            "chr1\t10\t.\tA\tT\t.\tPASS\tDP=3\tGT\t0/0\t0/1\n",
+        )
+
+        line = "chr1\t10\t.\tA\tT\t.\tPASS\tDP=3\tDP\t1\t2\n"
+        self.assertEqual(
+            rewrite([SetSampleGT("TUMOR", "0/1")], line),
+            "chr1\t10\t.\tA\tT\t.\tPASS\tDP=3\tGT:DP\t.:1\t0/1:2\n",
+        )
+
+        # GT is found wherever it is in the FORMAT
+        line = "chr1\t10\t.\tA\tT\t.\tPASS\tDP=3\tDP:GT\t1:0/0\t2\n"
+        self.assertEqual(
+            rewrite([SetSampleGT("TUMOR", "0/1")], line),
+            "chr1\t10\t.\tA\tT\t.\tPASS\tDP=3\tDP:GT\t1:0/0\t2:0/1\n",
+        )
+
+    def test_set_sample_gt_replace(self):
+        force_het = SetSampleGT("TUMOR", "0/1", replace=["0/0"])
+        edits = [force_het, AddInfoFlag("forcedHet", after=force_het)]
+        line = "chr1\t10\t.\tA\tT\t.\tPASS\tDP=3\tGT:DP\t0/0:1\t1/1:2\n"
+        self.assertEqual(rewrite(edits, line), line)
+
+        line = "chr1\t10\t.\tA\tT\t.\tPASS\t.\tGT:DP\t0/0:1\t0/0:2\n"
+        self.assertEqual(
+            rewrite(edits, line),
+            "chr1\t10\t.\tA\tT\t.\tPASS\tforcedHet\tGT:DP\t0/0:1\t0/1:2\n",
+        )
+
+        edits = [force_het, AddInfoFlag("forcedHet", after=force_het, first=True)]
+        line = "chr1\t10\t.\tA\tT\t.\tPASS\tDP=3\tGT:DP\t0/0:1\t0/0:2\n"
+        self.assertEqual(
+            rewrite(edits, line),
+            "chr1\t10\t.\tA\tT\t.\tPASS\tforcedHet;DP=3\tGT:DP\t0/0:1\t0/1:2\n",
+        )
+
+    def test_rename_info_key(self):
+        edits = [RenameInfoKey("SVTYPE", "TYPEOFSV")]
+        line = "chr1\t10\t.\tA\tT\t.\tPASS\tSVLEN=1;SVTYPE=INS;X\tGT\t0/0\t0/1\n"
+        self.assertEqual(
+            rewrite(edits, line),
+            "chr1\t10\t.\tA\tT\t.\tPASS\tSVLEN=1;TYPEOFSV=INS;X\tGT\t0/0\t0/1\n",
+        )
+        line = "chr1\t10\t.\tA\tT\t.\tPASS\tSVTYPEX=1\tGT\t0/0\t0/1\n"
+        self.assertEqual(rewrite(edits, line), line)
+
+    def test_drop_redundant_end(self):
+        edits = [DropRedundantEnd()]
+        line = "chr1\t10\t.\t{0}\tT\t.\tPASS\t{1}\tGT\t0/0\t0/1\n"
+        for ref, info, expected in (
+            ("A", "END=10;SVLEN=1", "SVLEN=1"),
+            ("AC", "SVLEN=1;END=11", "SVLEN=1"),
+            ("A", "END=10", "."),
+            ("A", "END=5;SVLEN=1", "SVLEN=1"),
+            ("A", "END=.;SVLEN=1", "SVLEN=1"),
+            ("AC", "END=10", "END=10"),
+            ("A", "END=30;SVLEN=1", "END=30;SVLEN=1"),
+            ("A", "SVLEN=1;END=30", "END=30;SVLEN=1"),
+            ("A", "SVLEN=1;END=30;X", "END=30;SVLEN=1;X"),
+            ("A", "SVLEN=1", "SVLEN=1"),
+        ):
+            self.assertEqual(
+                rewrite(edits, line.format(ref, info)), line.format(ref, expected)
+            )
+
+    def test_append_filter(self):
+        edits = [AppendFilter("LowQ", when=lambda fields: fields[1] == "10")]
+        line = "chr1\t10\t.\tA\tT\t.\tPASS\t.\tGT\t0/0\t0/1\n"
+        self.assertEqual(
+            rewrite(edits, line), "chr1\t10\t.\tA\tT\t.\tLowQ\t.\tGT\t0/0\t0/1\n"
+        )
+        line = "chr1\t10\t.\tA\tT\t.\tHigh\t.\tGT\t0/0\t0/1\n"
+        self.assertEqual(
+            rewrite(edits, line),
+            "chr1\t10\t.\tA\tT\t.\tHigh;LowQ\t.\tGT\t0/0\t0/1\n",
+        )
+        line = "chr1\t20\t.\tA\tT\t.\tPASS\t.\tGT\t0/0\t0/1\n"
+        self.assertEqual(rewrite(edits, line), line)
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            RecordRewriter(COLUMNS[:8], [SetSampleGT("TUMOR", "0/1")])
+        with self.assertRaises(ValueError):
+            rewrite([], "chr1\t10\n")
+
+    def test_rewrite_vcf(self):
+        ivcf = get_test_data_path("sanger_pindel_test.vcf")
+        fn = tempfile.mkstemp(suffix=".vcf.gz")[1]
+        try:
+            reader = pysam.VariantFile(ivcf)
+            header = str(reader.header)
+            self.assertTrue(can_rewrite(reader, ivcf, fn, "wz"))
+            self.assertFalse(can_rewrite(reader, ivcf, "-", "wz"))
+            self.assertFalse(can_rewrite(reader, ivcf, fn, "wb"))
+            reader.close()
+
+            edits = [SetSampleGT("TUMOR", "0/1")]
+            total = rewrite_vcf(VcfReader(ivcf), fn, header, edits, "wz")
+            self.assertEqual(total, 2)
+            with pysam.VariantFile(fn) as vcf:
+                self.assertEqual(
+                    [i.samples["TUMOR"]["GT"] for i in vcf], [(0, 1), (0, 1)]
+                )
+        finally:
+            cleanup_files([fn])
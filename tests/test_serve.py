@@ -0,0 +1,74 @@
+"""Tests the ``gdc_filtration_tools.tools.serve`` module."""
+
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+
+from gdc_filtration_tools.tools.serve import serve, submit_job
+from tests.utils import captured_output, cleanup_files, get_test_data_path
+
+
+def send(socket_path, requests):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        for request in requests:
+            sock.sendall(json.dumps(request).encode() + b"\n")
+        sock.shutdown(socket.SHUT_WR)
+        with sock.makefile("rb") as fh:
+            return [json.loads(line) for line in fh]
+
+
+class TestServe(unittest.TestCase):
+    def test_serve(self):
+        tmpdir = tempfile.mkdtemp()
+        socket_path = os.path.join(tmpdir, "serve.sock")
+        ivcf = get_test_data_path("filter_contigs.vcf")
+        ofn = os.path.join(tmpdir, "out.vcf")
+
+        with captured_output() as (_, stderr):
+            thread = threading.Thread(
+                target=serve,
+                args=(socket_path,),
+                kwargs={"workers": 1, "preload": ["filter-contigs"]},
+            )
+            thread.start()
+            try:
+                for _ in range(100):
+                    if os.path.exists(socket_path):
+                        break
+                    time.sleep(0.1)
+
+                reply = submit_job(
+                    socket_path,
+                    ["filter-contigs", ivcf, "out.vcf"],
+                    job_id="a",
+                    cwd=tmpdir,
+                )
+                self.assertEqual(reply["id"], "a")
+                self.assertEqual(reply["status"], 0)
+                self.assertTrue(os.path.exists(ofn))
+
+                replies = send(
+                    socket_path,
+                    [
+                        {"id": "b", "argv": ["filter-contigs"]},
+                        {"id": "c", "control": "ping"},
+                        "not a request",
+                    ],
+                )
+                by_id = {i["id"]: i for i in replies}
+                self.assertEqual(by_id["b"]["status"], 2)
+                self.assertEqual(by_id["c"]["workers"], 1)
+                self.assertEqual(by_id[None]["status"], 2)
+            finally:
+                send(socket_path, [{"control": "shutdown"}])
+                thread.join()
+
+        self.assertFalse(os.path.exists(socket_path))
+        self.assertIn("Processed 2 jobs - 1 failed", stderr.getvalue())
+        cleanup_files(ofn)
+        os.rmdir(tmpdir)
@@ -1,8 +1,21 @@
 """Tests the ``gdc_filtration_tools.utils` package."""
 
+import os
+import tempfile
 import unittest
 
-from gdc_filtration_tools.utils import get_pysam_outmode
+import pysam
+
+from gdc_filtration_tools.logger import Logger
+from gdc_filtration_tools.utils import (
+    get_progress_reporter,
+    get_pysam_outmode,
+    index_vcf,
+    is_bgzf,
+    open_bytes,
+    open_text,
+)
+from tests.utils import captured_output, cleanup_files, get_test_data_path
 
 
 class TestUtils(unittest.TestCase):
@@ -11,4 +24,90 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(mode, "w")
 
         mode = get_pysam_outmode("fake.vcf.gz")
-        self.assertEqual(mode, "w")
+        self.assertEqual(mode, "wz")
+
+        mode = get_pysam_outmode("fake.bcf")
+        self.assertEqual(mode, "wb")
+
+        mode = get_pysam_outmode("-")
+        self.assertEqual(mode, "wb0")
+
+        mode = get_pysam_outmode("fake.vcf", "u")
+        self.assertEqual(mode, "wb0")
+
+        mode = get_pysam_outmode("fake.bcf", "z")
+        self.assertEqual(mode, "wz")
+
+        with self.assertRaises(ValueError):
+            get_pysam_outmode("fake.vcf", "x")
+
+    def test_index_vcf(self):
+        logger = Logger.get_logger("test_utils")
+        ivcf = get_test_data_path("filter_contigs.vcf")
+        (fd, fn) = tempfile.mkstemp(suffix=".bcf")
+        try:
+            with captured_output():
+                reader = pysam.VariantFile(ivcf)
+                writer = pysam.VariantFile(fn, mode="wb", header=reader.header)
+                for record in reader:
+                    if record.chrom in ("chr1", "chr2"):
+                        writer.write(record)
+                reader.close()
+                writer.close()
+                self.assertEqual(index_vcf(logger, fn, "wb"), fn + ".csi")
+                self.assertIsNone(index_vcf(logger, fn, "wb0"))
+                self.assertIsNone(index_vcf(logger, "-", "wb"))
+
+            rdr = pysam.VariantFile(fn)
+            try:
+                self.assertEqual([i.chrom for i in rdr.fetch("chr2")], ["chr2"])
+            finally:
+                rdr.close()
+        finally:
+            cleanup_files([fn, fn + ".csi"])
+
+    def test_open_text(self):
+        with captured_output() as (stdout, _):
+            with open_text("-", "wt") as o:
+                o.write("chr1:1\n")
+        self.assertEqual(stdout.getvalue(), "chr1:1\n")
+
+        with open_text(get_test_data_path("test.vcf")) as fh:
+            self.assertTrue(fh.readline().startswith("##fileformat"))
+
+    def test_open_bytes(self):
+        with open_bytes(get_test_data_path("test.vcf")) as fh:
+            self.assertTrue(fh.readline().startswith(b"##fileformat"))
+
+        fn = tempfile.mkstemp()[1]
+        try:
+            with open_bytes(fn, "wb") as fh:
+                fh.write(b"chr1:1\n")
+            with open(fn, "rb") as fh:
+                self.assertEqual(fh.read(), b"chr1:1\n")
+        finally:
+            cleanup_files([fn])
+
+    def test_is_bgzf(self):
+        self.assertFalse(is_bgzf(get_test_data_path("test.vcf")))
+        self.assertTrue(
+            is_bgzf(
+                get_test_data_path("test_input_for_add_oxog_filters_from_maf.vcf.gz")
+            )
+        )
+
+    def test_get_progress_reporter(self):
+        logger = Logger.get_logger("test_utils")
+        ivcf = get_test_data_path("test_input_for_add_oxog_filters_from_maf.vcf.gz")
+        reader = pysam.VariantFile(ivcf)
+        try:
+            progress = get_progress_reporter(logger, ivcf, reader)
+            self.assertEqual(progress.total_records, 1)
+            self.assertEqual(progress.total_bytes, os.path.getsize(ivcf))
+            self.assertEqual(progress.position(), 0)
+        finally:
+            reader.close()
+
+        progress = get_progress_reporter(logger, "-")
+        self.assertIsNone(progress.total_records)
+        self.assertIsNone(progress.total_bytes)
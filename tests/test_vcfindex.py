@@ -0,0 +1,78 @@
+"""Tests the ``gdc_filtration_tools.vcfindex`` module."""
+
+import shutil
+import tempfile
+import unittest
+
+import pysam
+
+from gdc_filtration_tools.vcfindex import find_index, read_index, remap_index
+from tests.utils import cleanup_files, get_test_data_path, strip_pseudo_bins
+
+
+class TestVcfIndex(unittest.TestCase):
+    def setUp(self):
+        (fd, self.fn) = tempfile.mkstemp(suffix=".vcf")
+        shutil.copy(get_test_data_path("filter_contigs.vcf"), self.fn)
+        self.gz = pysam.tabix_index(self.fn, preset="vcf", force=True)
+
+    def tearDown(self):
+        cleanup_files([self.gz, self.gz + ".tbi", self.gz + ".csi"])
+
+    def validate_index(self, index):
+        self.assertEqual([i.name for i in index.references], ["chr1", "chr2", "chr10"])
+        self.assertEqual([i.n_mapped for i in index.references], [1, 1, 1])
+        self.assertEqual(index.n_mapped, 3)
+        self.assertEqual(index.contigs_with_records(), ["chr1", "chr2", "chr10"])
+
+        vcf = pysam.VariantFile(self.gz)
+        try:
+            for record in vcf.fetch():
+                ref = index.by_name[record.chrom]
+                self.assertLess(ref.off_beg, ref.off_end)
+        finally:
+            vcf.close()
+
+    def test_read_tbi(self):
+        self.assertEqual(find_index(self.gz), self.gz + ".tbi")
+        self.validate_index(read_index(self.gz + ".tbi"))
+
+    def test_read_csi(self):
+        cleanup_files(self.gz + ".tbi")
+        pysam.tabix_index(self.gz, preset="vcf", force=True, csi=True)
+        self.assertEqual(find_index(self.gz), self.gz + ".csi")
+        self.validate_index(read_index(self.gz + ".csi"))
+
+    def test_missing_metadata(self):
+        self.assertTrue(read_index(self.gz + ".tbi").has_metadata)
+        strip_pseudo_bins(self.gz + ".tbi")
+        index = read_index(self.gz + ".tbi")
+        self.assertFalse(index.has_metadata)
+        self.assertEqual([i.name for i in index.references], ["chr1", "chr2", "chr10"])
+
+    def test_missing_index(self):
+        cleanup_files(self.gz + ".tbi")
+        self.assertIsNone(find_index(self.gz))
+
+    def test_bad_index(self):
+        with self.assertRaises(ValueError):
+            read_index(
+                get_test_data_path("test_input_for_add_oxog_filters_from_maf.vcf.gz")
+            )
+
+    def test_remap_index(self):
+        for csi in (False, True):
+            suffix = ".csi" if csi else ".tbi"
+            pysam.tabix_index(self.gz, preset="vcf", force=True, csi=csi)
+            (fd, fn) = tempfile.mkstemp(suffix=suffix)
+            try:
+                remap_index(self.gz + suffix, fn, lambda i: i + (5 << 16))
+                old = read_index(self.gz + suffix)
+                new = read_index(fn)
+                for i, j in zip(old.references, new.references):
+                    self.assertEqual(j.name, i.name)
+                    self.assertEqual(j.n_mapped, i.n_mapped)
+                    self.assertEqual(j.off_beg, i.off_beg + (5 << 16))
+                    self.assertEqual(j.off_end, i.off_end + (5 << 16))
+            finally:
+                cleanup_files(fn)
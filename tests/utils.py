@@ -1,6 +1,8 @@
 """Testing utility functions."""
 
+import gzip
 import os
+import struct
 import sys
 from contextlib import contextmanager
 from io import StringIO
@@ -48,3 +50,17 @@ def cleanup_files(files):
 
     for fil in flist:
         _do_remove(fil)
+
+
+def strip_pseudo_bins(index_path: str) -> None:
+    """
+    Renumbers the pseudo-bins of a tabix index, as if it were written by an
+    indexer that does not store per-contig metadata.
+    :param index_path: the ``.tbi`` file to rewrite in place
+    """
+    with gzip.open(index_path, "rb") as fh:
+        data = fh.read()
+    pseudo_bin = struct.pack("<Ii", 37450, 2)
+    data = data.replace(pseudo_bin, struct.pack("<Ii", 37449, 2))
+    with gzip.open(index_path, "wb") as fh:
+        fh.write(data)